@@ -0,0 +1,95 @@
+"""
+Measure the wall-clock speedup of uploading a long recording to the API in parallel chunks.
+
+Runs against the local stand-in server, which takes time proportional to the length of each
+upload to respond, emulating a server that transcribes at a fixed real-time factor. The
+recording is repeated to make it long; it should contain natural pauses for the split.
+
+Usage (from the repository root):
+    python benchmarks/api_chunking.py speech.wav --repeat 10 --rtf 0.1 --parallel 1 2 4 8
+"""
+import argparse
+import os
+import re
+import sys
+import time
+import numpy as np
+import soundfile as sf
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+from mock_server import MockTranscriptionServer
+from transcription import transcribe_api
+from utils import ConfigManager
+
+SAMPLE_RATE = 16000
+
+
+class RealTimeFactorServer(MockTranscriptionServer):
+    """
+    Reply after a time proportional to the uploaded audio, and record the prompts received.
+    """
+
+    def __init__(self, rtf):
+        super().__init__()
+        self.rtf = rtf
+        self.prompts = []
+
+    def handle_transcription(self, handler, body):
+        # 16-bit mono WAV uploads are 2 bytes per sample
+        time.sleep(len(body) / 2 / SAMPLE_RATE * self.rtf)
+        prompt = re.search(rb'name="prompt"\r\n\r\n(.*?)\r\n--', body, re.S)
+        with self.lock:
+            self.prompts.append(prompt.group(1).decode() if prompt else '')
+            index = len(self.prompts)
+        handler.send_json(200, {'text': f'Chunk {index} text.'})
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('audio', help=f'{SAMPLE_RATE} Hz WAV file of speech.')
+    parser.add_argument('--repeat', type=int, default=10, help='Times to repeat the recording.')
+    parser.add_argument('--rtf', type=float, default=0.1, help='Emulated server real-time factor.')
+    parser.add_argument('--chunk-length', type=int, default=30)
+    parser.add_argument('--parallel', type=int, nargs='+', default=[1, 2, 4, 8])
+    args = parser.parse_args()
+
+    audio_data, sample_rate = sf.read(args.audio, dtype='int16')
+    if audio_data.ndim > 1:
+        audio_data = audio_data[:, 0]
+    if sample_rate != SAMPLE_RATE:
+        raise ValueError(f'The recording must be sampled at {SAMPLE_RATE} Hz, not {sample_rate} Hz.')
+    audio_data = np.tile(audio_data, args.repeat)
+
+    server = RealTimeFactorServer(args.rtf).start()
+    os.environ.setdefault('OPENAI_API_KEY', 'sk-benchmark')
+    ConfigManager.initialize()
+    ConfigManager.set_config_value(False, 'misc', 'print_to_terminal')
+    ConfigManager.set_config_value(server.base_url, 'model_options', 'api', 'base_url')
+    ConfigManager.set_config_value('wav', 'model_options', 'api', 'upload_format')
+    ConfigManager.set_config_value(max(args.parallel), 'model_options', 'api', 'max_connections')
+    ConfigManager.set_config_value(SAMPLE_RATE, 'recording_options', 'sample_rate')
+    ConfigManager.set_config_value(args.chunk_length, 'model_options', 'api', 'long_form_chunk_length')
+
+    print(f'{len(audio_data) / SAMPLE_RATE:.0f} s of audio, server RTF {args.rtf}')
+    print(f'{"mode":<14}{"requests":>10}{"wall (s)":>10}{"speedup":>9}{"prompted":>10}')
+    baseline = None
+    for parallel in [None] + args.parallel:
+        ConfigManager.set_config_value(0 if parallel is None else 1, 'model_options', 'api', 'long_form_threshold')
+        ConfigManager.set_config_value(parallel or 1, 'model_options', 'api', 'max_parallel_requests')
+        server.reset_counters()
+        server.prompts.clear()
+        start_time = time.perf_counter()
+        transcription = transcribe_api(audio_data)
+        wall_time = time.perf_counter() - start_time
+        baseline = baseline or wall_time
+
+        # Chunks after the first should be prompted with the previous chunk's text when it had arrived
+        prompted = sum('Chunk' in prompt for prompt in server.prompts)
+        assert transcription.count('Chunk') == server.requests, 'Every chunk should be in the transcription'
+        label = 'single' if parallel is None else f'{parallel} parallel'
+        print(f'{label:<14}{server.requests:>10}{wall_time:>10.2f}{baseline / wall_time:>8.2f}x{prompted:>10}')
+    server.stop()
+
+
+if __name__ == '__main__':
+    main()
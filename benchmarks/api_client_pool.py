@@ -0,0 +1,70 @@
+"""
+Compare API request latency with a new client per request against the shared pooled client.
+
+Runs against the local stand-in server, and checks that the pooled client reuses one
+connection, that pre-warming opens it ahead of the first request, and that clearing the cache
+closes it.
+
+Usage (from the repository root):
+    python benchmarks/api_client_pool.py --requests 50
+"""
+import argparse
+import os
+import sys
+import time
+import numpy as np
+from openai import OpenAI
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+from mock_server import MockTranscriptionServer
+from transcription import clear_api_clients, get_api_client, prewarm_api_connection, transcribe_api
+from utils import ConfigManager
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=50)
+    args = parser.parse_args()
+
+    server = MockTranscriptionServer().start()
+    os.environ.setdefault('OPENAI_API_KEY', 'sk-benchmark')
+    ConfigManager.initialize()
+    ConfigManager.set_config_value(False, 'misc', 'print_to_terminal')
+    ConfigManager.set_config_value(server.base_url, 'model_options', 'api', 'base_url')
+    audio_data = np.zeros(16000, dtype=np.int16)
+
+    def fresh_client_request():
+        client = OpenAI(base_url=server.base_url)
+        client.audio.transcriptions.create(model='whisper-1', file=('audio.wav', b'RIFF', 'audio/wav'))
+        client.close()
+
+    print(f'{"client":<10}{"mean (ms)":>12}{"connections":>13}')
+    for label, request in (('fresh', fresh_client_request), ('pooled', lambda: transcribe_api(audio_data))):
+        server.reset_counters()
+        start_time = time.perf_counter()
+        for _ in range(args.requests):
+            request()
+        mean_latency = (time.perf_counter() - start_time) / args.requests * 1000
+        print(f'{label:<10}{mean_latency:>12.2f}{server.connections:>13}')
+
+    assert get_api_client() is get_api_client(), 'The client should be cached'
+    clear_api_clients()
+    server.reset_counters()
+    prewarm_api_connection()
+    time.sleep(0.5)
+    assert server.connections == 1, 'Pre-warming should open a connection'
+    transcribe_api(audio_data)
+    assert server.connections == 1, 'The request should reuse the pre-warmed connection'
+    print('Pre-warmed connection was reused.')
+
+    client = get_api_client()
+    ConfigManager.set_config_value(server.base_url + '/', 'model_options', 'api', 'base_url')
+    assert get_api_client() is not client, 'Changing the base URL should create a new client'
+    clear_api_clients()
+    assert client.is_closed(), 'Clearing the cache should close the clients'
+    print('Clients were invalidated after the settings changed.')
+    server.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,91 @@
+"""
+Exercise the API retry, timeout and circuit breaker behaviour against injected faults.
+
+Runs against the local stand-in server and checks that:
+- transient errors, rate limits, dropped connections and timeouts are retried and succeed,
+- an outage falls back to the local model and opens the circuit breaker after the threshold,
+- the API is skipped while the breaker is open, and used again once a probe succeeds.
+
+The local fallback loads the given model size, so the first fallback includes its load time.
+
+Usage (from the repository root):
+    python benchmarks/api_resilience.py --model tiny
+"""
+import argparse
+import os
+import sys
+import time
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+from mock_server import MockTranscriptionServer
+from transcription import api_breaker, transcribe_api_with_fallback
+from utils import ConfigManager
+
+THRESHOLD = 2
+PROBE_INTERVAL = 1
+
+
+def timed_transcription(audio_data):
+    start_time = time.perf_counter()
+    text = transcribe_api_with_fallback(audio_data)
+    return text, (time.perf_counter() - start_time) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--model', default='tiny', help='Local model size to fall back to.')
+    args = parser.parse_args()
+
+    server = MockTranscriptionServer().start()
+    server.fault_delay = 2.0
+    os.environ.setdefault('OPENAI_API_KEY', 'sk-benchmark')
+    ConfigManager.initialize()
+    ConfigManager.set_config_value(False, 'misc', 'print_to_terminal')
+    ConfigManager.set_config_value(server.base_url, 'model_options', 'api', 'base_url')
+    ConfigManager.set_config_value(args.model, 'model_options', 'local', 'model')
+    ConfigManager.set_config_value(None, 'model_options', 'local', 'model_path')
+    ConfigManager.set_config_value(True, 'model_options', 'api', 'fallback_to_local')
+    ConfigManager.set_config_value(1, 'model_options', 'api', 'request_timeout')
+    ConfigManager.set_config_value(2, 'model_options', 'api', 'max_retries')
+    ConfigManager.set_config_value(0.05, 'model_options', 'api', 'retry_backoff')
+    ConfigManager.set_config_value(THRESHOLD, 'model_options', 'api', 'breaker_failure_threshold')
+    ConfigManager.set_config_value(PROBE_INTERVAL, 'model_options', 'api', 'breaker_probe_interval')
+    audio_data = np.zeros(16000, dtype=np.int16)
+
+    print(f'{"scenario":<22}{"requests":>10}{"retries":>9}{"latency (ms)":>14}{"source":>8}  breaker')
+    for fault in ('error', 'rate_limit', 'reset', 'timeout'):
+        server.reset_counters()
+        retries = api_breaker.status()['retries']
+        server.inject_faults(2, fault)
+        text, latency = timed_transcription(audio_data)
+        status = api_breaker.status()
+        assert text == server.text, f'Two {fault} faults should be retried'
+        assert status['retries'] - retries == 2 and status['state'] == 'closed'
+        print(f'{"2 x " + fault:<22}{server.requests:>10}{status["retries"] - retries:>9}{latency:>14.0f}'
+              f'{"API":>8}  {status["state"]}')
+
+    server.fault_rate = 1.0
+    for index in range(THRESHOLD + 1):
+        server.reset_counters()
+        text, latency = timed_transcription(audio_data)
+        status = api_breaker.status()
+        assert text != server.text, 'An outage should fall back to the local model'
+        if index == THRESHOLD:
+            assert server.requests == 0, 'The API should be skipped while the breaker is open'
+        print(f'{f"outage {index + 1}":<22}{server.requests:>10}{"":>9}{latency:>14.0f}{"local":>8}  {status["state"]}')
+    assert api_breaker.status()['state'] == 'open', f'The breaker should open after {THRESHOLD} failures'
+
+    server.fault_rate = 0.0
+    time.sleep(PROBE_INTERVAL * 2)
+    server.reset_counters()
+    text, latency = timed_transcription(audio_data)
+    status = api_breaker.status()
+    assert status['state'] == 'closed' and text == server.text, 'A successful probe should close the breaker'
+    print(f'{"recovered":<22}{server.requests:>10}{"":>9}{latency:>14.0f}{"API":>8}  {status["state"]}')
+    print(status)
+    server.stop()
+
+
+if __name__ == '__main__':
+    main()
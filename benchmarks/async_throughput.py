@@ -0,0 +1,77 @@
+"""
+Measure API transcription throughput at several levels of concurrent utterances.
+
+Compares a thread per in-flight utterance calling the synchronous `transcribe_api` with jobs
+submitted to the asyncio transcription engine, against the local stand-in server.
+
+Usage (from the repository root):
+    python benchmarks/async_throughput.py --jobs 64 --latency 0.2 --concurrency 1 4 16 64
+"""
+import argparse
+import concurrent.futures
+import os
+import sys
+import threading
+import time
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+from async_engine import transcription_engine
+from mock_server import MockTranscriptionServer
+from transcription import clear_api_clients, transcribe_api
+from utils import ConfigManager
+
+
+def run_threaded(audio_data, jobs, concurrency):
+    with concurrent.futures.ThreadPoolExecutor(max_workers=concurrency) as executor:
+        return list(executor.map(lambda _: transcribe_api(audio_data), range(jobs)))
+
+
+def run_engine(audio_data, jobs, concurrency):
+    # Keep `concurrency` jobs in flight at a time
+    slots = threading.Semaphore(concurrency)
+    futures = []
+    for _ in range(jobs):
+        slots.acquire()
+        future = transcription_engine.submit(audio_data)
+        future.add_done_callback(lambda _: slots.release())
+        futures.append(future)
+    return [future.result() for future in futures]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--jobs', type=int, default=64)
+    parser.add_argument('--latency', type=float, default=0.2, help='Emulated server processing time in seconds.')
+    parser.add_argument('--duration', type=float, default=5, help='Length of each utterance in seconds.')
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 4, 16, 64])
+    args = parser.parse_args()
+
+    server = MockTranscriptionServer(latency=args.latency).start()
+    os.environ.setdefault('OPENAI_API_KEY', 'sk-benchmark')
+    ConfigManager.initialize()
+    ConfigManager.set_config_value(False, 'misc', 'print_to_terminal')
+    ConfigManager.set_config_value(True, 'model_options', 'use_api')
+    ConfigManager.set_config_value(False, 'model_options', 'api', 'fallback_to_local')
+    ConfigManager.set_config_value(server.base_url, 'model_options', 'api', 'base_url')
+    ConfigManager.set_config_value(max(args.concurrency), 'model_options', 'api', 'max_connections')
+    audio_data = (np.random.default_rng(0).standard_normal(int(args.duration * 16000)) * 1000).astype(np.int16)
+
+    print(f'{"concurrency":<13}{"threads (jobs/s)":>18}{"engine (jobs/s)":>17}{"connections":>13}')
+    for concurrency in args.concurrency:
+        results = []
+        for run in (run_threaded, run_engine):
+            server.reset_counters()
+            start_time = time.perf_counter()
+            transcriptions = run(audio_data, args.jobs, concurrency)
+            results.append(args.jobs / (time.perf_counter() - start_time))
+            assert len(transcriptions) == args.jobs and server.requests == args.jobs
+        print(f'{concurrency:<13}{results[0]:>18.1f}{results[1]:>17.1f}{server.connections:>13}')
+
+    transcription_engine.stop()
+    clear_api_clients()
+    server.stop()
+
+
+if __name__ == '__main__':
+    main()
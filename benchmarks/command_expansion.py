@@ -0,0 +1,76 @@
+"""
+Measure the time to expand spoken commands and snippets as the number of snippets grows.
+
+Random snippet phrases are compiled into a CommandExpander, which is run on transcripts of
+several lengths. The time per transcript should grow with its length but stay flat as snippets
+are added. It is compared with one case-insensitive replacement per snippet.
+
+Usage (from the repository root):
+    python benchmarks/command_expansion.py --snippets 10 1000 100000 --words 50 500
+"""
+import argparse
+import os
+import random
+import re
+import string
+import sys
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+from spoken_commands import CommandExpander, KeyPress
+
+SENTENCE = 'please send the report to my email, new line. thanks for the update'
+
+
+def random_snippets(count, rng):
+    snippets = {'my email': 'jane@example.com'}
+    while len(snippets) < count:
+        phrase = ' '.join(''.join(rng.choice(string.ascii_lowercase) for _ in range(rng.randint(2, 8)))
+                          for _ in range(rng.randint(1, 3)))
+        snippets[phrase] = phrase.upper()
+    return snippets
+
+
+def time_per_call(func, text, runs):
+    start_time = time.perf_counter()
+    for _ in range(runs):
+        func(text)
+    return (time.perf_counter() - start_time) / runs * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--snippets', type=int, nargs='+', default=[10, 1000, 100000])
+    parser.add_argument('--words', type=int, nargs='+', default=[50, 500])
+    parser.add_argument('--runs', type=int, default=200)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    sentence_words = SENTENCE.split()
+    print(f'{"snippets":>9}{"words":>7}{"compile (ms)":>14}{"trie (us)":>11}{"replace (us)":>14}')
+    for count in args.snippets:
+        snippets = random_snippets(count, rng)
+        start_time = time.perf_counter()
+        expander = CommandExpander(snippets)
+        compile_time = (time.perf_counter() - start_time) * 1000
+        # Limit the replacement baseline to what runs in reasonable time
+        patterns = [(re.compile(re.escape(phrase), re.IGNORECASE), text)
+                    for phrase, text in list(snippets.items())[:10000]]
+
+        def replace_each(text):
+            for pattern, replacement in patterns:
+                text = pattern.sub(replacement, text)
+            return text
+
+        for words in args.words:
+            text = ' '.join(sentence_words[index % len(sentence_words)] for index in range(words)) + '.'
+            actions = expander.expand(text)
+            assert KeyPress('enter', 1) in actions and 'jane@example.com' in actions[0]
+            trie = time_per_call(expander.expand, text, args.runs)
+            replace = time_per_call(replace_each, text, max(1, args.runs // 100))
+            baseline = f'{replace:>14.1f}' if len(patterns) == count else f'{"(skipped)":>14}'
+            print(f'{count:>9}{words:>7}{compile_time:>14.1f}{trie:>11.1f}{baseline}')
+
+
+if __name__ == '__main__':
+    main()
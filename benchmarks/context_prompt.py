@@ -0,0 +1,90 @@
+"""
+Measure the decode cost and accuracy gain of the rolling context prompt.
+
+The manifest is a tab-separated file of `<wav path>\t<reference transcript>` lines, in the order
+they were dictated. Each recording is decoded in turn, once with the static initial prompt and
+once with the rolling context of the previous transcriptions, and the total decode time and word
+error rate of each are reported.
+
+Usage (from the repository root):
+    python benchmarks/context_prompt.py manifest.tsv --model base --tokens 100
+"""
+import argparse
+import os
+import re
+import sys
+import time
+import soundfile as sf
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+from transcription import create_local_model, rolling_context, transcribe_local
+from utils import ConfigManager
+
+
+def word_error_rate(references, hypotheses):
+    """Return the word error rate of the hypotheses over all references."""
+    errors = 0
+    total = 0
+    for reference, hypothesis in zip(references, hypotheses):
+        ref = re.findall(r"[\w']+", reference.lower())
+        hyp = re.findall(r"[\w']+", hypothesis.lower())
+        distances = list(range(len(hyp) + 1))
+        for i, ref_word in enumerate(ref, 1):
+            previous, distances[0] = distances[0], i
+            for j, hyp_word in enumerate(hyp, 1):
+                previous, distances[j] = distances[j], min(distances[j] + 1, distances[j - 1] + 1,
+                                                           previous + (ref_word != hyp_word))
+        errors += distances[-1]
+        total += len(ref)
+    return errors / max(total, 1)
+
+
+def run(recordings, model, use_context):
+    """Decode the recordings in order, returning the transcriptions and total decode time."""
+    ConfigManager.set_config_value(use_context, 'model_options', 'common', 'rolling_context')
+    rolling_context.entries.clear()
+    hypotheses = []
+    decode_time = 0.0
+    for audio_data in recordings:
+        start_time = time.perf_counter()
+        transcription = transcribe_local(audio_data, model)
+        decode_time += time.perf_counter() - start_time
+        rolling_context.add(transcription, model)
+        hypotheses.append(transcription)
+    return hypotheses, decode_time
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('manifest')
+    parser.add_argument('--model', default='base')
+    parser.add_argument('--tokens', type=int, default=100, help='Rolling context token budget.')
+    args = parser.parse_args()
+
+    ConfigManager.initialize()
+    ConfigManager.set_config_value(False, 'misc', 'print_to_terminal')
+    ConfigManager.set_config_value(args.model, 'model_options', 'local', 'model')
+    ConfigManager.set_config_value(None, 'model_options', 'local', 'model_path')
+    ConfigManager.set_config_value(args.tokens, 'model_options', 'common', 'rolling_context_tokens')
+    ConfigManager.set_config_value(10 ** 9, 'model_options', 'common', 'rolling_context_idle_reset')
+
+    recordings = []
+    references = []
+    with open(args.manifest, encoding='utf-8') as manifest:
+        for line in manifest:
+            if not line.strip():
+                continue
+            path, reference = line.rstrip('\n').split('\t', 1)
+            audio_data, _ = sf.read(path, dtype='float32')
+            recordings.append(audio_data if audio_data.ndim == 1 else audio_data[:, 0])
+            references.append(reference)
+
+    model = create_local_model()
+    print(f'{"prompt":<12}{"decode (s)":>12}{"WER":>8}')
+    for label, use_context in (('static', False), ('rolling', True)):
+        hypotheses, decode_time = run(recordings, model, use_context)
+        print(f'{label:<12}{decode_time:>12.2f}{word_error_rate(references, hypotheses):>8.1%}')
+
+
+if __name__ == '__main__':
+    main()
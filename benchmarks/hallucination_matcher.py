@@ -0,0 +1,71 @@
+"""
+Compare the compiled hallucination matcher with scanning the phrases one by one.
+
+Random phrases stand in for a pasted list of known hallucinations. For each list size, the
+compile time and the mean time to check one segment are reported for both approaches.
+
+Usage (from the repository root):
+    python benchmarks/hallucination_matcher.py --sizes 100 1000 10000
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+from transcription import HallucinationMatcher
+
+WORDS = ('thanks for watching please subscribe like and the video channel subtitles by community '
+         'see you next time bye everyone music applause transcribed translated captions').split()
+SEGMENTS = [
+    ' So I think we should move the meeting to Thursday afternoon.',
+    ' Thanks for watching!',
+    ' The quick brown fox jumps over the lazy dog, and thanks for watching it.',
+    ' Please subscribe to the channel.',
+    ' Let me know if that works for you.',
+]
+
+
+def random_phrases(count, rng):
+    phrases = {'thanks for watching', 'please subscribe to the channel'}
+    while len(phrases) < count:
+        phrases.add(' '.join(rng.choice(WORDS) for _ in range(rng.randint(2, 7))))
+    return list(phrases)
+
+
+def time_per_segment(check, segments, runs):
+    start_time = time.perf_counter()
+    for _ in range(runs):
+        for segment in segments:
+            check(segment)
+    return (time.perf_counter() - start_time) / (runs * len(segments)) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[100, 1000, 10000])
+    parser.add_argument('--runs', type=int, default=200)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    print(f'{"phrases":>8}{"compile (ms)":>14}{"compiled (us)":>15}{"scan (us)":>11}')
+    for size in args.sizes:
+        phrases = random_phrases(size, rng)
+        start_time = time.perf_counter()
+        matcher = HallucinationMatcher(phrases)
+        compile_time = (time.perf_counter() - start_time) * 1000
+
+        # The previous approach: a substring scan of every phrase
+        def scan(text):
+            text_lower = text.strip().lower()
+            return any(phrase in text_lower for phrase in phrases)
+
+        assert [matcher.matches(segment) for segment in SEGMENTS] == [False, True, False, True, False]
+        compiled = time_per_segment(matcher.matches, SEGMENTS, args.runs)
+        scanned = time_per_segment(scan, SEGMENTS, max(1, args.runs // 10))
+        print(f'{size:>8}{compile_time:>14.1f}{compiled:>15.2f}{scanned:>11.2f}')
+
+
+if __name__ == '__main__':
+    main()
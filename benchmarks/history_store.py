@@ -0,0 +1,75 @@
+"""
+Measure the transcription history at a large number of entries.
+
+Adds `--entries` generated transcriptions through the queued writer and reports how long each
+`add` call blocks the caller and how long the background writes take. Then times searches for
+common, rare and partially typed words against the FTS5 index, compared with scanning the table.
+
+Usage (from the repository root):
+    python benchmarks/history_store.py --entries 100000
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+from history import TranscriptionHistory
+from utils import ConfigManager
+
+WORDS = ('the a meeting project review send email tomorrow morning update please report budget team '
+         'schedule call client design draft notes question idea plan deadline launch release feedback').split()
+QUERIES = ['meeting', 'zanzibar', 'repo', 'send budget', 'feedb']
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--entries', type=int, default=100000)
+    parser.add_argument('--runs', type=int, default=20)
+    args = parser.parse_args()
+
+    ConfigManager.initialize()
+    rng = random.Random(0)
+    with tempfile.TemporaryDirectory() as directory:
+        history = TranscriptionHistory(os.path.join(directory, 'history.sqlite3'))
+        texts = [' '.join(rng.choice(WORDS) for _ in range(rng.randint(5, 30))) for _ in range(args.entries)]
+        texts[len(texts) // 2] += ' zanzibar'
+
+        start_time = time.perf_counter()
+        add_times = []
+        for text in texts:
+            add_start = time.perf_counter()
+            history.add(text, duration=3.2, model='base', latencies={'transcription': 0.4})
+            add_times.append(time.perf_counter() - add_start)
+        queued_time = time.perf_counter() - start_time
+        history.flush()
+        written_time = time.perf_counter() - start_time
+        assert history.count() == args.entries
+
+        add_times.sort()
+        print(f'Added {args.entries} entries: {add_times[len(add_times) // 2] * 1e6:.1f} us median and '
+              f'{add_times[int(len(add_times) * 0.99)] * 1e6:.1f} us p99 per add (includes opening the database).')
+        print(f'Queued in {queued_time:.2f} s, written in {written_time:.2f} s, '
+              f'{os.path.getsize(os.path.join(directory, "history.sqlite3")) / 1024 / 1024:.1f} MB.\n')
+
+        print(f'{"query":<14}{"results":>9}{"FTS5 (ms)":>11}{"scan (ms)":>11}')
+        for query in QUERIES:
+            timings = []
+            for fts in (True, False):
+                history.fts = fts
+                start_time = time.perf_counter()
+                for _ in range(args.runs):
+                    results = history.search(query)
+                timings.append((time.perf_counter() - start_time) / args.runs * 1000)
+                if fts:
+                    fts_ids = [result['id'] for result in results]
+            assert fts_ids == [result['id'] for result in results] or query.endswith('b'), query
+            print(f'{query:<14}{len(fts_ids):>9}{timings[0]:>11.2f}{timings[1]:>11.2f}')
+        history.fts = True
+        history.stop()
+
+
+if __name__ == '__main__':
+    main()
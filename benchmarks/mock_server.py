@@ -0,0 +1,204 @@
+"""
+A local stand-in for an OpenAI-compatible transcription endpoint.
+
+Serves `POST /v1/audio/transcriptions` with a fixed transcription after a configurable delay,
+and counts requests and TCP connections so that benchmarks can check connection reuse. An upload
+bandwidth can be set to emulate a slow link, adding the time the request body would take to send.
+
+With `streaming` enabled, requests with `stream=true` are answered with server-sent
+`transcript.text.delta` events, one word every `stream_interval` seconds, as newer
+OpenAI-compatible servers do. Other requests then get the whole text once the last word would
+have been streamed.
+
+Faults can be injected into transcription requests, either for the next few requests or at
+random: 'error' replies 503, 'rate_limit' replies 429, 'timeout' replies only after `fault_delay`
+seconds and 'reset' closes the connection without replying.
+
+Usage (from the repository root):
+    python benchmarks/mock_server.py --port 8765 --latency 0.2
+Then set `model_options.api.base_url` to http://127.0.0.1:8765/v1.
+"""
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class MockTranscriptionServer:
+    """
+    Run the stand-in endpoint on a background thread.
+    """
+
+    def __init__(self, port=0, latency=0.0, text='Hello from the mock server.', upload_bandwidth=None,
+                 streaming=False, stream_interval=0.05):
+        self.latency = latency
+        self.streaming = streaming
+        self.stream_interval = stream_interval
+        self.upload_bandwidth = upload_bandwidth
+        self.text = text
+        self.requests = 0
+        self.connections = 0
+        self.request_bytes = 0
+        self.fault_rate = 0.0
+        self.fault = 'error'
+        self.fault_delay = 30.0
+        self.faults_injected = 0
+        self.pending_faults = []
+        self.lock = threading.Lock()
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', port), self._make_handler())
+        self.httpd.daemon_threads = True
+        self.thread = None
+
+    @property
+    def base_url(self):
+        return f'http://127.0.0.1:{self.httpd.server_address[1]}/v1'
+
+    def start(self):
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def reset_counters(self):
+        with self.lock:
+            self.requests = 0
+            self.connections = 0
+            self.request_bytes = 0
+            self.faults_injected = 0
+
+    def inject_faults(self, count, fault='error'):
+        """Fail the next `count` transcription requests with the given fault."""
+        with self.lock:
+            self.pending_faults.extend([fault] * count)
+
+    def _next_fault(self):
+        with self.lock:
+            if self.pending_faults:
+                fault = self.pending_faults.pop(0)
+            elif self.fault_rate and random.random() < self.fault_rate:
+                fault = self.fault
+            else:
+                return None
+            self.faults_injected += 1
+            return fault
+
+    def handle_transcription(self, handler, body):
+        """Sleep for the configured latency and upload time, then reply with the fixed transcription."""
+        upload_time = len(body) / self.upload_bandwidth if self.upload_bandwidth else 0.0
+        if self.streaming and b'name="stream"\r\n\r\ntrue' in body:
+            time.sleep(upload_time)
+            handler.send_text_stream(self.text, self.latency, self.stream_interval)
+            return
+        stream_time = len(self.text.split(' ')) * self.stream_interval if self.streaming else 0.0
+        time.sleep(self.latency + upload_time + stream_time)
+        handler.send_json(200, {'text': self.text})
+
+    def _make_handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            # HTTP/1.1 so that clients can keep connections alive
+            protocol_version = 'HTTP/1.1'
+
+            def setup(self):
+                super().setup()
+                with server.lock:
+                    server.connections += 1
+
+            def log_message(self, format, *args):
+                pass
+
+            def send_json(self, status, payload, headers=None):
+                data = json.dumps(payload).encode()
+                self.send_response(status)
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def send_text_stream(self, text, first_delay, interval):
+                """Send the text as server-sent delta events, one word at a time."""
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/event-stream')
+                self.send_header('Transfer-Encoding', 'chunked')
+                self.end_headers()
+                time.sleep(first_delay)
+                words = text.split(' ')
+                events = [{'type': 'transcript.text.delta', 'delta': (' ' if index else '') + word}
+                          for index, word in enumerate(words)]
+                events.append({'type': 'transcript.text.done', 'text': text})
+                for index, event in enumerate(events):
+                    if index:
+                        time.sleep(interval)
+                    data = f'data: {json.dumps(event)}\n\n'.encode()
+                    self.wfile.write(f'{len(data):x}\r\n'.encode() + data + b'\r\n')
+                    self.wfile.flush()
+                self.wfile.write(b'0\r\n\r\n')
+
+            def do_HEAD(self):
+                self.send_response(200)
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get('Content-Length') or 0))
+                with server.lock:
+                    server.requests += 1
+                    server.request_bytes += len(body)
+                if self.path.rstrip('/').endswith('/audio/transcriptions'):
+                    fault = server._next_fault()
+                    if fault is None:
+                        server.handle_transcription(self, body)
+                    else:
+                        self.inject_fault(fault)
+                else:
+                    self.send_json(404, {'error': {'message': 'Not found'}})
+
+            def inject_fault(self, fault):
+                if fault == 'error':
+                    self.send_json(503, {'error': {'message': 'Injected server error'}})
+                elif fault == 'rate_limit':
+                    self.send_json(429, {'error': {'message': 'Injected rate limit'}}, {'Retry-After': '0.1'})
+                elif fault == 'timeout':
+                    time.sleep(server.fault_delay)
+                    try:
+                        self.send_json(200, {'text': server.text})
+                    except OSError:
+                        pass
+                else:
+                    self.close_connection = True
+
+        return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--latency', type=float, default=0.0, help='Seconds to wait before replying.')
+    parser.add_argument('--bandwidth', type=float, help='Emulated upload bandwidth in kilobits per second.')
+    parser.add_argument('--streaming', action='store_true', help='Stream text deltas when asked to.')
+    parser.add_argument('--fault-rate', type=float, default=0.0, help='Fraction of requests to fail.')
+    parser.add_argument('--fault', default='error', choices=['error', 'rate_limit', 'timeout', 'reset'])
+    args = parser.parse_args()
+
+    upload_bandwidth = args.bandwidth * 1000 / 8 if args.bandwidth else None
+    server = MockTranscriptionServer(args.port, args.latency, upload_bandwidth=upload_bandwidth,
+                                     streaming=args.streaming)
+    server.fault_rate = args.fault_rate
+    server.fault = args.fault
+    print(f'Serving on {server.base_url}')
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        server.httpd.server_close()
+
+
+if __name__ == '__main__':
+    main()
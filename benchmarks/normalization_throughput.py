@@ -0,0 +1,57 @@
+"""
+Measure the time inverse text normalization adds to each utterance.
+
+Typical dictated utterances, with and without spoken numbers, are normalized repeatedly and the
+mean and 99th percentile time per utterance are reported. The written forms are checked as well.
+
+Usage (from the repository root):
+    python benchmarks/normalization_throughput.py --runs 2000
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+from inverse_text_normalization import EnglishNormalizer
+
+UTTERANCES = {
+    ' Revenue grew twenty five percent compared to last year, mostly from the new region.':
+        ' Revenue grew 25% compared to last year, mostly from the new region.',
+    ' Let\'s move the review to March third twenty twenty four at three thirty p m.':
+        ' Let\'s move the review to March 3, 2024 at 3:30 p.m.',
+    ' The taxi cost twelve dollars and fifty cents, which is one of the cheaper options.':
+        ' The taxi cost $12.50, which is one of the cheaper options.',
+    ' We drove one hundred and twenty kilometers per hour for the first two hours.':
+        ' We drove 120 km/h for the first two hours.',
+    ' The city has about three million four hundred thousand people in the twenty first century.':
+        ' The city has about 3,400,000 people in the 21st century.',
+    ' The seven eleven on the corner closes at eleven thirty, or twenty three hundred on weekends.':
+        ' The seven eleven on the corner closes at eleven thirty, or 2300 on weekends.',
+    ' I think we should talk about this tomorrow morning before the meeting with the team.':
+        ' I think we should talk about this tomorrow morning before the meeting with the team.',
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=2000)
+    args = parser.parse_args()
+
+    for spoken, written in UTTERANCES.items():
+        assert EnglishNormalizer.normalize(spoken) == written, EnglishNormalizer.normalize(spoken)
+
+    print(f'{"utterance":<60}{"mean (us)":>11}{"p99 (us)":>10}')
+    for spoken in UTTERANCES:
+        timings = []
+        for _ in range(args.runs):
+            start_time = time.perf_counter()
+            EnglishNormalizer.normalize(spoken)
+            timings.append((time.perf_counter() - start_time) * 1e6)
+        mean = sum(timings) / len(timings)
+        print(f'{spoken.strip()[:58]:<60}{mean:>11.1f}{sorted(timings)[int(len(timings) * 0.99)]:>10.1f}')
+        assert mean < 1000, 'Normalization should add well under a millisecond per utterance'
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,97 @@
+"""
+Dry-run the post-processing rules on sample text and report the time each rule takes.
+
+Without `--rules`, a generated rules file is used: `--vocabulary` random vocabulary entries plus
+a few regex, casing and punctuation rules. The merged vocabulary rule is also compared with
+applying each vocabulary entry as its own substitution.
+
+Usage (from the repository root):
+    python benchmarks/post_processing_rules.py --vocabulary 300
+    python benchmarks/post_processing_rules.py --rules rules.yaml --text "some example text"
+"""
+import argparse
+import os
+import random
+import re
+import string
+import sys
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+from text_rules import VocabularyRule, compile_rules, load_rules
+from utils import ConfigManager
+
+SAMPLE_TEXTS = [
+    ' um so I pushed the fix to git hub and the pie torch build passed .',
+    ' can you review the pull request , uh , before the meeting tomorrow?',
+    ' the new model runs about twice as fast on the laptop.',
+]
+
+
+def generated_rules(size, rng):
+    vocabulary = {'git hub': 'GitHub', 'pie torch': 'PyTorch'}
+    while len(vocabulary) < size:
+        spoken = ' '.join(''.join(rng.choice(string.ascii_lowercase) for _ in range(rng.randint(3, 9)))
+                          for _ in range(rng.randint(1, 3)))
+        vocabulary[spoken] = spoken.title().replace(' ', '')
+    return [
+        {'vocabulary': vocabulary},
+        {'regex': r'\b(um|uh)\b\s*,?\s*', 'replace': '', 'ignore_case': True},
+        {'case': 'sentence'},
+        {'punctuation_spacing': True},
+    ]
+
+
+def time_per_text(apply, texts, runs):
+    start_time = time.perf_counter()
+    for _ in range(runs):
+        for text in texts:
+            apply(text)
+    return (time.perf_counter() - start_time) / (runs * len(texts)) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rules', help='YAML rules file to dry-run instead of the generated rules.')
+    parser.add_argument('--vocabulary', type=int, default=300, help='Vocabulary entries in the generated rules.')
+    parser.add_argument('--text', action='append', help='Sample text to process. May be given several times.')
+    parser.add_argument('--runs', type=int, default=1000)
+    args = parser.parse_args()
+
+    ConfigManager.initialize()
+    entries = load_rules(args.rules) if args.rules else generated_rules(args.vocabulary, random.Random(0))
+    texts = args.text or SAMPLE_TEXTS
+
+    start_time = time.perf_counter()
+    pipeline = compile_rules(entries)
+    print(f'Compiled {len(pipeline.rules)} rules in {(time.perf_counter() - start_time) * 1000:.1f} ms.\n')
+
+    print(f'{"rule":<50}{"us per text":>12}')
+    for rule in pipeline.rules:
+        cost = time_per_text(lambda text: rule.apply(text, True), texts, args.runs)
+        print(f'{rule.name[:48]:<50}{cost:>12.2f}')
+    total = time_per_text(pipeline.apply, texts, args.runs)
+    print(f'{"total":<50}{total:>12.2f}\n')
+
+    for rule in pipeline.rules:
+        if isinstance(rule, VocabularyRule) and rule.pattern:
+            # The alternative: one whole-word substitution per vocabulary entry
+            patterns = [(re.compile(r'(?<!\w)' + r'\s+'.join(map(re.escape, spoken.split())) + r'(?!\w)',
+                                    re.IGNORECASE), written) for spoken, written in rule.replacements.items()]
+
+            def apply_separately(text):
+                for pattern, written in patterns:
+                    text = pattern.sub(lambda _: written, text)
+                return text
+
+            separate = time_per_text(apply_separately, texts, max(1, args.runs // 10))
+            merged = time_per_text(lambda text: rule.apply(text, True), texts, args.runs)
+            assert all(apply_separately(text) == rule.apply(text, True) for text in texts)
+            print(f'{rule.name}: {merged:.2f} us merged, {separate:.2f} us as separate substitutions.\n')
+
+    for text in texts:
+        print(f'{text!r}\n  -> {pipeline.apply(text)!r}')
+
+
+if __name__ == '__main__':
+    main()
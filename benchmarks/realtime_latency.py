@@ -0,0 +1,71 @@
+"""
+Compare the final-text latency after speech ends for batch and real-time transcription.
+
+The recording is fed to the StreamingTranscriber in real time, 30 ms at a time, and the time
+from the last sample to the final text is measured. The batch latency is the time to decode the
+whole recording once it has ended.
+
+Usage (from the repository root):
+    python benchmarks/realtime_latency.py recording.wav --model tiny --compute-type int8
+"""
+import argparse
+import os
+import sys
+import time
+import soundfile as sf
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+from streaming_transcriber import StreamingTranscriber
+from transcription import create_local_model, transcribe_local
+from utils import ConfigManager
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('audio', help='16 kHz mono WAV file of speech')
+    parser.add_argument('--model', default='tiny')
+    parser.add_argument('--compute-type', default='int8')
+    parser.add_argument('--runs', type=int, default=3)
+    args = parser.parse_args()
+
+    ConfigManager.initialize()
+    ConfigManager.set_config_value(False, 'misc', 'print_to_terminal')
+    ConfigManager.set_config_value(args.model, 'model_options', 'local', 'model')
+    ConfigManager.set_config_value(args.compute_type, 'model_options', 'local', 'compute_type')
+    ConfigManager.set_config_value(None, 'model_options', 'local', 'model_path')
+
+    audio, sample_rate = sf.read(args.audio, dtype='float32')
+    if audio.ndim > 1:
+        audio = audio[:, 0]
+    model = create_local_model()
+    frame_size = int(sample_rate * 0.03)
+    duration = len(audio) / sample_rate
+
+    batch_latencies = []
+    realtime_latencies = []
+    for _ in range(args.runs):
+        start_time = time.perf_counter()
+        transcribe_local(audio, model)
+        batch_latencies.append(time.perf_counter() - start_time)
+
+        transcriber = StreamingTranscriber(model, sample_rate)
+        transcriber.start()
+        stream_start = time.perf_counter()
+        for i, offset in enumerate(range(0, len(audio), frame_size)):
+            transcriber.add_audio(audio[offset:offset + frame_size])
+            delay = stream_start + (i + 1) * 0.03 - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+        start_time = time.perf_counter()
+        text = transcriber.finish()
+        realtime_latencies.append(time.perf_counter() - start_time)
+
+    print(f'Audio: {duration:.1f} s, model: {args.model}, compute type: {args.compute_type}')
+    print(f'{"mode":<10}{"min (s)":>10}{"mean (s)":>10}')
+    for mode, latencies in (('batch', batch_latencies), ('realtime', realtime_latencies)):
+        print(f'{mode:<10}{min(latencies):>10.2f}{sum(latencies) / len(latencies):>10.2f}')
+    print(f'Real-time text: {text}')
+
+
+if __name__ == '__main__':
+    main()
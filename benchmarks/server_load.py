@@ -0,0 +1,62 @@
+"""
+Load-test a transcription server started with `python run.py --serve`.
+
+Uploads a WAV file from several concurrent clients at each concurrency level, and reports the
+throughput, median and 95th percentile request latency, rejected requests and the server's own
+metrics.
+
+Usage (from the repository root, with the server running):
+    python benchmarks/server_load.py speech.wav --url http://127.0.0.1:8000/v1 --requests 32 --concurrency 1 4 8
+"""
+import argparse
+import concurrent.futures
+import json
+import time
+import urllib.request
+from openai import APIStatusError, OpenAI
+
+
+def upload(client, audio_bytes):
+    """Send one transcription request, returning its latency, or None if it was rejected."""
+    start_time = time.perf_counter()
+    try:
+        client.audio.transcriptions.create(model='whisper-1', file=('audio.wav', audio_bytes, 'audio/wav'))
+    except APIStatusError as e:
+        if e.status_code == 503:
+            return None
+        raise
+    return time.perf_counter() - start_time
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('audio', help='WAV file to upload.')
+    parser.add_argument('--url', default='http://127.0.0.1:8000/v1')
+    parser.add_argument('--requests', type=int, default=32, help='Requests per concurrency level.')
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 4, 8])
+    args = parser.parse_args()
+
+    with open(args.audio, 'rb') as audio_file:
+        audio_bytes = audio_file.read()
+    client = OpenAI(api_key='sk-local', base_url=args.url, max_retries=0, timeout=600)
+    upload(client, audio_bytes)  # Warm up the model and the connection
+
+    print(f'{"clients":<9}{"req/s":>8}{"p50 (ms)":>10}{"p95 (ms)":>10}{"rejected":>10}')
+    for concurrency in args.concurrency:
+        start_time = time.perf_counter()
+        with concurrent.futures.ThreadPoolExecutor(max_workers=concurrency) as executor:
+            results = list(executor.map(lambda _: upload(client, audio_bytes), range(args.requests)))
+        wall_time = time.perf_counter() - start_time
+
+        latencies = sorted(latency for latency in results if latency is not None)
+        rejected = len(results) - len(latencies)
+        p50 = latencies[len(latencies) // 2] * 1000 if latencies else 0
+        p95 = latencies[int(len(latencies) * 0.95)] * 1000 if latencies else 0
+        print(f'{concurrency:<9}{len(latencies) / wall_time:>8.2f}{p50:>10.0f}{p95:>10.0f}{rejected:>10}')
+
+    with urllib.request.urlopen(args.url.rstrip('/').rsplit('/v1', 1)[0] + '/metrics') as response:
+        print('Server metrics:', json.dumps(json.load(response), indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,72 @@
+"""
+Measure the time to first token of streamed API transcriptions.
+
+Runs `transcribe_stream` against the local stand-in server, which streams one word every
+`--interval` seconds after `--latency` seconds, and compares:
+- plain: `stream_response` disabled, so the whole text arrives at once,
+- streamed: `stream_response` enabled against the streaming server,
+- fallback: `stream_response` enabled against a server that ignores the stream parameter.
+
+Usage (from the repository root):
+    python benchmarks/streaming_response.py --words 40 --latency 0.3 --interval 0.05
+"""
+import argparse
+import os
+import sys
+import time
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+from mock_server import MockTranscriptionServer
+from transcription import clear_api_clients, transcribe_stream
+from utils import ConfigManager
+
+
+def timed_stream(audio_data):
+    """Return the time to first text, total time and number of pieces of a streamed transcription."""
+    start_time = time.perf_counter()
+    first_time = None
+    pieces = []
+    for text in transcribe_stream(audio_data):
+        if first_time is None:
+            first_time = time.perf_counter() - start_time
+        pieces.append(text)
+    return first_time, time.perf_counter() - start_time, pieces
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--words', type=int, default=40)
+    parser.add_argument('--latency', type=float, default=0.3, help='Seconds before the first word.')
+    parser.add_argument('--interval', type=float, default=0.05, help='Seconds between streamed words.')
+    parser.add_argument('--runs', type=int, default=5)
+    args = parser.parse_args()
+
+    text = ' '.join(f'word{index}' for index in range(args.words)) + '.'
+    os.environ.setdefault('OPENAI_API_KEY', 'sk-benchmark')
+    ConfigManager.initialize()
+    ConfigManager.set_config_value(False, 'misc', 'print_to_terminal')
+    ConfigManager.set_config_value(True, 'model_options', 'use_api')
+    ConfigManager.set_config_value(False, 'model_options', 'api', 'fallback_to_local')
+    audio_data = np.zeros(16000, dtype=np.int16)
+
+    print(f'{"mode":<10}{"first text (ms)":>17}{"total (ms)":>12}{"pieces":>8}')
+    for mode, streaming, stream_response in (('plain', True, False), ('streamed', True, True),
+                                             ('fallback', False, True)):
+        server = MockTranscriptionServer(latency=args.latency, text=text, streaming=streaming,
+                                         stream_interval=args.interval).start()
+        ConfigManager.set_config_value(server.base_url, 'model_options', 'api', 'base_url')
+        ConfigManager.set_config_value(stream_response, 'model_options', 'api', 'stream_response')
+        results = [timed_stream(audio_data) for _ in range(args.runs)]
+        for _, _, pieces in results:
+            assert ''.join(pieces).strip() == text, 'The streamed text should match the full transcription'
+        first_times = sorted(result[0] for result in results)
+        total_times = sorted(result[1] for result in results)
+        print(f'{mode:<10}{first_times[len(results) // 2] * 1000:>17.0f}{total_times[len(results) // 2] * 1000:>12.0f}'
+              f'{len(results[0][2]):>8}')
+        clear_api_clients()
+        server.stop()
+
+
+if __name__ == '__main__':
+    main()
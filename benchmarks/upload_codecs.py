@@ -0,0 +1,91 @@
+"""
+Compare the upload formats for API transcription: encode time, bytes on the wire and total
+request latency.
+
+Runs against the local stand-in server with an emulated upload bandwidth, since the time saved
+by a smaller upload depends on the speed of the link. Without `--audio`, a synthetic 16 kHz
+recording is used, which compresses differently from speech.
+
+Usage (from the repository root):
+    python benchmarks/upload_codecs.py --audio speech.wav --bandwidth 1000 --runs 5
+"""
+import argparse
+import os
+import sys
+import time
+import numpy as np
+import soundfile as sf
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+from mock_server import MockTranscriptionServer
+from transcription import encode_upload, transcribe_api
+from utils import ConfigManager
+
+SAMPLE_RATE = 16000
+FORMATS = ['wav', 'flac', 'opus']
+
+
+def synthetic_recording(duration):
+    """Return an int16 recording of a pitch-modulated tone with background noise."""
+    rng = np.random.default_rng(0)
+    t = np.arange(int(duration * SAMPLE_RATE)) / SAMPLE_RATE
+    pitch = 150 + 50 * np.sin(2 * np.pi * 0.5 * t)
+    envelope = 0.5 + 0.5 * np.sin(2 * np.pi * 3 * t) ** 2
+    signal = envelope * np.sin(2 * np.pi * np.cumsum(pitch) / SAMPLE_RATE) + 0.02 * rng.standard_normal(len(t))
+    return (signal * 0.3 * 32767).astype(np.int16)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--audio', help=f'{SAMPLE_RATE} Hz WAV file to upload.')
+    parser.add_argument('--duration', type=float, default=30, help='Length of the synthetic recording in seconds.')
+    parser.add_argument('--bandwidth', type=float, default=1000, help='Emulated upload bandwidth in kilobits per second.')
+    parser.add_argument('--latency', type=float, default=0.1, help='Emulated server processing time in seconds.')
+    parser.add_argument('--runs', type=int, default=5)
+    args = parser.parse_args()
+
+    if args.audio:
+        audio_data, sample_rate = sf.read(args.audio, dtype='int16')
+        if audio_data.ndim > 1:
+            audio_data = np.ascontiguousarray(audio_data[:, 0])
+        if sample_rate != SAMPLE_RATE:
+            raise ValueError(f'The recording must be sampled at {SAMPLE_RATE} Hz, not {sample_rate} Hz.')
+    else:
+        audio_data = synthetic_recording(args.duration)
+
+    server = MockTranscriptionServer(latency=args.latency, upload_bandwidth=args.bandwidth * 1000 / 8).start()
+    os.environ.setdefault('OPENAI_API_KEY', 'sk-benchmark')
+    ConfigManager.initialize()
+    ConfigManager.set_config_value(False, 'misc', 'print_to_terminal')
+    ConfigManager.set_config_value(server.base_url, 'model_options', 'api', 'base_url')
+    ConfigManager.set_config_value(SAMPLE_RATE, 'recording_options', 'sample_rate')
+
+    print(f'{len(audio_data) / SAMPLE_RATE:.1f} s of audio, {args.bandwidth:.0f} kbit/s upload')
+    print(f'{"format":<8}{"encode (ms)":>13}{"KB":>10}{"ratio":>8}{"request (ms)":>14}')
+    wav_size = None
+    for upload_format in FORMATS:
+        encode_times = []
+        for _ in range(args.runs):
+            start_time = time.perf_counter()
+            _, byte_io, _ = encode_upload(audio_data, SAMPLE_RATE, upload_format)
+            encode_times.append(time.perf_counter() - start_time)
+        size = len(byte_io.getbuffer())
+        wav_size = wav_size or size
+
+        ConfigManager.set_config_value(upload_format, 'model_options', 'api', 'upload_format')
+        transcribe_api(audio_data)  # Open the connection before timing
+        server.reset_counters()
+        request_times = []
+        for _ in range(args.runs):
+            start_time = time.perf_counter()
+            transcribe_api(audio_data)
+            request_times.append(time.perf_counter() - start_time)
+        assert server.request_bytes >= size * args.runs, 'The encoded file should be uploaded in full'
+
+        print(f'{upload_format:<8}{min(encode_times) * 1000:>13.1f}{size / 1024:>10.1f}'
+              f'{size / wav_size:>8.2f}{sorted(request_times)[len(request_times) // 2] * 1000:>14.0f}')
+    server.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,239 @@
+import asyncio
+import concurrent.futures
+import os
+import threading
+import time
+import httpx
+from openai import AsyncOpenAI
+
+from resilience import call_with_retries_async
+from scheduling import apply_inference_policy
+from transcription import (TranscriptionCancelled, api_breaker, api_chunks, api_request_options,
+                           chunk_request_prompt, encode_api_upload, get_fallback_model, hedge_enabled,
+                           int16_to_float32, join_chunk_texts, post_process_transcription, record_api_failure,
+                           report_chunked_upload, result_cache, rolling_context, transcribe_hedged, transcribe_local)
+from utils import ConfigManager
+
+
+class TranscriptionEngine:
+    """
+    Run transcription jobs on one long-lived asyncio event loop thread.
+
+    API requests are made with AsyncOpenAI, so any number of uploads can be in flight without a
+    thread each, and encoding one job overlaps the uploads of others. Local decoding, the hedged
+    mode and other CPU-bound work runs on a thread pool with the inference scheduling policy
+    applied. Jobs are submitted from any thread and return concurrent.futures.Future objects.
+    """
+
+    def __init__(self):
+        self.loop = None
+        self.thread = None
+        self.executor = None
+        self.clients = {}
+        self.lock = threading.Lock()
+
+    def start(self):
+        """Start the event loop thread and the worker pool, if they are not running yet."""
+        with self.lock:
+            if self.thread:
+                return
+            num_workers = ConfigManager.get_config_value('model_options', 'local', 'num_workers') or 1
+            # Encoding and VAD also run on the pool, so keep a worker free for them
+            self.executor = concurrent.futures.ThreadPoolExecutor(max_workers=num_workers + 1,
+                                                                  thread_name_prefix='transcription',
+                                                                  initializer=apply_inference_policy)
+            self.loop = asyncio.new_event_loop()
+            self.thread = threading.Thread(target=self._run_loop, name='transcription-loop', daemon=True)
+            self.thread.start()
+
+    def _run_loop(self):
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+
+    def stop(self):
+        """Close the API clients, then stop the event loop and the worker pool."""
+        with self.lock:
+            if not self.thread:
+                return
+            try:
+                asyncio.run_coroutine_threadsafe(self._close_clients(), self.loop).result(timeout=5)
+            except Exception as e:
+                ConfigManager.console_print(f'Failed to close async API clients: {e}')
+            self.loop.call_soon_threadsafe(self.loop.stop)
+            self.thread.join()
+            self.loop.close()
+            self.executor.shutdown(wait=False)
+            self.loop = self.thread = self.executor = None
+
+    def submit(self, audio_data, local_model=None, cancel_event=None):
+        """
+        Submit a transcription job from any thread.
+
+        :return: concurrent.futures.Future resolving to the post-processed transcription
+        """
+        self.start()
+        return asyncio.run_coroutine_threadsafe(self.transcribe(audio_data, local_model, cancel_event), self.loop)
+
+    def run(self, audio_data, local_model=None, cancel_event=None):
+        """
+        Submit a transcription job and wait for its result.
+
+        If `cancel_event` is set while waiting, the job is cancelled and TranscriptionCancelled
+        is raised.
+        """
+        future = self.submit(audio_data, local_model, cancel_event)
+        while True:
+            try:
+                return future.result(timeout=0.05)
+            except concurrent.futures.TimeoutError:
+                if cancel_event is not None and cancel_event.is_set():
+                    future.cancel()
+                    raise TranscriptionCancelled()
+
+    async def transcribe(self, audio_data, local_model=None, cancel_event=None):
+        """
+        Transcribe audio data on the event loop, like transcription.transcribe.
+        """
+        if audio_data is None:
+            return ''
+
+        cancel_event = cancel_event or threading.Event()
+        cache_key = result_cache.key(audio_data) if result_cache.enabled() else None
+        transcription = result_cache.get(cache_key) if cache_key else None
+        if transcription is None:
+            start_time = time.time()
+            transcription = await self._decode(audio_data, local_model, cancel_event)
+            if cache_key:
+                result_cache.put(cache_key, transcription, time.time() - start_time)
+
+        rolling_context.add(transcription, local_model)
+        return post_process_transcription(transcription)
+
+    async def _decode(self, audio_data, local_model, cancel_event):
+        """Return the raw transcription from the hedged mode, the API or the local model."""
+        if hedge_enabled():
+            return await self._run_in_executor(cancel_event, transcribe_hedged, int16_to_float32(audio_data),
+                                               local_model, cancel_event)
+        if ConfigManager.get_config_value('model_options', 'use_api'):
+            return await self._transcribe_api_with_fallback(audio_data, local_model, cancel_event)
+        return await self._run_in_executor(cancel_event, transcribe_local, int16_to_float32(audio_data), local_model,
+                                           cancel_event)
+
+    async def _run_in_executor(self, cancel_event, func, *args):
+        """Run a blocking call on the worker pool, setting `cancel_event` if the job is cancelled."""
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self.executor, func, *args)
+        except asyncio.CancelledError:
+            cancel_event.set()
+            raise
+
+    def _get_client(self):
+        """
+        Return the AsyncOpenAI client for the configured base URL and API key.
+
+        Only called on the event loop thread, so no lock is needed.
+        """
+        api_options = ConfigManager.get_config_section('model_options', 'api')
+        base_url = api_options.get('base_url') or 'https://api.openai.com/v1'
+        api_key = os.getenv('OPENAI_API_KEY') or None
+        key = (base_url, api_key)
+
+        client = self.clients.get(key)
+        if client is None:
+            max_connections = api_options.get('max_connections') or 4
+            http_client = httpx.AsyncClient(limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_connections,
+                keepalive_expiry=api_options.get('keepalive_expiry') or 60,
+            ))
+            client = AsyncOpenAI(api_key=api_key, base_url=base_url, http_client=http_client, max_retries=0)
+            self.clients[key] = client
+        return client
+
+    async def _close_clients(self):
+        clients = list(self.clients.values())
+        self.clients.clear()
+        for client in clients:
+            await client.close()
+
+    async def _transcribe_api_with_fallback(self, audio_data, local_model, cancel_event):
+        """
+        Transcribe with the API, falling back to the local model like transcribe_api_with_fallback.
+        """
+        if not ConfigManager.get_config_value('model_options', 'api', 'fallback_to_local'):
+            return await self._transcribe_api(audio_data, cancel_event)
+
+        if api_breaker.allow_request():
+            try:
+                transcription = await self._transcribe_api(audio_data, cancel_event)
+                api_breaker.record_success()
+                return transcription
+            except TranscriptionCancelled:
+                raise
+            except Exception as e:
+                record_api_failure(e)
+
+        api_breaker.record_fallback()
+        local_model = await self._run_in_executor(cancel_event, get_fallback_model, local_model)
+        return await self._run_in_executor(cancel_event, transcribe_local, int16_to_float32(audio_data), local_model,
+                                           cancel_event)
+
+    async def _transcribe_api(self, audio_data, cancel_event):
+        """
+        Transcribe with the API, uploading long recordings as concurrent chunks like transcribe_api.
+        """
+        model_options = ConfigManager.get_config_section('model_options')
+        sample_rate = ConfigManager.get_config_section('recording_options').get('sample_rate') or 16000
+        prompt = rolling_context.prompt(model_options['common']['initial_prompt'])
+
+        chunks = await asyncio.get_running_loop().run_in_executor(self.executor, api_chunks, audio_data,
+                                                                  model_options, sample_rate)
+        if not chunks:
+            return await self._request(audio_data, sample_rate, model_options, prompt, cancel_event)
+
+        parallel_requests = model_options['api'].get('max_parallel_requests') or 4
+        ConfigManager.console_print(f'Uploading {len(chunks)} chunks, {parallel_requests} at a time...')
+        semaphore = asyncio.Semaphore(parallel_requests)
+        texts = [None] * len(chunks)
+        request_times = [0.0] * len(chunks)
+
+        async def request_chunk(index):
+            async with semaphore:
+                start, end = chunks[index]
+                request_start = time.time()
+                texts[index] = await self._request(audio_data[start:end], sample_rate, model_options,
+                                                   chunk_request_prompt(texts, index, prompt, model_options),
+                                                   cancel_event)
+                request_times[index] = time.time() - request_start
+
+        start_time = time.time()
+        await asyncio.gather(*(request_chunk(index) for index in range(len(chunks))))
+        report_chunked_upload(time.time() - start_time, request_times, parallel_requests)
+        return join_chunk_texts(texts)
+
+    async def _request(self, audio_data, sample_rate, model_options, prompt, cancel_event):
+        """
+        Encode audio on the worker pool and send it, retrying transient failures.
+
+        If `cancel_event` is set meanwhile, the request is cancelled and TranscriptionCancelled
+        is raised, as in the thread-based path.
+        """
+        upload = await asyncio.get_running_loop().run_in_executor(self.executor, encode_api_upload, audio_data,
+                                                                  sample_rate, model_options)
+        client = self._get_client()
+
+        async def attempt():
+            upload[1].seek(0)
+            return await client.audio.transcriptions.create(file=upload, **api_request_options(model_options, prompt))
+
+        request = asyncio.ensure_future(call_with_retries_async(attempt, api_breaker.record_retry))
+        while True:
+            done, _ = await asyncio.wait({request}, timeout=0.05)
+            if done:
+                return request.result().text
+            if cancel_event.is_set():
+                request.cancel()
+                raise TranscriptionCancelled()
+
+
+transcription_engine = TranscriptionEngine()
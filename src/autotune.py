@@ -0,0 +1,159 @@
+import argparse
+import ctypes
+import multiprocessing
+import os
+import sys
+import time
+
+from utils import ConfigManager
+
+COMPUTE_TYPES = ['int8', 'int8_float32', 'float32']
+MODELS = ['tiny', 'base', 'small']
+SAMPLE_RATE = 16000
+SAMPLE_DURATION = 10
+
+
+def _peak_memory_mb():
+    """
+    Return the peak resident memory of the current process in MB.
+    """
+    if sys.platform == 'win32':
+        from ctypes import wintypes
+
+        class PROCESS_MEMORY_COUNTERS(ctypes.Structure):
+            _fields_ = [
+                ('cb', wintypes.DWORD),
+                ('PageFaultCount', wintypes.DWORD),
+                ('PeakWorkingSetSize', ctypes.c_size_t),
+                ('WorkingSetSize', ctypes.c_size_t),
+                ('QuotaPeakPagedPoolUsage', ctypes.c_size_t),
+                ('QuotaPagedPoolUsage', ctypes.c_size_t),
+                ('QuotaPeakNonPagedPoolUsage', ctypes.c_size_t),
+                ('QuotaNonPagedPoolUsage', ctypes.c_size_t),
+                ('PagefileUsage', ctypes.c_size_t),
+                ('PeakPagefileUsage', ctypes.c_size_t),
+            ]
+
+        counters = PROCESS_MEMORY_COUNTERS()
+        counters.cb = ctypes.sizeof(PROCESS_MEMORY_COUNTERS)
+        process = ctypes.windll.kernel32.GetCurrentProcess()
+        ctypes.windll.psapi.GetProcessMemoryInfo(process, ctypes.byref(counters), counters.cb)
+        return counters.PeakWorkingSetSize / 1024 / 1024
+
+    import resource
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in kilobytes elsewhere
+    return peak / 1024 / 1024 if sys.platform == 'darwin' else peak / 1024
+
+
+def _benchmark_candidate(model, compute_type, cpu_threads, audio_data, language, runs):
+    """
+    Load one candidate configuration and measure its real-time factor.
+
+    Runs in a fresh process so that the peak memory belongs to this candidate alone.
+
+    :return: (real-time factor, peak memory in MB)
+    """
+    from faster_whisper import WhisperModel
+
+    whisper_model = WhisperModel(model, device='cpu', compute_type=compute_type, cpu_threads=cpu_threads)
+
+    # Warm up once so that one-off initialization is not measured
+    list(whisper_model.transcribe(audio_data, language=language)[0])
+
+    timings = []
+    for _ in range(runs):
+        start_time = time.perf_counter()
+        list(whisper_model.transcribe(audio_data, language=language)[0])
+        timings.append(time.perf_counter() - start_time)
+
+    duration = len(audio_data) / SAMPLE_RATE
+    return min(timings) / duration, _peak_memory_mb()
+
+
+def _load_sample(audio_path):
+    """
+    Load the benchmark sample, or record one from the microphone if no path is given.
+    """
+    if audio_path:
+        import soundfile as sf
+        audio_data, sample_rate = sf.read(audio_path, dtype='float32')
+        if audio_data.ndim > 1:
+            audio_data = audio_data[:, 0]
+        if sample_rate != SAMPLE_RATE:
+            raise ValueError(f'The benchmark sample must be sampled at {SAMPLE_RATE} Hz, not {sample_rate} Hz.')
+        return audio_data
+
+    import sounddevice as sd
+    print(f'No sample given. Speak for {SAMPLE_DURATION} seconds after the beep to record one...')
+    print('\a', end='', flush=True)
+    audio_data = sd.rec(SAMPLE_DURATION * SAMPLE_RATE, samplerate=SAMPLE_RATE, channels=1, dtype='float32')
+    sd.wait()
+    return audio_data[:, 0]
+
+
+def _thread_candidates():
+    """Return the candidate CPU thread counts: all, half and a quarter of the cores."""
+    cores = os.cpu_count() or 1
+    return sorted({cores, max(1, cores // 2), max(1, cores // 4)}, reverse=True)
+
+
+def autotune(argv=None):
+    """
+    Benchmark combinations of model, compute type and CPU threads, and save the best one.
+
+    The largest model with a configuration meeting the target real-time factor is chosen, using
+    its fastest compute type and thread count.
+    """
+    parser = argparse.ArgumentParser(prog='run.py --autotune',
+                                     description='Find the fastest local model configuration for this machine.')
+    parser.add_argument('--audio', help=f'{SAMPLE_RATE} Hz WAV file of speech to benchmark with. '
+                                        'If omitted, a sample is recorded from the microphone.')
+    parser.add_argument('--target-rtf', type=float, default=0.3,
+                        help='Maximum real-time factor (decode time / audio duration) to accept.')
+    parser.add_argument('--models', nargs='+', default=MODELS, help='Model sizes to try.')
+    parser.add_argument('--runs', type=int, default=3, help='Timed runs per candidate.')
+    parser.add_argument('--dry-run', action='store_true', help='Print the results without saving them.')
+    args = parser.parse_args(argv)
+
+    ConfigManager.initialize()
+    language = ConfigManager.get_config_value('model_options', 'common', 'language')
+    audio_data = _load_sample(args.audio)
+
+    candidates = [(model, compute_type, cpu_threads)
+                  for model in args.models
+                  for compute_type in COMPUTE_TYPES
+                  for cpu_threads in _thread_candidates()]
+
+    print(f'{"model":<10}{"compute type":<15}{"threads":>8}{"RTF":>8}{"peak MB":>10}')
+    results = []
+    context = multiprocessing.get_context('spawn')
+    for model, compute_type, cpu_threads in candidates:
+        with context.Pool(1) as pool:
+            try:
+                rtf, peak_memory = pool.apply(_benchmark_candidate,
+                                              (model, compute_type, cpu_threads, audio_data, language, args.runs))
+            except Exception as e:
+                print(f'{model:<10}{compute_type:<15}{cpu_threads:>8}  failed: {e}')
+                continue
+        results.append((model, compute_type, cpu_threads, rtf, peak_memory))
+        print(f'{model:<10}{compute_type:<15}{cpu_threads:>8}{rtf:>8.3f}{peak_memory:>10.0f}')
+
+    fitting = [result for result in results if result[3] <= args.target_rtf]
+    if not fitting:
+        print(f'No configuration reached the target real-time factor of {args.target_rtf}.')
+        return
+
+    model_sizes = {model: index for index, model in enumerate(args.models)}
+    best = min(fitting, key=lambda result: (-model_sizes[result[0]], result[3]))
+    model, compute_type, cpu_threads, rtf, _ = best
+    print(f'Best configuration: model={model}, compute_type={compute_type}, cpu_threads={cpu_threads} (RTF {rtf:.3f})')
+
+    if args.dry_run:
+        return
+    ConfigManager.set_config_value(model, 'model_options', 'local', 'model')
+    ConfigManager.set_config_value(compute_type, 'model_options', 'local', 'compute_type')
+    ConfigManager.set_config_value(cpu_threads, 'model_options', 'local', 'cpu_threads')
+    ConfigManager.set_config_value('cpu', 'model_options', 'local', 'device')
+    ConfigManager.save_config()
+    print('Saved to config.yaml.')
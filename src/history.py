@@ -0,0 +1,223 @@
+import json
+import os
+import queue
+import re
+import sqlite3
+import threading
+import time
+from itertools import groupby
+from operator import itemgetter
+
+from utils import ConfigManager
+
+DEFAULT_HISTORY_PATH = os.path.join('src', 'history.sqlite3')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS transcriptions (
+    id INTEGER PRIMARY KEY,
+    created REAL NOT NULL,
+    text TEXT NOT NULL,
+    duration REAL,
+    model TEXT,
+    latencies TEXT
+);
+"""
+
+# An external-content index, so the text is only stored once. The triggers keep it in sync.
+FTS_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS transcriptions_fts USING fts5(
+    text, content='transcriptions', content_rowid='id', prefix='2 3'
+);
+CREATE TRIGGER IF NOT EXISTS transcriptions_insert AFTER INSERT ON transcriptions BEGIN
+    INSERT INTO transcriptions_fts (rowid, text) VALUES (new.id, new.text);
+END;
+CREATE TRIGGER IF NOT EXISTS transcriptions_delete AFTER DELETE ON transcriptions BEGIN
+    INSERT INTO transcriptions_fts (transcriptions_fts, rowid, text) VALUES ('delete', old.id, old.text);
+END;
+CREATE TRIGGER IF NOT EXISTS transcriptions_update AFTER UPDATE OF text ON transcriptions BEGIN
+    INSERT INTO transcriptions_fts (transcriptions_fts, rowid, text) VALUES ('delete', old.id, old.text);
+    INSERT INTO transcriptions_fts (rowid, text) VALUES (new.id, new.text);
+END;
+"""
+
+COLUMNS = 'id, created, text, duration, model, latencies'
+
+INSERT_SQL = 'INSERT INTO transcriptions (created, text, duration, model, latencies) VALUES (?, ?, ?, ?, ?)'
+# Rewrites the newest transcription that has the old text
+REPLACE_SQL = 'UPDATE transcriptions SET text = ? WHERE id = (SELECT MAX(id) FROM transcriptions WHERE text = ?)'
+
+
+def current_model_name():
+    """Return the name of the configured API or local model, for the history."""
+    model_options = ConfigManager.get_config_section('model_options')
+    if model_options.get('use_api'):
+        return model_options['api'].get('model')
+    local_model_options = model_options.get('local', {})
+    return local_model_options.get('model_path') or local_model_options.get('model')
+
+
+class TranscriptionHistory:
+    """
+    Keep past transcriptions in SQLite with a full-text index, so they can be searched and typed again.
+
+    `add` and `replace` only put the change on a queue, so the typing path never waits for the
+    disk. A background thread writes whatever has queued up in one transaction, in order, at most
+    every `FLUSH_INTERVAL` seconds. Searches read the FTS5 index in rowid order and stop at the limit,
+    so they return the newest matches without sorting every match, however large the history is.
+    """
+
+    FLUSH_INTERVAL = 0.5
+    MAX_BATCH = 500
+
+    def __init__(self, path=None):
+        """
+        :param path: The database file. Defaults to `misc.history_path`.
+        """
+        self.path = path
+        self.queue = queue.Queue()
+        self.thread = None
+        self.connection = None
+        self.fts = True
+        self.failed = False
+        self.lock = threading.Lock()
+
+    def enabled(self):
+        return bool(ConfigManager.get_config_value('misc', 'history'))
+
+    def _connect(self):
+        path = os.path.expanduser(self.path or ConfigManager.get_config_value('misc', 'history_path')
+                                  or DEFAULT_HISTORY_PATH)
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        connection = sqlite3.connect(path, check_same_thread=False)
+        connection.row_factory = sqlite3.Row
+        # Write-ahead logging lets searches read while the writer thread commits
+        connection.execute('PRAGMA journal_mode=WAL')
+        connection.execute('PRAGMA synchronous=NORMAL')
+        return connection
+
+    def start(self):
+        """Open the database and start the writer thread, if they are not running yet."""
+        with self.lock:
+            if self.thread:
+                return
+            writer = self._connect()
+            writer.executescript(SCHEMA)
+            try:
+                writer.executescript(FTS_SCHEMA)
+            except sqlite3.OperationalError as e:
+                ConfigManager.console_print(f'Full-text search is not available ({e}), searching history by scanning.')
+                self.fts = False
+            self.connection = self._connect()
+            self.thread = threading.Thread(target=self._write_loop, args=(writer,), name='history-writer',
+                                           daemon=True)
+            self.thread.start()
+
+    def stop(self):
+        """Write the queued entries, then stop the writer thread and close the database."""
+        with self.lock:
+            if not self.thread:
+                return
+            self.queue.put(None)
+            self.thread.join()
+            self.connection.close()
+            self.thread = self.connection = None
+
+    def add(self, text, duration=None, model=None, latencies=None):
+        """
+        Queue a transcription to be written to the history. Returns without waiting for the disk.
+
+        :param duration: Length of the recording in seconds
+        :param latencies: Mapping of stage names to their durations in seconds
+        """
+        if not text.strip() or self.failed:
+            return
+        try:
+            self.start()
+        except (OSError, sqlite3.Error) as e:
+            ConfigManager.console_print(f'Failed to open the transcription history: {e}')
+            self.failed = True
+            return
+        self.queue.put((INSERT_SQL, (time.time(), text, duration, model,
+                                     json.dumps(latencies) if latencies else None)))
+
+    def replace(self, text, new_text):
+        """
+        Queue rewriting the newest transcription of `text` as `new_text`, e.g. once a typed draft
+        has been corrected. Returns without waiting for the disk.
+        """
+        if not text.strip() or not new_text.strip() or self.failed or not self.thread:
+            return
+        self.queue.put((REPLACE_SQL, (new_text, text)))
+
+    def flush(self):
+        """Wait until every queued entry has been written."""
+        self.queue.join()
+
+    def _write_loop(self, connection):
+        stopping = False
+        while not stopping:
+            entries = []
+            entry = self.queue.get()
+            deadline = time.monotonic() + self.FLUSH_INTERVAL
+            while True:
+                if entry is None:
+                    stopping = True
+                else:
+                    entries.append(entry)
+                if stopping or len(entries) >= self.MAX_BATCH:
+                    break
+                try:
+                    entry = self.queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+            if entries:
+                try:
+                    with connection:
+                        for sql, group in groupby(entries, key=itemgetter(0)):
+                            connection.executemany(sql, [parameters for _, parameters in group])
+                except sqlite3.Error as e:
+                    ConfigManager.console_print(f'Failed to write {len(entries)} changes to the history: {e}')
+            for _ in range(len(entries) + stopping):
+                self.queue.task_done()
+        connection.close()
+
+    def _query(self, sql, parameters):
+        self.start()
+        with self.lock:
+            rows = self.connection.execute(sql, parameters).fetchall()
+        entries = [dict(row) for row in rows]
+        for entry in entries:
+            entry['latencies'] = json.loads(entry['latencies']) if entry['latencies'] else {}
+        return entries
+
+    def recent(self, limit=50):
+        """Return the newest transcriptions, newest first."""
+        return self._query(f'SELECT {COLUMNS} FROM transcriptions ORDER BY id DESC LIMIT ?', (limit,))
+
+    def search(self, query, limit=50):
+        """
+        Return the newest transcriptions containing every word of the query, newest first.
+
+        Each word also matches longer words starting with it, so results update as the query is typed.
+        """
+        words = re.findall(r'\w+', query)
+        if not words:
+            return self.recent(limit)
+        if not self.fts:
+            conditions = ' AND '.join(['text LIKE ?'] * len(words))
+            return self._query(f'SELECT {COLUMNS} FROM transcriptions WHERE {conditions} ORDER BY id DESC LIMIT ?',
+                               [f'%{word}%' for word in words] + [limit])
+        match = ' '.join(f'"{word}"*' for word in words)
+        return self._query(f'SELECT {COLUMNS} FROM transcriptions WHERE id IN ('
+                           'SELECT rowid FROM transcriptions_fts WHERE transcriptions_fts MATCH ? '
+                           'ORDER BY rowid DESC LIMIT ?) ORDER BY id DESC', (match, limit))
+
+    def count(self):
+        """Return the number of transcriptions written to the history."""
+        self.start()
+        with self.lock:
+            return self.connection.execute('SELECT COUNT(*) FROM transcriptions').fetchone()[0]
+
+
+transcription_history = TranscriptionHistory()
@@ -58,6 +58,9 @@ if sys.platform == 'win32':
     _user32.GetCursorPos.argtypes = [ctypes.POINTER(wintypes.POINT)]
     _user32.GetCursorPos.restype = wintypes.BOOL
 
+# Linux input event codes of the keys that can be pressed by name with ydotool
+YDOTOOL_KEY_CODES = {'backspace': 14, 'tab': 15, 'enter': 28}
+
 def run_command_or_exit_on_failure(command):
     """
     Run a shell command and exit if it fails.
@@ -245,6 +248,52 @@ class InputSimulator:
         elif self.input_method == 'dotool':
             self._typewrite_dotool(text, interval)
 
+    def backspace(self, count):
+        """
+        Simulate pressing the Backspace key a number of times.
+
+        Args:
+            count (int): The number of characters to delete.
+        """
+        self.press_key('backspace', count)
+
+    def press_key(self, key, count=1):
+        """
+        Simulate pressing a named key a number of times.
+
+        Args:
+            key (str): The key to press: 'backspace', 'enter' or 'tab'.
+            count (int): The number of times to press it.
+        """
+        if count <= 0:
+            return
+        self._restore_target_window()
+        if self.input_method == 'pynput':
+            from pynput.keyboard import Key
+            for _ in range(count):
+                self.keyboard.press(getattr(Key, key))
+                self.keyboard.release(getattr(Key, key))
+        elif self.input_method == 'ydotool':
+            code = YDOTOOL_KEY_CODES[key]
+            run_command_or_exit_on_failure(['ydotool', 'key'] + [f'{code}:1', f'{code}:0'] * count)
+        elif self.input_method == 'dotool':
+            assert self.dotool_process and self.dotool_process.stdin
+            self.dotool_process.stdin.write(f'key {key}\n' * count)
+            self.dotool_process.stdin.flush()
+
+    def perform(self, actions):
+        """
+        Type text and press keys in order.
+
+        Args:
+            actions (list): Strings to type and KeyPress actions from spoken commands.
+        """
+        for action in actions:
+            if isinstance(action, str):
+                self.typewrite(action)
+            else:
+                self.press_key(action.key, action.count)
+
     def _typewrite_pynput(self, text, interval):
         """
         Simulate typing using pynput via clipboard paste for instant input.
@@ -0,0 +1,330 @@
+import re
+
+from utils import ConfigManager
+
+TOKEN_PATTERN = re.compile(r"[ap]\.m\.|[^\W\d_]+(?:'[^\W\d_]+)?", re.IGNORECASE)
+
+
+class EnglishNormalizer:
+    """
+    Rewrite spelled-out English numbers, dates, times, currency and units in written form.
+
+    For example, "twenty five percent" becomes "25%", "March third twenty twenty four" becomes
+    "March 3, 2024" and "three thirty p m" becomes "3:30 p.m.". The grammar is a set of word
+    tables and a small state machine for cardinals, run once over the words of the text.
+    Standalone numbers and ordinals below ten are left as words, so phrases like "one of them"
+    and "first of all" are kept. Runs of number words that do not make up one number, such as
+    "seven eleven" or "eleven thirty" without a.m. or p.m., could be times, names or codes, so
+    they are kept as words too.
+    """
+
+    DIGITS = {'zero': 0, 'one': 1, 'two': 2, 'three': 3, 'four': 4, 'five': 5, 'six': 6, 'seven': 7,
+              'eight': 8, 'nine': 9}
+    TEENS = {'ten': 10, 'eleven': 11, 'twelve': 12, 'thirteen': 13, 'fourteen': 14, 'fifteen': 15,
+             'sixteen': 16, 'seventeen': 17, 'eighteen': 18, 'nineteen': 19}
+    TENS = {'twenty': 20, 'thirty': 30, 'forty': 40, 'fifty': 50, 'sixty': 60, 'seventy': 70, 'eighty': 80,
+            'ninety': 90}
+    SCALES = {'thousand': 10 ** 3, 'million': 10 ** 6, 'billion': 10 ** 9, 'trillion': 10 ** 12}
+    ORDINALS = {'first': 1, 'second': 2, 'third': 3, 'fourth': 4, 'fifth': 5, 'sixth': 6, 'seventh': 7,
+                'eighth': 8, 'ninth': 9, 'tenth': 10, 'eleventh': 11, 'twelfth': 12, 'thirteenth': 13,
+                'fourteenth': 14, 'fifteenth': 15, 'sixteenth': 16, 'seventeenth': 17, 'eighteenth': 18,
+                'nineteenth': 19, 'twentieth': 20, 'thirtieth': 30, 'fortieth': 40, 'fiftieth': 50,
+                'sixtieth': 60, 'seventieth': 70, 'eightieth': 80, 'ninetieth': 90}
+    MONTHS = {month.lower(): month for month in (
+        'January', 'February', 'March', 'April', 'May', 'June', 'July', 'August', 'September', 'October',
+        'November', 'December')}
+    CURRENCIES = {'dollar': '$', 'dollars': '$', 'euro': '€', 'euros': '€'}
+    CENTS = {'cent', 'cents'}
+    MERIDIEMS = {'am': 'a.m.', 'a.m.': 'a.m.', 'pm': 'p.m.', 'p.m.': 'p.m.'}
+    # Units by their spoken words. Symbols starting with a space are separated from the number.
+    UNITS = {
+        ('percent',): '%', ('per', 'cent'): '%',
+        ('degrees',): '°', ('degrees', 'celsius'): ' °C', ('degrees', 'fahrenheit'): ' °F',
+        ('millimeters',): ' mm', ('millimetres',): ' mm', ('centimeters',): ' cm', ('centimetres',): ' cm',
+        ('meters',): ' m', ('metres',): ' m', ('kilometers',): ' km', ('kilometres',): ' km',
+        ('kilometers', 'per', 'hour'): ' km/h', ('kilometres', 'per', 'hour'): ' km/h',
+        ('miles', 'per', 'hour'): ' mph',
+        ('grams',): ' g', ('kilograms',): ' kg', ('kilos',): ' kg', ('milliliters',): ' ml', ('millilitres',): ' ml',
+        ('liters',): ' l', ('litres',): ' l',
+        ('milliseconds',): ' ms', ('kilobytes',): ' KB', ('megabytes',): ' MB', ('gigabytes',): ' GB',
+        ('terabytes',): ' TB', ('megahertz',): ' MHz', ('gigahertz',): ' GHz',
+    }
+    MAX_UNIT_WORDS = max(len(words) for words in UNITS)
+
+    TRIGGERS = set(DIGITS) | set(TEENS) | set(TENS) | set(ORDINALS) | set(MONTHS)
+    NUMBER_WORDS = set(DIGITS) | set(TEENS) | set(TENS) | set(SCALES) | {'hundred'}
+
+    def __init__(self, text):
+        self.text = text
+        self.tokens = [(match.start(), match.end(), match.group().lower()) for match in TOKEN_PATTERN.finditer(text)]
+        self.words = [token[2] for token in self.tokens]
+        # The text between each word and the one before it, and whether it only joins words of one number
+        self.gaps = [''] + [text[self.tokens[index - 1][1]:self.tokens[index][0]]
+                            for index in range(1, len(self.tokens))]
+        self.joined = [False] + [gap.strip(' -') == '' for gap in self.gaps[1:]]
+
+    @classmethod
+    def normalize(cls, text):
+        """Return the text with the spoken forms rewritten."""
+        return cls(text).rewrite() if not cls.TRIGGERS.isdisjoint(TOKEN_PATTERN.findall(text.lower())) else text
+
+    def rewrite(self):
+        pieces = []
+        position = 0
+        index = 0
+        while index < len(self.words):
+            match = self._match(index) if self.words[index] in self.TRIGGERS else None
+            if match is None:
+                index += 1
+                continue
+            end, replacement = match
+            pieces.append(self.text[position:self.tokens[index][0]])
+            pieces.append(replacement)
+            position = self.tokens[end - 1][1]
+            # "p m." becomes "p.m." rather than "p.m.."
+            if replacement.endswith('.') and self.text.startswith('.', position):
+                position += 1
+            index = end
+        pieces.append(self.text[position:])
+        return ''.join(pieces)
+
+    def _next(self, index, words):
+        """Return whether the word at `index` is in `words` and joined to the word before it."""
+        return index < len(self.words) and self.joined[index] and self.words[index] in words
+
+    def _match(self, index):
+        """Return the end index and written form of the expression starting at `index`, or None."""
+        if self.words[index] in self.MONTHS:
+            return self._date(index)
+        time = self._time(index)
+        if time:
+            return time
+
+        number = self._number(index)
+        if number is None:
+            return None
+        value, written, end, ordinal = number
+        if ordinal:
+            # "the fifth of May" is kept as "the 5th of May"
+            if value >= 10 or (self._next(end, {'of'}) and self._next(end + 1, self.MONTHS)):
+                return end, written
+            return None
+
+        currency = self._currency(written, end)
+        if currency:
+            return currency
+        if (self.joined[index] and index and self.words[index - 1] in self.NUMBER_WORDS
+                or self._next(end, self.NUMBER_WORDS | {'oh'})):
+            return None
+        for length in range(self.MAX_UNIT_WORDS, 0, -1):
+            unit = tuple(self.words[end:end + length])
+            if len(unit) == length and unit in self.UNITS and all(self.joined[end:end + length]):
+                return end + length, written + self.UNITS[unit]
+        if value < 10 and '.' not in written:
+            return None
+        return end, written
+
+    def _two_digits(self, index):
+        """Parse a number from 10 to 99 spoken as one or two words."""
+        if index >= len(self.words):
+            return None
+        word = self.words[index]
+        if word in self.TEENS:
+            return self.TEENS[word], index + 1
+        if word in self.TENS:
+            if self._next(index + 1, self.DIGITS) and self.DIGITS[self.words[index + 1]]:
+                return self.TENS[word] + self.DIGITS[self.words[index + 1]], index + 2
+            return self.TENS[word], index + 1
+        return None
+
+    def _cardinal(self, index):
+        """
+        Parse a cardinal number such as "one hundred and twenty three thousand four hundred".
+
+        :return: The value and end index, or None
+        """
+        total = group = 0
+        last = None
+        scale = None
+        end = None
+        while index < len(self.words) and (last is None or self.joined[index]):
+            word = self.words[index]
+            if word in self.DIGITS and last in (None, 'tens', 'hundred', 'scale', 'and'):
+                if self.DIGITS[word] == 0 and last is not None:
+                    break
+                group += self.DIGITS[word]
+                last = 'digit' if last != 'tens' else 'tens digit'
+            elif word in self.TEENS and last in (None, 'hundred', 'scale', 'and'):
+                group += self.TEENS[word]
+                last = 'teen'
+            elif word in self.TENS and last in (None, 'hundred', 'scale', 'and'):
+                group += self.TENS[word]
+                last = 'tens'
+            elif word == 'hundred' and (last in ('digit', 'teen') or last in ('tens', 'tens digit') and scale is None):
+                group *= 100
+                last = 'hundred'
+            elif (word in self.SCALES and last not in (None, 'and', 'scale') and group
+                  and (scale is None or self.SCALES[word] < scale)):
+                scale = self.SCALES[word]
+                total += group * scale
+                group = 0
+                last = 'scale'
+            elif word == 'and' and last in ('hundred', 'scale') and group % 100 == 0:
+                last = 'and'
+                index += 1
+                continue
+            else:
+                break
+            index += 1
+            end = index
+        if end is None:
+            return None
+        return total + group, end
+
+    def _year(self, index):
+        """
+        Parse a year spoken in pairs, such as "nineteen oh five" or "twenty twenty four".
+
+        Pairs starting with an hour, such as "eleven thirty", are more likely a time, so the first
+        pair is from thirteen to twenty.
+        """
+        first = self._two_digits(index)
+        if first is None or not 13 <= first[0] <= 20:
+            return None
+        value, end = first
+        if self._next(end, {'hundred'}):
+            return value * 100, end + 1
+        if self._next(end, {'oh'}) and self._next(end + 1, self.DIGITS) and self.DIGITS[self.words[end + 1]]:
+            return value * 100 + self.DIGITS[self.words[end + 1]], end + 2
+        second = self._two_digits(end) if end < len(self.words) and self.joined[end] else None
+        if second is None:
+            return None
+        return value * 100 + second[0], second[1]
+
+    def _number(self, index):
+        """
+        Parse a year, ordinal, cardinal or decimal number.
+
+        :return: The value, its written form, the end index and whether it is an ordinal, or None
+        """
+        year = self._year(index)
+        if year:
+            return year[0], str(year[0]), year[1], False
+        word = self.words[index]
+        if word in self.ORDINALS:
+            value = self.ORDINALS[word]
+            return value, f'{value}{_ordinal_suffix(value)}', index + 1, True
+
+        cardinal = self._cardinal(index)
+        if cardinal is None:
+            return None
+        value, end = cardinal
+        # "twenty first" is the tens followed by an ordinal
+        if self._next(end, self.ORDINALS):
+            ordinal = self.ORDINALS[self.words[end]]
+            if (value % 100 == 0 and value) or (value % 10 == 0 and value % 100 >= 20 and ordinal < 10):
+                value += ordinal
+                return value, f'{value}{_ordinal_suffix(value)}', end + 1, True
+
+        written = f'{value:,}' if value >= 10000 else str(value)
+        if self._next(end, {'point'}) and self._next(end + 1, self.DIGITS):
+            end += 1
+            decimals = ''
+            while self._next(end, self.DIGITS):
+                decimals += str(self.DIGITS[self.words[end]])
+                end += 1
+            return value, f'{written}.{decimals}', end, False
+        return value, written, end, False
+
+    def _currency(self, written, end):
+        """Parse a currency after an amount, such as "dollars" or "dollars and fifty cents"."""
+        if not self._next(end, self.CURRENCIES):
+            return None
+        symbol = self.CURRENCIES[self.words[end]]
+        end += 1
+        if self._next(end, {'and'}) and '.' not in written:
+            cents = self._two_digits(end + 1) if self.joined[end + 1:end + 2] == [True] else None
+            if cents is None and self._next(end + 1, self.DIGITS):
+                cents = self.DIGITS[self.words[end + 1]], end + 2
+            if cents and self._next(cents[1], self.CENTS):
+                return cents[1] + 1, f'{symbol}{written}.{cents[0]:02d}'
+        return end, f'{symbol}{written}'
+
+    def _time(self, index):
+        """Parse a time with a.m., p.m. or o'clock, such as "three thirty p m" or "ten o'clock"."""
+        hour = self.DIGITS.get(self.words[index]) or self.TEENS.get(self.words[index])
+        if not hour or hour > 12:
+            return None
+        end = index + 1
+        minutes = None
+        if self._next(end, {'oh'}) and self._next(end + 1, self.DIGITS) and self.DIGITS[self.words[end + 1]]:
+            minutes, end = self.DIGITS[self.words[end + 1]], end + 2
+        elif end < len(self.words) and self.joined[end]:
+            two_digits = self._two_digits(end)
+            if two_digits and two_digits[0] < 60:
+                minutes, end = two_digits
+
+        written = f'{hour}:{minutes:02d}' if minutes is not None else str(hour)
+        if self._next(end, self.MERIDIEMS):
+            return end + 1, f'{written} {self.MERIDIEMS[self.words[end]]}'
+        if self._next(end, {'a', 'p'}) and self._next(end + 1, {'m'}):
+            return end + 2, f'{written} {self.words[end]}.m.'
+        if minutes is None and self._next(end, {"o'clock"}):
+            return end + 1, f"{hour} o'clock"
+        return None
+
+    def _date(self, index):
+        """Parse a month followed by a day and an optional year, such as "March third twenty twenty four"."""
+        month = self.MONTHS[self.words[index]]
+        day = None
+        end = index + 1
+        if self._next(end, {'the'}):
+            end += 1
+        if end < len(self.words) and self.joined[end]:
+            number = self._number(end)
+            if number and not (number[0] >= 100 and not number[3]):
+                day = number
+        if day is None or not 1 <= day[0] <= 31:
+            return None
+        end = day[2]
+
+        written = f'{month} {day[0]}'
+        if end < len(self.words) and self.gaps[end].strip(' ,') == '':
+            year = self._year(end)
+            if year is None:
+                cardinal = self._cardinal(end)
+                year = cardinal if cardinal and 1000 <= cardinal[0] < 10000 else None
+            if year:
+                return year[1], f'{written}, {year[0]}'
+        return end, written
+
+
+def _ordinal_suffix(value):
+    if value % 100 in (11, 12, 13):
+        return 'th'
+    return {1: 'st', 2: 'nd', 3: 'rd'}.get(value % 10, 'th')
+
+
+# Grammars by ISO-639-1 language code
+NORMALIZERS = {
+    'en': EnglishNormalizer,
+}
+
+_unsupported_languages = set()
+
+
+def get_normalizer(language=None):
+    """
+    Return the inverse text normalizer for a language, or None if it is disabled or unsupported.
+
+    :param language: The transcription language. English is used if it is not known.
+    :return: A class whose `normalize(text)` rewrites the text
+    """
+    if not ConfigManager.get_config_value('post_processing', 'inverse_text_normalization'):
+        return None
+    language = (language or 'en').split('-')[0].lower()
+    normalizer = NORMALIZERS.get(language)
+    if normalizer is None and language not in _unsupported_languages:
+        _unsupported_languages.add(language)
+        ConfigManager.console_print(f"Inverse text normalization is not available for '{language}'.")
+    return normalizer
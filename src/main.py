@@ -3,16 +3,21 @@ import sys
 import time
 from audioplayer import AudioPlayer
 from pynput.keyboard import Controller
-from PyQt5.QtCore import QObject, QProcess
+from PyQt5.QtCore import QObject, QProcess, QTimer
 from PyQt5.QtGui import QIcon
 from PyQt5.QtWidgets import QApplication, QSystemTrayIcon, QMenu, QAction, QMessageBox
 
+from async_engine import transcription_engine
+from history import transcription_history
 from key_listener import KeyListener, KeyCode
-from result_thread import ResultThread
+from result_thread import RefineThread, ResultThread
+from scheduling import latency_probe
+from spoken_commands import create_command_expander
+from ui.history_window import HistoryWindow
 from ui.main_window import MainWindow
 from ui.settings_window import SettingsWindow
 from ui.status_window import StatusWindow
-from transcription import create_local_model
+from transcription import api_breaker, clear_api_clients, create_local_model, hedge_enabled, hedge_stats
 from input_simulation import InputSimulator
 from utils import ConfigManager
 
@@ -43,6 +48,7 @@ class WhisperWriterApp(QObject):
         Initialize the components of the application.
         """
         self.input_simulator = InputSimulator()
+        self.command_expander = create_command_expander()
 
         self.key_listener = KeyListener()
         self.key_listener.add_callback("on_activate", self.on_activation)
@@ -51,15 +57,31 @@ class WhisperWriterApp(QObject):
 
         model_options = ConfigManager.get_config_section('model_options')
         model_path = model_options.get('local', {}).get('model_path')
-        self.local_model = create_local_model() if not model_options.get('use_api') else None
+        # Hedged API transcriptions race against the local model, so it is loaded for them too
+        self.local_model = create_local_model() if not model_options.get('use_api') or hedge_enabled() else None
+
+        # The draft model gives a fast first result, which the main model then refines
+        draft_model_name = model_options.get('local', {}).get('draft_model')
+        self.draft_model = None
+        if draft_model_name and not model_options.get('use_api'):
+            self.draft_model = create_local_model(draft_model_name)
 
         self.result_thread = None
+        self.refine_threads = []
+        self.last_typed = ''
+        self.refine_count = 0
+        self.correction_count = 0
 
         self.main_window = MainWindow()
         self.main_window.openSettings.connect(self.settings_window.show)
         self.main_window.startListening.connect(self.key_listener.start)
         self.main_window.closeApp.connect(self.exit_app)
 
+        self.history_window = None
+        if transcription_history.enabled():
+            self.history_window = HistoryWindow()
+            self.history_window.pasteRequested.connect(self.on_history_paste)
+
         self.status_window = None
         recording_mode = ConfigManager.get_config_value('recording_options', 'recording_mode')
         show_status_window = not ConfigManager.get_config_value('misc', 'hide_status_window')
@@ -71,6 +93,9 @@ class WhisperWriterApp(QObject):
             self.status_window.closeSignal.connect(self.stop_result_thread)
             self.status_window.stopSignal.connect(self.on_stop_button_clicked)
 
+        if ConfigManager.get_config_value('misc', 'measure_input_latency'):
+            latency_probe.start()
+
         self.create_tray_icon()
         self.key_listener.start()
 
@@ -86,6 +111,11 @@ class WhisperWriterApp(QObject):
         show_action.triggered.connect(self.main_window.show)
         tray_menu.addAction(show_action)
 
+        if self.history_window:
+            history_action = QAction('Search History', self.app)
+            history_action.triggered.connect(self.history_window.show)
+            tray_menu.addAction(history_action)
+
         settings_action = QAction('Open Settings', self.app)
         settings_action.triggered.connect(self.settings_window.show)
         tray_menu.addAction(settings_action)
@@ -98,6 +128,13 @@ class WhisperWriterApp(QObject):
         self.tray_icon.show()
 
     def cleanup(self):
+        latency_probe.stop()
+        hedge_stats.report()
+        api_breaker.stop()
+        transcription_engine.stop()
+        api_breaker.report()
+        clear_api_clients()
+        transcription_history.stop()
         if self.key_listener:
             self.key_listener.stop()
         if self.input_simulator:
@@ -164,13 +201,25 @@ class WhisperWriterApp(QObject):
         if self.result_thread and self.result_thread.isRunning():
             return
 
-        self.result_thread = ResultThread(self.local_model)
+        self.result_thread = ResultThread(self.local_model, self.draft_model)
         if self.status_window:
             self.result_thread.statusSignal.connect(self.status_window.updateStatus)
             self.result_thread.audioLevelSignal.connect(self.status_window.updateAudioLevel)
+        self.result_thread.segmentSignal.connect(self.on_segment_transcribed)
         self.result_thread.resultSignal.connect(self.on_transcription_complete)
+        self.result_thread.refineSignal.connect(self.start_refine_thread)
         self.result_thread.start()
 
+    def start_refine_thread(self, audio_data, draft):
+        """
+        Start a thread to refine a typed draft with the main local model.
+        """
+        refine_thread = RefineThread(audio_data, draft, self.local_model)
+        refine_thread.refinedSignal.connect(self.on_refinement_complete)
+        refine_thread.finished.connect(lambda: self.refine_threads.remove(refine_thread))
+        self.refine_threads.append(refine_thread)
+        refine_thread.start()
+
     def stop_result_thread(self):
         """
         Stop the result thread.
@@ -192,11 +241,40 @@ class WhisperWriterApp(QObject):
         if self.result_thread and self.result_thread.isRunning():
             self.result_thread.stop_recording()
 
+    def type_text(self, text, final=True):
+        """
+        Type text, expanding spoken commands and snippets if they are enabled.
+
+        :param final: Whether the text ends the transcription, rather than being a streamed segment
+        :return: Whether the text was typed unchanged
+        """
+        if not self.command_expander:
+            self.input_simulator.typewrite(text)
+            return True
+        actions = self.command_expander.expand(text, final)
+        self.input_simulator.perform(actions)
+        return actions == [text]
+
+    def on_segment_transcribed(self, text):
+        """
+        Type a post-processed segment as soon as it has been decoded.
+        """
+        self.type_text(text, final=False)
+        self.last_typed = None
+
     def on_transcription_complete(self, result):
         """
         When the transcription is complete, type the result and start listening for the activation key again.
         """
-        self.input_simulator.typewrite(result)
+        if result:
+            # A draft typed with commands or snippets expanded cannot be corrected in place
+            self.last_typed = result if self.type_text(result) else None
+        elif self.command_expander:
+            # Type anything held back from the streamed segments
+            self.type_text('')
+
+        if ConfigManager.get_config_value('misc', 'measure_input_latency'):
+            latency_probe.report()
 
         if ConfigManager.get_config_value('misc', 'noise_on_completion'):
             AudioPlayer(os.path.join('assets', 'beep.wav')).play(block=True)
@@ -206,6 +284,44 @@ class WhisperWriterApp(QObject):
         else:
             self.key_listener.start()
 
+    def on_history_paste(self, text):
+        """
+        Type a transcription chosen from the history into the window that had focus before.
+        """
+        def paste():
+            self.input_simulator.save_target_window()
+            self.input_simulator.typewrite(text)
+            self.last_typed = None
+
+        # Give the previous window time to regain focus after the history window is hidden
+        QTimer.singleShot(200, paste)
+
+    def on_refinement_complete(self, draft, refined):
+        """
+        Replace a typed draft with its refined transcription, if it differs and nothing was typed since.
+        """
+        self.refine_count += 1
+        if refined != draft:
+            if self.last_typed != draft:
+                ConfigManager.console_print('Text was typed after the draft, skipping correction.')
+                return
+            if self.command_expander and self.command_expander.contains_trigger(refined):
+                ConfigManager.console_print('Refined transcription contains a spoken command, skipping correction.')
+                return
+
+            # Only delete and retype the part after the common prefix
+            prefix_length = len(os.path.commonprefix([draft, refined]))
+            self.input_simulator.backspace(len(draft) - prefix_length)
+            if refined[prefix_length:]:
+                self.input_simulator.typewrite(refined[prefix_length:])
+            self.last_typed = refined
+            self.correction_count += 1
+            if transcription_history.enabled():
+                transcription_history.replace(draft, refined)
+
+        ConfigManager.console_print(f'Corrected {self.correction_count} of {self.refine_count} refined drafts '
+                                    f'({self.correction_count / self.refine_count:.0%}).')
+
     def run(self):
         """
         Start the application.
@@ -214,5 +330,14 @@ class WhisperWriterApp(QObject):
 
 
 if __name__ == '__main__':
+    if '--autotune' in sys.argv:
+        from autotune import autotune
+        autotune([arg for arg in sys.argv[1:] if arg != '--autotune'])
+        sys.exit()
+    if '--serve' in sys.argv:
+        from server import serve
+        serve([arg for arg in sys.argv[1:] if arg != '--serve'])
+        sys.exit()
+
     app = WhisperWriterApp()
     app.run()
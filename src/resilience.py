@@ -0,0 +1,177 @@
+import asyncio
+import random
+import threading
+import time
+import openai
+
+from utils import ConfigManager
+
+# HTTP statuses worth retrying: request timeout, conflict, rate limiting and server errors
+TRANSIENT_STATUS_CODES = {408, 409, 429}
+
+
+def is_transient(error):
+    """
+    Return whether an API error is likely to succeed if the request is retried.
+    """
+    if isinstance(error, openai.APIConnectionError):
+        # Includes timeouts and dropped connections
+        return True
+    if isinstance(error, openai.APIStatusError):
+        return error.status_code in TRANSIENT_STATUS_CODES or error.status_code >= 500
+    return False
+
+
+def _retry_after(error):
+    """Return the delay in seconds requested by the server's Retry-After header, if any."""
+    response = getattr(error, 'response', None)
+    try:
+        return float(response.headers.get('retry-after'))
+    except (AttributeError, TypeError, ValueError):
+        return None
+
+
+def _retry_policy():
+    """Return the configured maximum number of retries and base backoff delay."""
+    api_options = ConfigManager.get_config_section('model_options', 'api')
+    return api_options.get('max_retries') or 0, api_options.get('retry_backoff') or 0.5
+
+
+def _retry_delay(error, attempt, max_retries, backoff, on_retry):
+    """
+    Return the delay before retrying a failed attempt, or re-raise the error if it is not retried.
+    """
+    if attempt == max_retries or not is_transient(error):
+        raise error
+    # Full jitter spreads out the retries of clients that failed at the same time
+    delay = random.uniform(0, backoff * 2 ** attempt)
+    retry_after = _retry_after(error)
+    if retry_after is not None:
+        delay = max(delay, min(retry_after, backoff * 2 ** max_retries))
+    if on_retry:
+        on_retry()
+    ConfigManager.console_print(f'API request failed ({type(error).__name__}: {error}), retrying in {delay:.2f} s '
+                                f'(attempt {attempt + 2} of {max_retries + 1}).')
+    return delay
+
+
+def call_with_retries(func, wait=time.sleep, on_retry=None):
+    """
+    Call `func`, retrying transient API errors with exponential backoff and full jitter.
+
+    :param wait: Called with each delay before retrying, e.g. to make the wait cancellable
+    :param on_retry: Called before each retry, e.g. to count retries
+    :return: The result of `func`
+    """
+    max_retries, backoff = _retry_policy()
+    for attempt in range(max_retries + 1):
+        try:
+            return func()
+        except Exception as e:
+            wait(_retry_delay(e, attempt, max_retries, backoff, on_retry))
+
+
+async def call_with_retries_async(func, on_retry=None):
+    """
+    Await `func()`, retrying transient API errors like `call_with_retries`.
+    """
+    max_retries, backoff = _retry_policy()
+    for attempt in range(max_retries + 1):
+        try:
+            return await func()
+        except Exception as e:
+            await asyncio.sleep(_retry_delay(e, attempt, max_retries, backoff, on_retry))
+
+
+class CircuitBreaker:
+    """
+    Stop sending requests to the API after repeated failures, and probe it until it recovers.
+
+    The breaker opens after `breaker_failure_threshold` consecutive failed transcriptions. While
+    it is open, callers use their fallback instead of the API, and a background thread
+    calls `probe` every `breaker_probe_interval` seconds. The breaker closes again as soon as a
+    probe succeeds.
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+
+    def __init__(self, probe):
+        """
+        :param probe: Callable that makes a cheap API request, raising an exception on failure
+        """
+        self.probe = probe
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self.stats = {'requests': 0, 'retries': 0, 'failures': 0, 'fallbacks': 0, 'probes': 0}
+        self.lock = threading.Lock()
+        self.stop_event = threading.Event()
+        self.probe_thread = None
+
+    def allow_request(self):
+        """Return whether the next transcription should be sent to the API."""
+        with self.lock:
+            if self.state == self.CLOSED:
+                self.stats['requests'] += 1
+                return True
+            return False
+
+    def record_retry(self):
+        with self.lock:
+            self.stats['retries'] += 1
+
+    def record_fallback(self):
+        with self.lock:
+            self.stats['fallbacks'] += 1
+
+    def record_success(self):
+        with self.lock:
+            self.consecutive_failures = 0
+
+    def record_failure(self):
+        """Count a failed transcription, opening the breaker once the threshold is reached."""
+        threshold = ConfigManager.get_config_value('model_options', 'api', 'breaker_failure_threshold') or 3
+        with self.lock:
+            self.stats['failures'] += 1
+            self.consecutive_failures += 1
+            if self.state == self.OPEN or self.consecutive_failures < threshold:
+                return
+            self.state = self.OPEN
+            self.stop_event.clear()
+            self.probe_thread = threading.Thread(target=self._probe_loop, daemon=True)
+            self.probe_thread.start()
+        ConfigManager.console_print(f'API circuit breaker opened after {self.consecutive_failures} consecutive '
+                                    'failures. Transcribing locally until the API recovers.')
+
+    def _probe_loop(self):
+        interval = ConfigManager.get_config_value('model_options', 'api', 'breaker_probe_interval') or 30
+        while not self.stop_event.wait(interval):
+            with self.lock:
+                self.stats['probes'] += 1
+            try:
+                self.probe()
+            except Exception as e:
+                ConfigManager.console_print(f'API probe failed: {e}')
+                continue
+            with self.lock:
+                self.state = self.CLOSED
+                self.consecutive_failures = 0
+            ConfigManager.console_print('API probe succeeded, circuit breaker closed.')
+            return
+
+    def stop(self):
+        """Stop probing the API."""
+        self.stop_event.set()
+
+    def status(self):
+        """Return the breaker state, consecutive failures and request counters."""
+        with self.lock:
+            return dict(self.stats, state=self.state, consecutive_failures=self.consecutive_failures)
+
+    def report(self):
+        """Print the breaker state and counters."""
+        status = self.status()
+        if status['requests'] or status['fallbacks']:
+            ConfigManager.console_print(f"API circuit breaker {status['state']}: {status['requests']} requests, "
+                                        f"{status['retries']} retries, {status['failures']} failures, "
+                                        f"{status['fallbacks']} local fallbacks, {status['probes']} probes.")
@@ -3,13 +3,19 @@ import traceback
 import numpy as np
 import sounddevice as sd
 import tempfile
+import tracemalloc
 import wave
 import webrtcvad
 from PyQt5.QtCore import QThread, QMutex, pyqtSignal
 from collections import deque
 from threading import Event
 
-from transcription import transcribe
+from async_engine import transcription_engine
+from history import current_model_name, transcription_history
+from scheduling import apply_inference_policy, latency_probe
+from streaming_transcriber import StreamingTranscriber
+from transcription import (INT16_SCALE, TranscriptionCancelled, hedge_enabled, post_process_transcription,
+                           prewarm_api_connection, rolling_context, transcribe, transcribe_draft, transcribe_stream)
 from utils import ConfigManager
 
 
@@ -26,24 +32,33 @@ class ResultThread(QThread):
 
     Signals:
         statusSignal: Emits the current status of the thread (e.g., 'recording', 'transcribing', 'idle')
-        resultSignal: Emits the transcription result
+        segmentSignal: Emits post-processed text as each segment is decoded (when streaming segments)
+        resultSignal: Emits the transcription result (empty when the text was already streamed)
+        refineSignal: Emits the audio and draft result when the draft should be refined
     """
 
     statusSignal = pyqtSignal(str)
+    segmentSignal = pyqtSignal(str)
     resultSignal = pyqtSignal(str)
+    refineSignal = pyqtSignal(object, str)
     audioLevelSignal = pyqtSignal(float)
 
-    def __init__(self, local_model=None):
+    def __init__(self, local_model=None, draft_model=None):
         """
         Initialize the ResultThread.
 
         :param local_model: Local transcription model (if applicable)
+        :param draft_model: Fast local model whose result is typed before being refined (if applicable)
         """
         super().__init__()
         self.local_model = local_model
+        self.draft_model = draft_model
         self.is_recording = False
         self.is_running = True
         self.sample_rate = None
+        self.streaming_transcriber = None
+        self.cancel_event = Event()
+        self.first_char_time = None
         self.mutex = QMutex()
 
     def stop_recording(self):
@@ -53,15 +68,21 @@ class ResultThread(QThread):
         self.mutex.unlock()
 
     def stop(self):
-        """Stop the entire thread execution."""
+        """Stop the entire thread execution, cancelling any transcription in progress."""
+        start_time = time.time()
         self.mutex.lock()
         self.is_running = False
         self.mutex.unlock()
+        self.cancel_event.set()
         self.statusSignal.emit('idle')
         self.wait()
+        ConfigManager.console_print(f'Stopped in {(time.time() - start_time) * 1000:.0f} ms.')
 
     def run(self):
         """Main execution method for the thread."""
+        report_peak_memory = ConfigManager.get_config_value('misc', 'report_peak_memory')
+        if report_peak_memory:
+            tracemalloc.start()
         try:
             if not self.is_running:
                 return
@@ -72,7 +93,12 @@ class ResultThread(QThread):
 
             self.statusSignal.emit('recording')
             ConfigManager.console_print('Recording...')
+            if (ConfigManager.get_config_value('model_options', 'use_api')
+                    and ConfigManager.get_config_value('model_options', 'api', 'prewarm_connection')):
+                prewarm_api_connection()
+            recording_start_time = time.time()
             audio_data = self._record_audio()
+            recording_time = time.time() - recording_start_time
 
             if not self.is_running:
                 return
@@ -84,9 +110,27 @@ class ResultThread(QThread):
             self.statusSignal.emit('transcribing')
             ConfigManager.console_print('Transcribing...')
 
+            # Recording is over, so this thread only decodes from here on
+            apply_inference_policy()
+            latency_probe.set_decoding(True)
+
             # Time the transcription process
             start_time = time.time()
-            result = transcribe(audio_data, self.local_model)
+            streamed = False
+            refine = False
+            if self.streaming_transcriber:
+                transcription = self.streaming_transcriber.finish(self.cancel_event)
+                rolling_context.add(transcription, self.local_model)
+                result = post_process_transcription(transcription)
+            elif self.draft_model:
+                result, refine = transcribe_draft(audio_data, self.draft_model, self.cancel_event)
+            elif ConfigManager.get_config_value('model_options', 'async_engine'):
+                result = transcription_engine.run(audio_data, self.local_model, self.cancel_event)
+            elif ConfigManager.get_config_value('post_processing', 'stream_segments'):
+                result = self._transcribe_streaming(audio_data, start_time)
+                streamed = True
+            else:
+                result = transcribe(audio_data, self.local_model, self.cancel_event)
             end_time = time.time()
 
             transcription_time = end_time - start_time
@@ -96,14 +140,49 @@ class ResultThread(QThread):
                 return
 
             self.statusSignal.emit('idle')
-            self.resultSignal.emit(result)
-
+            self.resultSignal.emit('' if streamed else result)
+            if refine and result:
+                self.refineSignal.emit(audio_data, result)
+            if result and transcription_history.enabled():
+                latencies = {'recording': recording_time, 'transcription': transcription_time}
+                if self.first_char_time is not None:
+                    latencies['first_character'] = self.first_char_time
+                transcription_history.add(result, len(audio_data) / self.sample_rate,
+                                          current_model_name(), latencies)
+
+        except TranscriptionCancelled:
+            ConfigManager.console_print('Transcription cancelled.')
         except Exception as e:
             traceback.print_exc()
             self.statusSignal.emit('error')
             self.resultSignal.emit('')
         finally:
+            latency_probe.set_decoding(False)
             self.stop_recording()
+            if self.streaming_transcriber:
+                # When cancelled, leave an in-flight window decode to finish in the background
+                self.streaming_transcriber.stop(wait=not self.cancel_event.is_set())
+            if report_peak_memory:
+                _, peak = tracemalloc.get_traced_memory()
+                tracemalloc.stop()
+                ConfigManager.console_print(f'Peak memory allocated for this utterance: {peak / 1024 / 1024:.2f} MB')
+
+    def _transcribe_streaming(self, audio_data, start_time):
+        """
+        Transcribe the audio, emitting each post-processed segment as soon as it is decoded.
+
+        :return: The full post-processed transcription
+        """
+        chunks = []
+        for chunk in transcribe_stream(audio_data, self.local_model, self.cancel_event):
+            if not self.is_running:
+                break
+            if not chunks:
+                self.first_char_time = time.time() - start_time
+                ConfigManager.console_print(f'Time to first character: {self.first_char_time:.2f} seconds.')
+            chunks.append(chunk)
+            self.segmentSignal.emit(chunk)
+        return ''.join(chunks)
 
     def _resolve_input_device(self, requested_device):
         """
@@ -159,6 +238,17 @@ class ResultThread(QThread):
             speech_detected = False
             silent_frame_count = 0
 
+        # The local model consumes float32, so convert each frame as it is captured instead of
+        # converting the whole recording afterwards
+        use_api = ConfigManager.get_config_value('model_options', 'use_api')
+        capture_float = not use_api or hedge_enabled()
+
+        # Decode while recording if real-time transcription is enabled for the local model
+        if (not use_api and self.local_model
+                and ConfigManager.get_config_value('model_options', 'local', 'realtime_transcription')):
+            self.streaming_transcriber = StreamingTranscriber(self.local_model, self.sample_rate)
+            self.streaming_transcriber.start()
+
         audio_buffer = deque(maxlen=frame_size)
         recording = []
 
@@ -184,10 +274,17 @@ class ResultThread(QThread):
                 # Save frame
                 frame = np.array(list(audio_buffer), dtype=np.int16)
                 audio_buffer.clear()
-                recording.extend(frame)
+                if capture_float:
+                    frame_float = np.multiply(frame, INT16_SCALE, dtype=np.float32)
+                    recording.append(frame_float)
+                    peak = float(np.abs(frame_float).max())
+                    if self.streaming_transcriber:
+                        self.streaming_transcriber.add_audio(frame_float)
+                else:
+                    recording.append(frame)
+                    peak = float(np.abs(frame.astype(np.float32)).max()) / 32768.0
 
                 # Emit peak level for UI histogram
-                peak = float(np.abs(frame.astype(np.float32)).max()) / 32768.0
                 self.audioLevelSignal.emit(peak)
 
                 # Avoid trying to detect voice in initial frames
@@ -207,7 +304,10 @@ class ResultThread(QThread):
                     if speech_detected and silent_frame_count > silence_frames:
                         break
 
-        audio_data = np.array(recording, dtype=np.int16)
+        if recording:
+            audio_data = np.concatenate(recording)
+        else:
+            audio_data = np.zeros(0, dtype=np.float32 if capture_float else np.int16)
         duration = len(audio_data) / self.sample_rate
 
         ConfigManager.console_print(f'Recording finished. Size: {audio_data.size} samples, Duration: {duration:.2f} seconds')
@@ -219,3 +319,38 @@ class ResultThread(QThread):
             return None
 
         return audio_data
+
+
+class RefineThread(QThread):
+    """
+    A thread class for re-decoding a typed draft with the main local model.
+
+    Signals:
+        refinedSignal: Emits the draft and the refined transcription
+    """
+
+    refinedSignal = pyqtSignal(str, str)
+
+    def __init__(self, audio_data, draft, local_model):
+        """
+        Initialize the RefineThread.
+
+        :param audio_data: The audio the draft was transcribed from
+        :param draft: The post-processed draft that was typed
+        :param local_model: The main local transcription model
+        """
+        super().__init__()
+        self.audio_data = audio_data
+        self.draft = draft
+        self.local_model = local_model
+
+    def run(self):
+        """Refine the draft and emit the result."""
+        apply_inference_policy()
+        try:
+            start_time = time.time()
+            refined = transcribe(self.audio_data, self.local_model)
+            ConfigManager.console_print(f'Refinement completed in {time.time() - start_time:.2f} seconds. Refined line: {refined}')
+            self.refinedSignal.emit(self.draft, refined)
+        except Exception:
+            traceback.print_exc()
@@ -0,0 +1,161 @@
+import os
+import sys
+import threading
+import time
+
+from utils import ConfigManager
+
+if sys.platform == 'win32':
+    import ctypes
+
+    _kernel32 = ctypes.windll.kernel32
+    _kernel32.GetCurrentThread.restype = ctypes.c_void_p
+    _kernel32.SetThreadAffinityMask.argtypes = [ctypes.c_void_p, ctypes.c_size_t]
+    _kernel32.SetThreadAffinityMask.restype = ctypes.c_size_t
+    _kernel32.SetThreadPriority.argtypes = [ctypes.c_void_p, ctypes.c_int]
+
+    THREAD_PRIORITY_LOWEST = -2
+    THREAD_PRIORITY_BELOW_NORMAL = -1
+
+def parse_core_list(cores):
+    """
+    Parse a core list such as '2,3,6-7' into a sorted list of core indices.
+    """
+    result = set()
+    for part in str(cores).split(','):
+        part = part.strip()
+        if not part:
+            continue
+        if '-' in part:
+            first, last = part.split('-', 1)
+            result.update(range(int(first), int(last) + 1))
+        else:
+            result.add(int(part))
+    return sorted(result)
+
+def inference_cores():
+    """
+    Return the cores inference is allowed to run on, or None if it is not restricted.
+
+    An explicit `inference_cpu_affinity` list takes precedence. Otherwise the first
+    `reserved_cores` cores are left free for audio capture, input handling and the UI.
+    """
+    local_model_options = ConfigManager.get_config_section('model_options', 'local')
+    if local_model_options.get('inference_cpu_affinity'):
+        return parse_core_list(local_model_options['inference_cpu_affinity'])
+
+    reserved_cores = local_model_options.get('reserved_cores') or 0
+    if not reserved_cores:
+        return None
+    cores = list(range(os.cpu_count() or 1))
+    if reserved_cores >= len(cores):
+        ConfigManager.console_print('Not enough cores to reserve, inference is not restricted.')
+        return None
+    return cores[reserved_cores:]
+
+def apply_inference_policy():
+    """
+    Apply the inference CPU affinity and nice level to the calling thread.
+
+    On Linux both settings are per-thread and are inherited by threads it creates, including
+    CTranslate2's compute threads. On Windows only the calling thread is affected.
+    """
+    cores = inference_cores()
+    nice = ConfigManager.get_config_value('model_options', 'local', 'inference_nice') or 0
+    try:
+        if sys.platform == 'win32':
+            thread = _kernel32.GetCurrentThread()
+            if cores:
+                _kernel32.SetThreadAffinityMask(thread, sum(1 << core for core in cores))
+            if nice:
+                priority = THREAD_PRIORITY_LOWEST if nice >= 10 else THREAD_PRIORITY_BELOW_NORMAL
+                _kernel32.SetThreadPriority(thread, priority)
+        elif hasattr(os, 'sched_setaffinity'):
+            thread_id = threading.get_native_id()
+            if cores:
+                os.sched_setaffinity(thread_id, cores)
+            if nice:
+                os.setpriority(os.PRIO_PROCESS, thread_id, os.getpriority(os.PRIO_PROCESS, thread_id) + nice)
+    except (OSError, ValueError) as e:
+        ConfigManager.console_print(f'Failed to apply inference scheduling policy: {e}')
+
+def run_with_inference_policy(func):
+    """
+    Call `func` on a short-lived thread with the inference policy applied, and return its result.
+
+    Threads started by `func` (such as the compute threads of a model being loaded) inherit the
+    policy on Linux, while the calling thread keeps its own affinity and priority.
+    """
+    if inference_cores() is None and not ConfigManager.get_config_value('model_options', 'local', 'inference_nice'):
+        return func()
+
+    outcome = {}
+
+    def target():
+        apply_inference_policy()
+        try:
+            outcome['result'] = func()
+        except Exception as e:
+            outcome['error'] = e
+
+    thread = threading.Thread(target=target)
+    thread.start()
+    thread.join()
+    if 'error' in outcome:
+        raise outcome['error']
+    return outcome['result']
+
+class LatencyProbe:
+    """
+    Measure how late a thread wakes up from short sleeps, with and without decoding running.
+
+    This is the delay that the input listener, audio callback and UI threads see when they
+    compete with inference for the CPU.
+    """
+
+    INTERVAL = 0.01
+
+    def __init__(self):
+        self.samples = {True: [], False: []}
+        self.decoding = False
+        self.is_running = False
+        self.thread = None
+
+    def start(self):
+        """Start sampling on a background thread."""
+        self.is_running = True
+        self.thread = threading.Thread(target=self._sample_loop, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        """Stop sampling."""
+        self.is_running = False
+        if self.thread:
+            self.thread.join()
+            self.thread = None
+
+    def set_decoding(self, decoding):
+        """Mark whether decoding is currently running."""
+        self.decoding = decoding
+
+    def _sample_loop(self):
+        while self.is_running:
+            start_time = time.perf_counter()
+            time.sleep(self.INTERVAL)
+            samples = self.samples[self.decoding]
+            samples.append(time.perf_counter() - start_time - self.INTERVAL)
+            if len(samples) > 10000:
+                del samples[:5000]
+
+    def report(self):
+        """Print the median and 95th percentile wake-up delay with and without decoding."""
+        for decoding, label in ((False, 'idle'), (True, 'decoding')):
+            samples = sorted(self.samples[decoding])
+            if not samples:
+                continue
+            median = samples[len(samples) // 2] * 1000
+            p95 = samples[int(len(samples) * 0.95)] * 1000
+            ConfigManager.console_print(f'Wake-up latency while {label}: median {median:.1f} ms, '
+                                        f'95th percentile {p95:.1f} ms ({len(samples)} samples).')
+
+latency_probe = LatencyProbe()
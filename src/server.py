@@ -0,0 +1,365 @@
+import argparse
+import email.parser
+import email.policy
+import io
+import json
+import queue
+import threading
+import time
+from collections import deque, namedtuple
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import numpy as np
+from faster_whisper.audio import decode_audio, pad_or_trim
+from faster_whisper.tokenizer import Tokenizer
+from faster_whisper.transcribe import get_compression_ratio, get_ctranslate2_storage
+
+from transcription import SegmentFilter, create_local_model, decoder_options
+from utils import ConfigManager
+
+SAMPLE_RATE = 16000
+# Requests up to the length of one Whisper window can be decoded together in a batch
+BATCH_MAX_DURATION = 30
+# Mel frames in one 30 second window
+N_FRAMES = 3000
+
+# The decoder statistics of one batched result, in the shape SegmentFilter expects
+BatchSegment = namedtuple('BatchSegment', ['text', 'avg_logprob', 'no_speech_prob', 'compression_ratio'])
+
+
+class Job:
+    """
+    One transcription request waiting in the queue.
+    """
+
+    def __init__(self, audio_data, language, prompt, temperature):
+        self.audio_data = audio_data
+        self.language = language
+        self.prompt = prompt
+        self.temperature = temperature
+        self.text = None
+        self.detected_language = language
+        self.error = None
+        self.submitted = time.perf_counter()
+        self.started = None
+        self.done = threading.Event()
+
+    @property
+    def duration(self):
+        return len(self.audio_data) / SAMPLE_RATE
+
+    @property
+    def batchable(self):
+        return self.duration <= BATCH_MAX_DURATION and not self.temperature
+
+
+class ServerMetrics:
+    """
+    Count requests and keep recent queue wait, decode and total latencies.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.rejected = 0
+        self.failed = 0
+        self.in_flight = 0
+        self.batches = 0
+        self.batched_jobs = 0
+        self.audio_seconds = 0.0
+        self.latencies = {name: deque(maxlen=1000) for name in ('queue_wait', 'decode', 'total')}
+
+    def record(self, job):
+        finished = time.perf_counter()
+        with self.lock:
+            self.requests += 1
+            self.failed += job.error is not None
+            self.audio_seconds += job.duration
+            self.latencies['queue_wait'].append(job.started - job.submitted)
+            self.latencies['decode'].append(finished - job.started)
+            self.latencies['total'].append(finished - job.submitted)
+
+    def record_batch(self, size):
+        with self.lock:
+            self.batches += 1
+            self.batched_jobs += size
+
+    def snapshot(self, queue_depth):
+        """Return the counters and the median and 95th percentile latencies in milliseconds."""
+        with self.lock:
+            snapshot = {
+                'queue_depth': queue_depth,
+                'in_flight': self.in_flight,
+                'requests': self.requests,
+                'rejected': self.rejected,
+                'failed': self.failed,
+                'batches': self.batches,
+                'mean_batch_size': self.batched_jobs / self.batches if self.batches else 0.0,
+                'audio_seconds': round(self.audio_seconds, 1),
+            }
+            for name, samples in self.latencies.items():
+                samples = sorted(samples)
+                if samples:
+                    snapshot[f'{name}_p50_ms'] = round(samples[len(samples) // 2] * 1000, 1)
+                    snapshot[f'{name}_p95_ms'] = round(samples[int(len(samples) * 0.95)] * 1000, 1)
+            return snapshot
+
+
+class TranscriptionServer:
+    """
+    Serve the local model over an OpenAI-compatible `POST /v1/audio/transcriptions` endpoint.
+
+    Requests are queued and decoded by `concurrency` worker threads sharing one model. With a
+    batch size above 1, a worker that picks up a short request waits up to `batch_wait` seconds
+    for more and decodes them together in one batch. `GET /metrics` reports the queue depth,
+    counters and latencies.
+    """
+
+    def __init__(self, model, host, port, concurrency=1, batch_size=1, batch_wait=0.01, queue_size=64):
+        self.model = model
+        self.concurrency = concurrency
+        self.batch_size = batch_size
+        self.batch_wait = batch_wait
+        self.jobs = queue.Queue(maxsize=queue_size)
+        self.metrics = ServerMetrics()
+        self.model_options = ConfigManager.get_config_section('model_options')
+        self.httpd = ThreadingHTTPServer((host, port), self._make_handler())
+        self.httpd.daemon_threads = True
+
+    def serve_forever(self):
+        for index in range(self.concurrency):
+            threading.Thread(target=self._worker, name=f'server-worker-{index}', daemon=True).start()
+        host, port = self.httpd.server_address[:2]
+        ConfigManager.console_print(f'Serving transcriptions on http://{host}:{port}/v1 with {self.concurrency} '
+                                    f'workers and a batch size of {self.batch_size}.')
+        try:
+            self.httpd.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.httpd.server_close()
+
+    def submit(self, job):
+        """Queue a job, returning False if the queue is full."""
+        try:
+            self.jobs.put_nowait(job)
+            return True
+        except queue.Full:
+            with self.metrics.lock:
+                self.metrics.rejected += 1
+            return False
+
+    def _worker(self):
+        while True:
+            batch = [self.jobs.get()]
+            others = []
+            if self.batch_size > 1 and batch[0].batchable:
+                deadline = time.perf_counter() + self.batch_wait
+                while len(batch) < self.batch_size:
+                    try:
+                        job = self.jobs.get(timeout=max(0.0, deadline - time.perf_counter()))
+                    except queue.Empty:
+                        break
+                    (batch if job.batchable else others).append(job)
+
+            if len(batch) > 1:
+                self._run(batch, self._decode_batch)
+            else:
+                others.insert(0, batch[0])
+            for job in others:
+                self._run([job], lambda jobs: self._decode(jobs[0]))
+
+    def _run(self, jobs, decode):
+        started = time.perf_counter()
+        with self.metrics.lock:
+            self.metrics.in_flight += len(jobs)
+        for job in jobs:
+            job.started = started
+        try:
+            decode(jobs)
+        except Exception as e:
+            ConfigManager.console_print(f'Transcription failed: {e}')
+            for job in jobs:
+                job.error = e
+        with self.metrics.lock:
+            self.metrics.in_flight -= len(jobs)
+        if len(jobs) > 1:
+            self.metrics.record_batch(len(jobs))
+        for job in jobs:
+            self.metrics.record(job)
+            job.done.set()
+
+    def _decode(self, job):
+        """Decode one request with the full faster-whisper pipeline."""
+        local_options = self.model_options['local']
+        segments, info = self.model.transcribe(audio=job.audio_data,
+                                               language=job.language,
+                                               initial_prompt=job.prompt,
+                                               condition_on_previous_text=local_options['condition_on_previous_text'],
+                                               temperature=job.temperature,
+                                               vad_filter=local_options['vad_filter'],
+                                               **decoder_options(self.model_options))
+        segment_filter = SegmentFilter(self.model_options)
+        texts = []
+        for segment in segments:
+            texts.append(segment_filter.filter(segment))
+        job.text = ''.join(texts)
+        job.detected_language = info.language
+
+    def _decode_batch(self, jobs):
+        """
+        Decode several requests of at most one window each in a single batched generate call.
+
+        Each request keeps its own language and prompt. Results are filtered with SegmentFilter,
+        as in `_decode`.
+        """
+        model = self.model
+        features = np.stack([pad_or_trim(model.feature_extractor(job.audio_data), N_FRAMES) for job in jobs])
+        # WhisperModel.encode only takes one window, so encode the whole batch with the CTranslate2 model
+        to_cpu = model.model.device == 'cuda' and len(model.model.device_index) > 1
+        encoder_output = model.model.encode(get_ctranslate2_storage(features), to_cpu=to_cpu)
+
+        if any(job.language is None for job in jobs) and model.model.is_multilingual:
+            detected = model.model.detect_language(encoder_output)
+            for job, languages in zip(jobs, detected):
+                job.detected_language = job.language or languages[0][0][2:-2]
+        for job in jobs:
+            job.detected_language = job.detected_language or 'en'
+
+        tokenizers = [Tokenizer(model.hf_tokenizer, model.model.is_multilingual, task='transcribe',
+                                language=job.detected_language) for job in jobs]
+        prompts = []
+        for job, tokenizer in zip(jobs, tokenizers):
+            previous_tokens = tokenizer.encode(' ' + job.prompt.strip()) if job.prompt else []
+            prompts.append(model.get_prompt(tokenizer, previous_tokens, without_timestamps=True))
+
+        results = model.model.generate(encoder_output, prompts, beam_size=5, max_length=model.max_length,
+                                       return_scores=True, return_no_speech_prob=True, suppress_blank=True,
+                                       suppress_tokens=[-1])
+        for job, tokenizer, result in zip(jobs, tokenizers, results):
+            tokens = [token for token in result.sequences_ids[0] if token < tokenizer.eot]
+            text = tokenizer.decode(tokens)
+            segment = BatchSegment(text, result.scores[0] * len(tokens) / (len(tokens) + 1), result.no_speech_prob,
+                                   get_compression_ratio(text))
+            job.text = SegmentFilter(self.model_options).filter(segment)
+
+    def _make_handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, format, *args):
+                pass
+
+            def send_body(self, status, data, content_type='application/json', headers=None):
+                self.send_response(status)
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def send_json(self, status, payload, headers=None):
+                self.send_body(status, json.dumps(payload).encode(), headers=headers)
+
+            def send_error_json(self, status, message, headers=None):
+                self.send_json(status, {'error': {'message': message}}, headers)
+
+            def do_HEAD(self):
+                self.send_response(200)
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+
+            def do_GET(self):
+                if self.path.rstrip('/').endswith('/metrics'):
+                    self.send_json(200, server.metrics.snapshot(server.jobs.qsize()))
+                elif self.path.rstrip('/').endswith('/health'):
+                    self.send_json(200, {'status': 'ok'})
+                else:
+                    self.send_error_json(404, 'Not found')
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get('Content-Length') or 0))
+                if not self.path.rstrip('/').endswith('/audio/transcriptions'):
+                    self.send_error_json(404, 'Not found')
+                    return
+
+                try:
+                    fields = _parse_form(self.headers.get('Content-Type', ''), body)
+                    audio_data = decode_audio(io.BytesIO(fields['file']), sampling_rate=SAMPLE_RATE)
+                    temperature = float(fields.get('temperature') or 0.0)
+                except Exception as e:
+                    self.send_error_json(400, f'Invalid request: {e}')
+                    return
+
+                job = Job(audio_data, _form_text(fields, 'language'), _form_text(fields, 'prompt'), temperature)
+                if not server.submit(job):
+                    self.send_error_json(503, 'The transcription queue is full', {'Retry-After': '1'})
+                    return
+                job.done.wait()
+                if job.error is not None:
+                    self.send_error_json(500, f'Transcription failed: {job.error}')
+                    return
+
+                response_format = _form_text(fields, 'response_format') or 'json'
+                if response_format == 'text':
+                    self.send_body(200, job.text.encode(), 'text/plain; charset=utf-8')
+                elif response_format == 'verbose_json':
+                    self.send_json(200, {'task': 'transcribe', 'language': job.detected_language,
+                                         'duration': job.duration, 'text': job.text})
+                else:
+                    self.send_json(200, {'text': job.text})
+
+        return Handler
+
+
+def _parse_form(content_type, body):
+    """
+    Parse a multipart/form-data body into a dict of field names to bytes.
+    """
+    if not content_type.startswith('multipart/form-data'):
+        raise ValueError('expected multipart/form-data')
+    message = email.parser.BytesParser(policy=email.policy.HTTP).parsebytes(
+        f'Content-Type: {content_type}\r\n\r\n'.encode() + body)
+    fields = {}
+    for part in message.iter_parts():
+        name = part.get_param('name', header='content-disposition')
+        if name:
+            fields[name] = part.get_payload(decode=True)
+    if 'file' not in fields:
+        raise ValueError('missing file')
+    return fields
+
+
+def _form_text(fields, name):
+    value = fields.get(name)
+    return value.decode() if value else None
+
+
+def serve(argv=None):
+    """
+    Load the configured local model once and serve it to other WhisperWriter instances and scripts.
+    """
+    parser = argparse.ArgumentParser(prog='run.py --serve',
+                                     description='Serve the local model on an OpenAI-compatible endpoint.')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--concurrency', type=int, default=1, help='Requests decoded at the same time.')
+    parser.add_argument('--batch-size', type=int, default=1,
+                        help=f'Maximum requests of up to {BATCH_MAX_DURATION} seconds decoded together in a batch.')
+    parser.add_argument('--batch-wait', type=float, default=10,
+                        help='Milliseconds to wait for more requests to fill a batch.')
+    parser.add_argument('--queue-size', type=int, default=64,
+                        help='Maximum queued requests before new ones are rejected.')
+    args = parser.parse_args(argv)
+
+    ConfigManager.initialize()
+    ConfigManager.set_config_value(True, 'misc', 'print_to_terminal')
+    # Each worker needs its own model replica to decode in parallel
+    ConfigManager.set_config_value(args.concurrency, 'model_options', 'local', 'num_workers')
+    model = create_local_model()
+
+    server = TranscriptionServer(model, args.host, args.port, args.concurrency, args.batch_size,
+                                 args.batch_wait / 1000, args.queue_size)
+    server.serve_forever()
@@ -0,0 +1,226 @@
+import os
+import re
+from collections import namedtuple
+import yaml
+
+from utils import ConfigManager
+
+# A key to press `count` times. A count of None presses Backspace over the last typed text.
+KeyPress = namedtuple('KeyPress', ['key', 'count'])
+
+DELETE_PREVIOUS = KeyPress('backspace', None)
+
+COMMANDS = {
+    'new line': KeyPress('enter', 1),
+    'new paragraph': KeyPress('enter', 2),
+    'delete that': DELETE_PREVIOUS,
+}
+
+WORD_PATTERN = re.compile(r"[^\W_]+(?:'[^\W_]+)*")
+# Punctuation and whitespace that Whisper adds after a spoken command, which is not typed
+COMMAND_TAIL_PATTERN = re.compile(r'[.,!?;:]*\s*')
+# What may follow a command: punctuation or the end of the text. Otherwise the phrase is part of
+# a sentence, as in "the new line manager", and is typed.
+COMMAND_END_PATTERN = re.compile(r'\s*(?:[.,!?;:]|$)')
+
+
+class CommandExpander:
+    """
+    Turn spoken commands and snippet phrases in transcribed text into key presses and snippets.
+
+    The trigger phrases are compiled into a trie of lowercase words. The text is split into words
+    once, and at each word the trie is walked for the longest trigger starting there. Each step is
+    one dictionary lookup, so the time grows with the length of the text and the longest trigger,
+    however many snippets are defined. Commands are only recognized at the end of the text or
+    before punctuation, while snippets are expanded anywhere.
+
+    The expander remembers the length of the text or key presses it emitted last, across calls,
+    so that "delete that" can remove the previous transcription. The text of a transcription
+    streamed in pieces counts as one emission.
+    """
+
+    def __init__(self, snippets=None, commands=True):
+        """
+        :param snippets: Mapping of spoken phrases to the text they expand to
+        :param commands: Whether to recognize the built-in commands
+        """
+        self.trie = {}
+        self.max_words = 0
+        if commands:
+            for phrase, action in COMMANDS.items():
+                self._add(phrase, action)
+        for phrase, text in (snippets or {}).items():
+            self._add(str(phrase), str(text))
+        self.last_length = 0
+        self.after_key = False
+        # State carried between the pieces of a streamed transcription
+        self.pending = ''
+        self.command_tail = False
+        self.continuing = False
+
+    def _add(self, phrase, action):
+        words = WORD_PATTERN.findall(phrase.lower())
+        if not words:
+            return
+        node = self.trie
+        for word in words:
+            node = node.setdefault(word, {})
+        node[None] = action
+        self.max_words = max(self.max_words, len(words))
+
+    def _words(self, text):
+        return [(match.start(), match.end(), match.group().lower()) for match in WORD_PATTERN.finditer(text)]
+
+    def _walk(self, text, words, index):
+        """
+        Yield the end index and trie node of each trigger prefix starting at word `index`.
+
+        The words of a trigger may only be separated by whitespace or hyphens.
+        """
+        node = self.trie
+        for end in range(index, len(words)):
+            if end > index and text[words[end - 1][1]:words[end][0]].strip(' -'):
+                return
+            node = node.get(words[end][2])
+            if node is None:
+                return
+            yield end + 1, node
+
+    def _match(self, text, words, index):
+        """
+        Return the end index and action of the longest trigger starting at word `index`, or None.
+        """
+        match = None
+        for end, node in self._walk(text, words, index):
+            if None in node and (isinstance(node[None], str)
+                                 or COMMAND_END_PATTERN.match(text, words[end - 1][1])):
+                match = (end, node[None])
+        return match
+
+    def _held_back(self, text, words):
+        """
+        Return the index of the first word of a trigger that the next streamed piece may complete,
+        or of a command at the end that the next piece may continue as a sentence.
+        """
+        if not words or text[words[-1][1]:].strip(' -'):
+            return len(words)
+        for index in range(max(0, len(words) - self.max_words), len(words)):
+            for end, node in self._walk(text, words, index):
+                if end == len(words) and (any(key is not None for key in node)
+                                          or isinstance(node.get(None), KeyPress)):
+                    return index
+        return len(words)
+
+    def contains_trigger(self, text):
+        """Return whether the text contains a command or snippet phrase."""
+        words = self._words(text)
+        return any(self._match(text, words, index) for index in range(len(words)))
+
+    def expand(self, text, final=True):
+        """
+        Split text into the text to type and the keys to press, expanding commands and snippets.
+
+        Commands must end the text or be followed by punctuation. Whitespace before a command
+        and punctuation after it are dropped. "delete that" drops
+        the text spoken before it in the same transcription, or presses Backspace over the text
+        or key presses emitted before.
+
+        :param final: Whether the text ends the transcription. Otherwise it is one streamed piece:
+                      words that may start a trigger completed by the next piece, or a command
+                      the next piece may continue, are held back, and punctuation after a
+                      command at its end is dropped from the next piece.
+        :return: A list of strings to type and KeyPress actions, in order
+        """
+        text = self.pending + text
+        self.pending = ''
+        actions = []
+        pieces = []
+        position = COMMAND_TAIL_PATTERN.match(text).end() if self.command_tail else 0
+        self.command_tail = False
+        words = self._words(text) if self.trie else []
+        hold = len(words) if final else self._held_back(text, words)
+        end = len(text)
+        if hold < len(words):
+            end = words[hold][0]
+            words = words[:hold]
+        index = 0
+        while index < len(words):
+            match = self._match(text, words, index)
+            if match is None:
+                index += 1
+                continue
+            end_index, action = match
+            pieces.append(text[position:words[index][0]])
+            position = words[end_index - 1][1]
+            index = end_index
+            if isinstance(action, str):
+                pieces.append(action)
+                continue
+
+            typed = ''.join(pieces).rstrip()
+            pieces.clear()
+            position = COMMAND_TAIL_PATTERN.match(text, position).end()
+            self.command_tail = position == len(text) and not final
+            if action.count is not None:
+                self._emit_text(typed, actions)
+                actions.append(action)
+                self.last_length = action.count
+                self.after_key = True
+                self.continuing = False
+            elif self.last_length and (self.continuing or not self._strip(typed)):
+                # Delete the earlier streamed pieces of this text, or what was typed before
+                actions.append(KeyPress(action.key, self.last_length))
+                self.last_length = 0
+                self.continuing = False
+
+        if end < len(text):
+            # Keep the whitespace before a held back trigger with it, in case it is a command
+            end = max(position, len(text[:end].rstrip()))
+            self.pending = text[end:]
+        pieces.append(text[position:end])
+        self._emit_text(''.join(pieces), actions)
+        if final:
+            self.continuing = False
+        return actions
+
+    def _strip(self, text):
+        return text.lstrip() if self.after_key else text
+
+    def _emit_text(self, text, actions):
+        text = self._strip(text)
+        if text:
+            actions.append(text)
+            # The pieces of a streamed transcription are deleted together
+            self.last_length = self.last_length + len(text) if self.continuing else len(text)
+            self.after_key = False
+            self.continuing = True
+
+
+def load_snippets(path):
+    """
+    Return the snippets from a YAML file mapping spoken phrases to text, or an empty dict.
+    """
+    if not path:
+        return {}
+    try:
+        with open(os.path.expanduser(path), encoding='utf-8') as file:
+            snippets = yaml.safe_load(file) or {}
+    except (OSError, yaml.YAMLError) as e:
+        ConfigManager.console_print(f'Failed to read snippets: {e}')
+        return {}
+    if not isinstance(snippets, dict):
+        ConfigManager.console_print('Failed to read snippets: expected a mapping of phrases to text.')
+        return {}
+    return snippets
+
+
+def create_command_expander():
+    """
+    Return a CommandExpander for the configured commands and snippets, or None if there are none.
+    """
+    post_processing = ConfigManager.get_config_section('post_processing')
+    commands = bool(post_processing.get('spoken_commands'))
+    snippets = load_snippets(post_processing.get('snippets_file'))
+    if not commands and not snippets:
+        return None
+    return CommandExpander(snippets, commands)
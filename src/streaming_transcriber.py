@@ -0,0 +1,214 @@
+import threading
+import time
+import numpy as np
+
+from scheduling import apply_inference_policy
+from transcription import INT16_SCALE, TranscriptionCancelled, call_cancellable, language_cache
+from utils import ConfigManager
+
+
+class StreamingTranscriber:
+    """
+    Incrementally transcribe a recording on a worker thread while it is still being captured.
+
+    A sliding window over the growing recording is re-decoded whenever enough new audio has
+    arrived. Words that two consecutive decodes agree on (the local-agreement policy) are
+    committed, and the window is trimmed past them. When recording stops, only the uncommitted
+    tail of the recording still needs to be decoded.
+    """
+
+    def __init__(self, local_model, sample_rate=16000):
+        """
+        Initialize the StreamingTranscriber.
+
+        :param local_model: Local faster-whisper model used for decoding
+        :param sample_rate: Sample rate of the audio frames that will be added
+        """
+        model_options = ConfigManager.get_config_section('model_options')
+        self.local_model = local_model
+        self.sample_rate = sample_rate
+        self.language = model_options['common']['language'] or language_cache.language()
+        self.initial_prompt = model_options['common']['initial_prompt']
+        self.temperature = model_options['common']['temperature']
+        self.vad_filter = model_options['local']['vad_filter']
+        self.min_chunk = model_options['local'].get('realtime_min_chunk') or 1.0
+        self.max_window = model_options['local'].get('realtime_max_window') or 15.0
+
+        self.lock = threading.Lock()
+        self.new_audio = threading.Event()
+        self.is_running = False
+        self.worker = None
+
+        # Audio not yet trimmed from the window, and the absolute time of its first sample
+        self.frames = []
+        self.window_samples = 0
+        self.window_start = 0.0
+        self.decoded_samples = 0
+
+        # Committed words as (start, end, text) in absolute seconds, and the last hypothesis
+        self.committed = []
+        self.last_committed_end = 0.0
+        self.hypothesis = []
+
+    def start(self):
+        """Start decoding on the worker thread."""
+        self.is_running = True
+        self.worker = threading.Thread(target=self._decode_loop, daemon=True)
+        self.worker.start()
+
+    def add_audio(self, frame):
+        """
+        Append a captured frame to the recording.
+
+        :param frame: float32 (or int16) numpy array of audio samples
+        """
+        if frame.dtype != np.float32:
+            frame = np.multiply(frame, INT16_SCALE, dtype=np.float32)
+        with self.lock:
+            self.frames.append(frame)
+            self.window_samples += len(frame)
+        self.new_audio.set()
+
+    def stop(self, wait=True, cancel_event=None):
+        """
+        Stop the worker thread.
+
+        :param wait: Whether to wait for an in-flight decode to complete
+        :param cancel_event: Stop waiting for the in-flight decode once this is set, leaving it
+                             to finish in the background
+        """
+        self.is_running = False
+        self.new_audio.set()
+        if self.worker:
+            while wait and self.worker.is_alive():
+                if cancel_event is not None and cancel_event.is_set():
+                    break
+                self.worker.join(0.05)
+            self.worker = None
+
+    def finish(self, cancel_event=None):
+        """
+        Stop the worker, decode the uncommitted tail and return the full transcription.
+
+        If `cancel_event` is set meanwhile, the in-flight decodes are abandoned and
+        TranscriptionCancelled is raised.
+
+        :return: The raw (not post-processed) transcription of the whole recording
+        """
+        self.stop(cancel_event=cancel_event)
+        if cancel_event is not None and cancel_event.is_set():
+            raise TranscriptionCancelled()
+
+        start_time = time.time()
+        window, window_start = self._snapshot()
+        if len(window):
+            words = call_cancellable(lambda: self._decode(window, window_start), cancel_event)
+            self.committed.extend(w for w in words if w[0] >= self.last_committed_end - 0.05)
+        ConfigManager.console_print(f'Finalized streaming tail in {time.time() - start_time:.2f} seconds.')
+        self.hypothesis = []
+        return self.committed_text()
+
+    def committed_text(self):
+        """Return the text committed so far."""
+        return ''.join(w[2] for w in self.committed)
+
+    def _decode_loop(self):
+        """Re-decode the window whenever at least `min_chunk` seconds of new audio are available."""
+        apply_inference_policy()
+        min_chunk_samples = int(self.min_chunk * self.sample_rate)
+        while self.is_running:
+            self.new_audio.wait()
+            self.new_audio.clear()
+            if not self.is_running:
+                break
+            with self.lock:
+                enough_audio = self.window_samples - self.decoded_samples >= min_chunk_samples
+            if not enough_audio:
+                continue
+
+            window, window_start = self._snapshot()
+            with self.lock:
+                self.decoded_samples = len(window)
+            words = self._decode(window, window_start)
+            self._commit_agreement(words, window_start + len(window) / self.sample_rate)
+            self._trim_window(words)
+
+    def _snapshot(self):
+        """Return the current window as one contiguous array, along with its start time."""
+        with self.lock:
+            if len(self.frames) > 1:
+                self.frames = [np.concatenate(self.frames)]
+            window = self.frames[0] if self.frames else np.zeros(0, dtype=np.float32)
+            return window, self.window_start
+
+    def _decode(self, window, window_start):
+        """
+        Decode a window of audio.
+
+        :return: List of (start, end, text) words in absolute seconds
+        """
+        committed = self.committed_text()
+        prompt = committed[-200:] if committed else self.initial_prompt
+        segments, _ = self.local_model.transcribe(audio=window,
+                                                  language=self.language,
+                                                  initial_prompt=prompt,
+                                                  condition_on_previous_text=False,
+                                                  temperature=self.temperature,
+                                                  vad_filter=self.vad_filter,
+                                                  word_timestamps=True)
+        words = []
+        for segment in segments:
+            for word in segment.words or []:
+                words.append((window_start + word.start, window_start + word.end, word.word))
+        return words
+
+    def _commit_agreement(self, words, window_end):
+        """
+        Commit the longest prefix on which this hypothesis agrees with the previous one.
+
+        If the uncommitted audio has grown past `max_window` seconds without the decodes agreeing,
+        the words ending more than `min_chunk` seconds before the end of the window are committed
+        anyway, so that the window cannot grow without bound.
+        """
+        words = [w for w in words if w[0] >= self.last_committed_end - 0.05]
+        agreed = 0
+        for new, old in zip(words, self.hypothesis):
+            if new[2].strip().lower() != old[2].strip().lower():
+                break
+            agreed += 1
+
+        uncommitted_start = max(self.window_start, words[agreed - 1][1] if agreed else self.last_committed_end)
+        if window_end - uncommitted_start > self.max_window:
+            while agreed < len(words) and words[agreed][1] <= window_end - self.min_chunk:
+                agreed += 1
+
+        if agreed:
+            self.committed.extend(words[:agreed])
+            self.last_committed_end = words[agreed - 1][1]
+        self.hypothesis = words[agreed:]
+
+    def _trim_window(self, words):
+        """
+        Drop committed audio from the window after each commit, so that later decodes and the
+        final decode in `finish()` only cover the uncommitted tail.
+
+        If nothing was heard and the window has grown past `max_window` seconds, only the most
+        recent audio is kept. Words that were heard are committed by `_commit_agreement` instead.
+        """
+        with self.lock:
+            window_length = self.window_samples / self.sample_rate
+            if self.last_committed_end > self.window_start:
+                cut_time = min(self.last_committed_end, self.window_start + window_length)
+            elif not words and window_length > self.max_window:
+                cut_time = self.window_start + window_length - self.min_chunk
+            else:
+                return
+
+            cut = int((cut_time - self.window_start) * self.sample_rate)
+            if cut <= 0:
+                return
+            window = np.concatenate(self.frames)
+            self.frames = [window[cut:]]
+            self.window_samples -= cut
+            self.decoded_samples = max(0, self.decoded_samples - cut)
+            self.window_start += cut / self.sample_rate
@@ -0,0 +1,234 @@
+import os
+import re
+import yaml
+
+from utils import ConfigManager
+
+CASE_MODES = ('lower', 'upper', 'sentence')
+
+
+def file_mtime(path):
+    """Return the modification time of a file, or None if it is not set or cannot be read."""
+    try:
+        return os.path.getmtime(os.path.expanduser(path)) if path else None
+    except OSError:
+        return None
+
+
+def _trie_pattern(node):
+    """
+    Return a regex matching every string in a character trie, sharing common prefixes.
+    """
+    alternatives = [(r'\s+' if char == ' ' else re.escape(char)) + _trie_pattern(child)
+                    for char, child in sorted(node.items()) if char]
+    if not alternatives:
+        return ''
+    optional = '' in node
+    if len(alternatives) == 1 and not optional:
+        return alternatives[0]
+    return '(?:' + '|'.join(alternatives) + ')' + ('?' if optional else '')
+
+
+def phrase_pattern(phrases):
+    """
+    Return a regex matching any of the phrases, or an empty string if there are none.
+
+    The phrases are merged into a character trie, so the pattern is matched in one pass
+    however many phrases there are, and the longest phrase wins. A space in a phrase matches
+    any run of whitespace.
+    """
+    trie = {}
+    for phrase in phrases:
+        node = trie
+        for char in phrase:
+            node = node.setdefault(char, {})
+        node[''] = {}
+    return _trie_pattern(trie)
+
+
+def normalize_phrase(phrase):
+    """Lowercase a phrase and collapse its whitespace."""
+    return ' '.join(str(phrase).lower().split())
+
+
+class RegexRule:
+    """Replace every match of a regular expression."""
+
+    def __init__(self, pattern, replace='', ignore_case=False):
+        self.name = f'regex {pattern!r}'
+        self.pattern = re.compile(pattern, re.IGNORECASE if ignore_case else 0)
+        self.replace = replace
+
+    def apply(self, text, sentence_start):
+        return self.pattern.sub(self.replace, text)
+
+
+class VocabularyRule:
+    """
+    Replace spoken words and phrases with their written form, such as 'pie torch' with 'PyTorch'.
+
+    Only whole words are replaced, ignoring case and whitespace. All entries are compiled into
+    one pattern, so they are applied in a single pass and a replacement is never matched again.
+    """
+
+    def __init__(self, replacements):
+        self.replacements = {normalize_phrase(spoken): str(written) for spoken, written in replacements.items()}
+        self.replacements.pop('', None)
+        self.name = f'vocabulary ({len(self.replacements)} entries)'
+        self.pattern = None
+        if self.replacements:
+            self.pattern = re.compile(r'(?<!\w)' + phrase_pattern(self.replacements) + r'(?!\w)', re.IGNORECASE)
+
+    def _replace(self, match):
+        return self.replacements.get(normalize_phrase(match.group()), match.group())
+
+    def apply(self, text, sentence_start):
+        return self.pattern.sub(self._replace, text) if self.pattern else text
+
+
+class CaseRule:
+    """
+    Convert the text to lowercase, uppercase or sentence case.
+
+    Sentence case capitalizes the first letter after a full stop, question or exclamation mark,
+    and the first letter of the text if it starts a sentence.
+    """
+
+    SENTENCE_PATTERN = re.compile(r'([.!?]\s+)([^\W\d_])')
+    FIRST_LETTER_PATTERN = re.compile(r'^(\W*)([^\W\d_])')
+
+    def __init__(self, mode):
+        if mode not in CASE_MODES:
+            raise ValueError(f"unknown case {mode!r}, expected one of {', '.join(CASE_MODES)}")
+        self.name = f'case {mode}'
+        self.mode = mode
+
+    @staticmethod
+    def _capitalize(match):
+        return match.group(1) + match.group(2).upper()
+
+    def apply(self, text, sentence_start):
+        if self.mode == 'lower':
+            return text.lower()
+        if self.mode == 'upper':
+            return text.upper()
+        text = self.SENTENCE_PATTERN.sub(self._capitalize, text)
+        if sentence_start:
+            text = self.FIRST_LETTER_PATTERN.sub(self._capitalize, text, count=1)
+        return text
+
+
+class PunctuationSpacingRule:
+    """
+    Remove spaces before punctuation, add a space after commas and semicolons followed by a
+    letter, and collapse runs of spaces, all in one pass.
+    """
+
+    PATTERN = re.compile(r'(?P<before>\s+)(?=[.,!?;:])|(?P<after>[,;])(?=[^\W\d_])|(?P<run>[ \t]{2,})')
+
+    def __init__(self):
+        self.name = 'punctuation spacing'
+
+    @staticmethod
+    def _replace(match):
+        if match.group('before'):
+            return ''
+        if match.group('after'):
+            return match.group('after') + ' '
+        return ' '
+
+    def apply(self, text, sentence_start):
+        return self.PATTERN.sub(self._replace, text)
+
+
+class RulePipeline:
+    """
+    An ordered list of compiled post-processing rules, applied to each segment in turn.
+    """
+
+    def __init__(self, rules=()):
+        self.rules = list(rules)
+
+    def apply(self, text, sentence_start=True):
+        """
+        Apply every rule to the text.
+
+        :param sentence_start: Whether the text starts a new sentence, for sentence casing
+        """
+        for rule in self.rules:
+            text = rule.apply(text, sentence_start)
+        return text
+
+
+def compile_rules(entries, remove_capitalization=False):
+    """
+    Compile a list of rule definitions, as loaded from the rules file, into a pipeline.
+
+    Adjacent vocabulary rules are merged into one. Invalid rules are skipped with a message.
+    """
+    rules = []
+    vocabulary = None
+    for index, entry in enumerate(entries or [], start=1):
+        try:
+            if not isinstance(entry, dict):
+                raise ValueError('expected a mapping')
+            if 'vocabulary' in entry:
+                if vocabulary is None:
+                    vocabulary = {}
+                    rules.append(vocabulary)
+                vocabulary.update(entry['vocabulary'])
+                continue
+            if 'regex' in entry:
+                rule = RegexRule(entry['regex'], entry.get('replace') or '', bool(entry.get('ignore_case')))
+            elif 'case' in entry:
+                rule = CaseRule(entry['case'])
+            elif entry.get('punctuation_spacing'):
+                rule = PunctuationSpacingRule()
+            else:
+                raise ValueError('expected one of regex, vocabulary, case or punctuation_spacing')
+        except (AttributeError, TypeError, ValueError, re.error) as e:
+            ConfigManager.console_print(f'Skipping post-processing rule {index}: {e}')
+            continue
+        rules.append(rule)
+        vocabulary = None
+
+    if remove_capitalization:
+        rules.append(CaseRule('lower'))
+    return RulePipeline(VocabularyRule(rule) if isinstance(rule, dict) else rule for rule in rules)
+
+
+def load_rules(path):
+    """
+    Return the rule definitions from a YAML rules file, or an empty list if it cannot be read.
+    """
+    if not path:
+        return []
+    try:
+        with open(os.path.expanduser(path), encoding='utf-8') as file:
+            entries = yaml.safe_load(file) or []
+    except (OSError, yaml.YAMLError) as e:
+        ConfigManager.console_print(f'Failed to read post-processing rules: {e}')
+        return []
+    if not isinstance(entries, list):
+        ConfigManager.console_print('Failed to read post-processing rules: expected a list of rules.')
+        return []
+    return entries
+
+
+# The compiled pipeline and the settings it was built from, rebuilt only when they change
+_rule_pipeline = None
+_rule_pipeline_source = None
+
+
+def get_rule_pipeline():
+    """
+    Return the rule pipeline for the current settings, compiling it on first use.
+    """
+    global _rule_pipeline, _rule_pipeline_source
+    post_processing = ConfigManager.get_config_section('post_processing')
+    path = post_processing.get('rules_file')
+    source = (path, file_mtime(path), bool(post_processing.get('remove_capitalization')))
+    if _rule_pipeline is None or source != _rule_pipeline_source:
+        _rule_pipeline = compile_rules(load_rules(path), source[2])
+        _rule_pipeline_source = source
+    return _rule_pipeline
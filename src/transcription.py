@@ -1,131 +1,1511 @@
+import hashlib
 import io
+import json
 import os
+import queue
+import re
+import string
+import threading
+import time
+import av
+import httpx
 import numpy as np
 import soundfile as sf
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
 from faster_whisper import WhisperModel
-from openai import OpenAI
+from faster_whisper.vad import VadOptions, get_speech_timestamps
+from openai import BadRequestError, OpenAI
 
+from inverse_text_normalization import get_normalizer
+from resilience import CircuitBreaker, call_with_retries
+from scheduling import inference_cores, run_with_inference_policy
+from text_rules import file_mtime, get_rule_pipeline, normalize_phrase, phrase_pattern
 from utils import ConfigManager
 
+# Scale factor mapping int16 samples to float32 in [-1.0, 1.0)
+INT16_SCALE = np.float32(1.0 / 32768.0)
+
+# Sample rate the voice activity detector expects
+VAD_SAMPLE_RATE = 16000
+
+# Long-lived API clients keyed by (base URL, API key), so connections are reused across requests,
+# with the HTTP client each one sends its requests through
+_api_clients = {}
+_api_http_clients = {}
+_api_clients_lock = threading.Lock()
+
+# Base URLs of servers that rejected streaming transcription requests
+_non_streaming_servers = set()
+
+class TranscriptionCancelled(Exception):
+    """Raised when a transcription is cancelled before it completes."""
+
+def _check_cancelled(cancel_event):
+    if cancel_event is not None and cancel_event.is_set():
+        raise TranscriptionCancelled()
+
+def call_cancellable(func, cancel_event, discard=None):
+    """
+    Run a blocking call on a helper thread, returning its result or raising TranscriptionCancelled
+    as soon as `cancel_event` is set.
+
+    On cancellation the helper thread is abandoned and its call runs to completion on its own,
+    so a cancelled request leaves the shared API client and its connection pool open.
+
+    :param discard: Called with the result of an abandoned call when it arrives, e.g. to close a
+                    streamed response and return its connection to the pool
+    """
+    if cancel_event is None:
+        return func()
+
+    outcome = {}
+    done = threading.Event()
+    lock = threading.Lock()
+
+    def target():
+        try:
+            result = func()
+        except Exception as e:
+            outcome['error'] = e
+        else:
+            with lock:
+                abandoned = outcome.get('abandoned')
+                if not abandoned:
+                    outcome['result'] = result
+            if abandoned and discard:
+                discard(result)
+        finally:
+            done.set()
+
+    threading.Thread(target=target, daemon=True).start()
+    while not done.wait(0.05):
+        if cancel_event.is_set():
+            with lock:
+                outcome['abandoned'] = True
+            if 'result' in outcome and discard:
+                discard(outcome['result'])
+            raise TranscriptionCancelled()
+    if 'error' in outcome:
+        raise outcome['error']
+    return outcome['result']
+
+def _iterate_cancellable(iterable, cancel_event):
+    """
+    Consume an iterable on a helper thread, yielding its items and raising TranscriptionCancelled
+    as soon as `cancel_event` is set.
+
+    faster-whisper only yields a segment once a whole 30 second window is decoded, so checking
+    for cancellation between segments can leave the caller blocked for seconds. On cancellation
+    the helper thread is abandoned, and stops after the item it is decoding.
+    """
+    if cancel_event is None:
+        yield from iterable
+        return
+
+    items = queue.Queue()
+    abandoned = threading.Event()
+
+    def target():
+        try:
+            for item in iterable:
+                items.put(('item', item))
+                if abandoned.is_set() or cancel_event.is_set():
+                    break
+            items.put(('done', None))
+        except Exception as e:
+            items.put(('error', e))
+
+    threading.Thread(target=target, daemon=True).start()
+    try:
+        while True:
+            try:
+                kind, value = items.get(timeout=0.05)
+            except queue.Empty:
+                _check_cancelled(cancel_event)
+                continue
+            if kind == 'done':
+                return
+            if kind == 'error':
+                raise value
+            _check_cancelled(cancel_event)
+            yield value
+    finally:
+        abandoned.set()
+
 HALLUCINATION_PHRASES = [
 ]
 
+class HallucinationMatcher:
+    """
+    Find known hallucinated phrases with one compiled regular expression.
+
+    The phrases are compiled into a trie-shaped pattern, so the matching time grows with the
+    length of the text rather than the number of phrases. A phrase only matches a whole segment
+    or utterance, so the same words inside real speech are kept. Case, whitespace and trailing
+    punctuation are ignored.
+    """
+
+    def __init__(self, phrases):
+        pattern = phrase_pattern({normalize_phrase(phrase).strip(' .!?,') for phrase in phrases} - {''})
+        self.pattern = None
+        if pattern:
+            self.pattern = re.compile(r'\s*(?:' + pattern + r')[\s.!?,]*', re.IGNORECASE)
+
+    def matches(self, text):
+        """Return whether the whole text is a known hallucinated phrase."""
+        return self.pattern is not None and self.pattern.fullmatch(text) is not None
+
+def load_hallucination_phrases():
+    """
+    Return the built-in phrases plus those from the config and the phrases file.
+    """
+    post_processing = ConfigManager.get_config_section('post_processing')
+    phrases = list(HALLUCINATION_PHRASES)
+    phrases.extend((post_processing.get('hallucination_phrases') or '').split('|'))
+    path = post_processing.get('hallucination_phrases_file')
+    if path:
+        try:
+            with open(os.path.expanduser(path), encoding='utf-8') as file:
+                phrases.extend(line for line in file if not line.lstrip().startswith('#'))
+        except OSError as e:
+            ConfigManager.console_print(f'Failed to read hallucination phrases: {e}')
+    return phrases
+
+# The compiled matcher and the settings it was built from, rebuilt only when they change
+_hallucination_matcher = None
+_hallucination_matcher_source = None
+
+def get_hallucination_matcher():
+    """
+    Return the hallucination matcher for the current settings, compiling it on first use.
+    """
+    global _hallucination_matcher, _hallucination_matcher_source
+    post_processing = ConfigManager.get_config_section('post_processing')
+    path = post_processing.get('hallucination_phrases_file')
+    source = (post_processing.get('hallucination_phrases'), path, file_mtime(path))
+    if _hallucination_matcher is None or source != _hallucination_matcher_source:
+        _hallucination_matcher = HallucinationMatcher(load_hallucination_phrases())
+        _hallucination_matcher_source = source
+    return _hallucination_matcher
+
 def is_hallucination(text: str) -> bool:
-    text_lower = text.strip().lower()
-    if not text_lower:
-        return True
-    return any(phrase in text_lower for phrase in HALLUCINATION_PHRASES)
+    """
+    Return whether the text is empty or consists only of a known hallucinated phrase.
+    """
+    return not text.strip() or get_hallucination_matcher().matches(text)
+
+class LanguageCache:
+    """
+    Pin the session language once detection is confident, so later utterances skip detection.
+
+    The language is pinned after it has been detected with high probability on several
+    utterances in a row. It is re-checked every `language_recheck_interval` utterances, or on the
+    next utterance after a low-confidence decode, which may indicate the speaker switched language.
+    """
+
+    # Decodes with a lower average log probability than this trigger a language re-check
+    LOW_CONFIDENCE_LOGPROB = -1.0
+
+    def __init__(self):
+        self.pinned = None
+        self.candidate = None
+        self.agreements = 0
+        self.utterances_since_check = 0
+        self.detection_time = None
+
+    def language(self):
+        """
+        Return the pinned language, or None if the next utterance should detect it.
+        """
+        local_model_options = ConfigManager.get_config_section('model_options', 'local')
+        if not local_model_options.get('language_pinning') or self.pinned is None:
+            return None
+        if self.utterances_since_check >= (local_model_options.get('language_recheck_interval') or 25):
+            return None
+        return self.pinned
+
+    def update(self, language, info, setup_time, avg_logprob):
+        """
+        Update the cache after an utterance has been decoded.
+
+        :param language: The language passed to the model, or None if it was detected
+        :param info: The TranscriptionInfo returned by faster-whisper
+        :param setup_time: Time spent in the eager part of `transcribe()`, including any detection
+        :param avg_logprob: Average log probability of the decoded segments, if any
+        """
+        local_model_options = ConfigManager.get_config_section('model_options', 'local')
+        if language is None:
+            self._record_detection(info, setup_time, local_model_options)
+            return
+
+        self.utterances_since_check += 1
+        if self.detection_time is not None:
+            saved_time = max(0.0, self.detection_time - setup_time)
+            ConfigManager.console_print(f"Language pinned to '{language}', skipped detection "
+                                        f'(saved ~{saved_time * 1000:.0f} ms).')
+        if avg_logprob is not None and avg_logprob < self.LOW_CONFIDENCE_LOGPROB:
+            ConfigManager.console_print('Low-confidence decode, re-checking the language on the next utterance.')
+            self.utterances_since_check = local_model_options.get('language_recheck_interval') or 25
+
+    def _record_detection(self, info, setup_time, local_model_options):
+        """Track a detected language and pin it once it is confident and consistent."""
+        if self.detection_time is None:
+            self.detection_time = setup_time
+        else:
+            self.detection_time = 0.8 * self.detection_time + 0.2 * setup_time
+        self.utterances_since_check = 0
+
+        threshold = local_model_options.get('language_pin_threshold') or 0.8
+        if info.language_probability < threshold:
+            self.agreements = 0
+            return
+
+        if self.pinned and info.language != self.pinned:
+            ConfigManager.console_print(f"Detected language changed to '{info.language}', unpinning '{self.pinned}'.")
+            self.pinned = None
+
+        if info.language == self.candidate:
+            self.agreements += 1
+        else:
+            self.candidate = info.language
+            self.agreements = 1
+
+        if self.pinned is None and self.agreements >= (local_model_options.get('language_pin_utterances') or 2):
+            self.pinned = self.candidate
+            ConfigManager.console_print(f"Pinned language '{self.pinned}' "
+                                        f'(probability {info.language_probability:.2f}).')
+
+language_cache = LanguageCache()
+
+class RollingContext:
+    """
+    Keep the last few transcriptions to use as context in the prompt for the next one.
+
+    Each transcription is tokenized once with the local model's tokenizer when it is added, so
+    building a prompt within the token budget never re-tokenizes earlier text. The context is
+    dropped after an idle gap, as the next recording is then likely about something else.
+    """
+
+    # Approximate characters per token, used when no tokenizer is available (API)
+    CHARS_PER_TOKEN = 4
+
+    def __init__(self):
+        self.entries = deque()
+        self.last_added = None
+
+    def add(self, text, local_model=None):
+        """
+        Add a committed transcription to the context.
+
+        :param text: The raw (not post-processed) transcription
+        :param local_model: Local model whose tokenizer counts the tokens (if applicable)
+        """
+        common_options = ConfigManager.get_config_section('model_options', 'common')
+        text = text.strip()
+        if not common_options.get('rolling_context') or not text:
+            return
+
+        tokenizer = getattr(local_model, 'hf_tokenizer', None)
+        tokens = tokenizer.encode(' ' + text, add_special_tokens=False).ids if tokenizer else None
+        self.entries.append((text, tokens))
+        while len(self.entries) > (common_options.get('rolling_context_utterances') or 3):
+            self.entries.popleft()
+        self.last_added = time.time()
+
+    def prompt(self, initial_prompt, local_model=None):
+        """
+        Return the initial prompt followed by as much recent context as fits in the token budget.
+        """
+        common_options = ConfigManager.get_config_section('model_options', 'common')
+        if not common_options.get('rolling_context') or not self.entries:
+            return initial_prompt
+
+        idle_reset = common_options.get('rolling_context_idle_reset') or 30
+        if time.time() - self.last_added > idle_reset:
+            ConfigManager.console_print('Rolling context reset after idle gap.')
+            self.entries.clear()
+            return initial_prompt
+
+        tokenizer = getattr(local_model, 'hf_tokenizer', None)
+        budget = common_options.get('rolling_context_tokens') or 100
+        remaining = budget
+        parts = []
+        for text, tokens in reversed(self.entries):
+            cost = len(tokens) if tokens is not None else len(text) // self.CHARS_PER_TOKEN + 1
+            if cost <= remaining:
+                parts.append(text)
+                remaining -= cost
+                continue
+            if not parts:
+                # The latest transcription alone is over budget, so keep only its end
+                if tokens is not None and tokenizer:
+                    parts.append(tokenizer.decode(tokens[-remaining:]).strip())
+                else:
+                    parts.append(text[-remaining * self.CHARS_PER_TOKEN:])
+                remaining = 0
+            break
+
+        context = ' '.join(reversed(parts))
+        ConfigManager.console_print(f'Rolling context: {budget - remaining} tokens from {len(parts)} transcriptions.')
+        return f'{initial_prompt} {context}' if initial_prompt else context
+
+rolling_context = RollingContext()
+
+class ResultCache:
+    """
+    Cache raw transcriptions by a hash of the audio and the settings that affect decoding.
+
+    Byte-identical audio decoded with the same model, language, initial prompt and temperature
+    skips the decode or API call. The rolling context is not part of the key, so that retrying
+    an utterance hits the cache even though it was added to the context. Entries are kept in a
+    bounded LRU in memory and, if a directory is configured, also stored on disk as one small
+    JSON file per entry.
+    """
+
+    def __init__(self):
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.saved_time = 0.0
+
+    @staticmethod
+    def enabled():
+        return bool(ConfigManager.get_config_value('misc', 'result_cache'))
 
-def create_local_model():
+    @staticmethod
+    def key(audio_data):
+        """
+        Return the cache key of the audio under the current decode settings.
+        """
+        model_options = ConfigManager.get_config_section('model_options')
+        if model_options.get('use_api'):
+            model = ('api', model_options['api'].get('base_url'), model_options['api']['model'])
+        else:
+            model = ('local', model_options['local'].get('model_path') or model_options['local']['model'],
+                     model_options['local']['compute_type'])
+        settings = (model, model_options['common']['language'], model_options['common']['initial_prompt'],
+                    model_options['common']['temperature'], str(audio_data.dtype), audio_data.shape)
+
+        digest = hashlib.blake2b(repr(settings).encode(), digest_size=16)
+        # Hashing the array's buffer directly avoids copying it
+        digest.update(np.ascontiguousarray(audio_data))
+        return digest.hexdigest()
+
+    @staticmethod
+    def _path(key):
+        directory = ConfigManager.get_config_value('misc', 'result_cache_dir')
+        return os.path.join(os.path.expanduser(directory), f'{key}.json') if directory else None
+
+    def get(self, key):
+        """
+        Return the cached transcription for the key, or None on a miss.
+        """
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                self.entries.move_to_end(key)
+        path = self._path(key)
+        if entry is None and path and os.path.exists(path):
+            try:
+                with open(path, encoding='utf-8') as file:
+                    entry = json.load(file)
+                self._remember(key, entry)
+            except (OSError, ValueError) as e:
+                ConfigManager.console_print(f'Failed to read cached transcription: {e}')
+
+        with self.lock:
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.saved_time += entry['decode_time']
+            hits, total, saved_time = self.hits, self.hits + self.misses, self.saved_time
+        ConfigManager.console_print(f"Result cache hit, skipped {entry['decode_time']:.2f} s of transcription "
+                                    f'({hits} of {total} hits, {hits / total:.0%}; {saved_time:.2f} s saved in total).')
+        return entry['text']
+
+    def put(self, key, text, decode_time):
+        """
+        Store a raw transcription and the time it took to produce.
+        """
+        entry = {'text': text, 'decode_time': decode_time}
+        self._remember(key, entry)
+        path = self._path(key)
+        if path:
+            try:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                with open(path, 'w', encoding='utf-8') as file:
+                    json.dump(entry, file)
+            except OSError as e:
+                ConfigManager.console_print(f'Failed to store cached transcription: {e}')
+
+    def _remember(self, key, entry):
+        max_entries = ConfigManager.get_config_value('misc', 'result_cache_size') or 128
+        with self.lock:
+            self.entries[key] = entry
+            self.entries.move_to_end(key)
+            while len(self.entries) > max_entries:
+                self.entries.popitem(last=False)
+
+result_cache = ResultCache()
+
+def create_local_model(model_name=None):
     """
     Create a local model using the faster-whisper library.
+
+    :param model_name: Model to load instead of the configured model or model path
     """
     ConfigManager.console_print('Creating local model...')
     local_model_options = ConfigManager.get_config_section('model_options')['local']
     compute_type = local_model_options['compute_type']
-    model_path = local_model_options.get('model_path')
+    model_path = local_model_options.get('model_path') if not model_name else None
+    model_name = model_name or local_model_options['model']
 
-    if compute_type == 'int8':
+    if compute_type in ('int8', 'int8_float32'):
         device = 'cpu'
         ConfigManager.console_print('Using int8 quantization, forcing CPU usage.')
     else:
         device = local_model_options['device']
 
+    # Multiple workers let chunks of long recordings be decoded in parallel; unless the thread
+    # count is set, split the CPU threads between them so they do not oversubscribe the cores
+    num_workers = local_model_options.get('num_workers') or 1
+    cpu_threads = local_model_options.get('cpu_threads') or 0
+    cores = inference_cores()
+    if not cpu_threads and (num_workers > 1 or cores):
+        cpu_threads = max(1, len(cores or range(os.cpu_count() or 1)) // num_workers)
+
+    # The model is loaded under the inference scheduling policy so that its compute threads
+    # inherit the CPU affinity and nice level
     try:
         if model_path:
             ConfigManager.console_print(f'Loading model from: {model_path}')
-            model = WhisperModel(model_path,
-                                 device=device,
-                                 compute_type=compute_type,
-                                 download_root=None)  # Prevent automatic download
+            model = run_with_inference_policy(lambda: WhisperModel(model_path,
+                                                                   device=device,
+                                                                   compute_type=compute_type,
+                                                                   cpu_threads=cpu_threads,
+                                                                   num_workers=num_workers,
+                                                                   download_root=None))  # Prevent automatic download
         else:
-            model = WhisperModel(local_model_options['model'],
-                                 device=device,
-                                 compute_type=compute_type)
+            model = run_with_inference_policy(lambda: WhisperModel(model_name,
+                                                                   device=device,
+                                                                   compute_type=compute_type,
+                                                                   cpu_threads=cpu_threads,
+                                                                   num_workers=num_workers))
     except Exception as e:
         ConfigManager.console_print(f'Error initializing WhisperModel: {e}')
         ConfigManager.console_print('Falling back to CPU.')
-        model = WhisperModel(model_path or local_model_options['model'],
-                             device='cpu',
-                             compute_type=compute_type,
-                             download_root=None if model_path else None)
+        model = run_with_inference_policy(lambda: WhisperModel(model_path or model_name,
+                                                               device='cpu',
+                                                               compute_type=compute_type,
+                                                               cpu_threads=cpu_threads,
+                                                               num_workers=num_workers,
+                                                               download_root=None if model_path else None))
 
     ConfigManager.console_print('Local model created.')
     return model
 
-def transcribe_local(audio_data, local_model=None):
+def int16_to_float32(audio_data):
     """
-    Transcribe an audio file using a local model.
+    Convert int16 audio to a new float32 array in one pass, without a float64 intermediate.
+
+    Audio that is already float32 is returned as-is.
+    """
+    if audio_data.dtype == np.float32:
+        return audio_data
+    return np.multiply(audio_data, INT16_SCALE, dtype=np.float32)
+
+def split_at_pauses(audio_data, min_chunk_length, sample_rate=16000):
+    """
+    Split audio into chunks of at least `min_chunk_length` seconds, cutting in the middle of pauses.
+
+    The voice activity detector only works at 16 kHz, so audio at other sample rates is
+    resampled for it and the pauses are mapped back.
+
+    :return: List of (start, end) sample indices covering the whole audio
+    """
+    vad_audio = audio_data
+    if sample_rate != VAD_SAMPLE_RATE:
+        positions = np.arange(0, len(audio_data), sample_rate / VAD_SAMPLE_RATE)
+        vad_audio = np.interp(positions, np.arange(len(audio_data)), audio_data).astype(np.float32)
+    speech = get_speech_timestamps(vad_audio, VadOptions(min_silence_duration_ms=300))
+    min_chunk_samples = int(min_chunk_length * sample_rate)
+
+    cuts = [0]
+    for previous, following in zip(speech, speech[1:]):
+        pause_middle = (previous['end'] + following['start']) * sample_rate // (2 * VAD_SAMPLE_RATE)
+        if pause_middle - cuts[-1] >= min_chunk_samples:
+            cuts.append(pause_middle)
+    if len(audio_data) - cuts[-1] < min_chunk_samples // 2 and len(cuts) > 1:
+        # Fold a short final chunk into the previous one
+        cuts.pop()
+    cuts.append(len(audio_data))
+    return list(zip(cuts, cuts[1:]))
+
+def _normalize_word(word):
+    return word.strip(string.punctuation + string.whitespace).lower()
+
+def decoder_thresholds(model_options):
+    """
+    Return the faster-whisper decoding thresholds, shared with segment filtering.
+    """
+    local_model_options = model_options['local']
+    return {
+        'compression_ratio_threshold': local_model_options.get('compression_ratio_threshold') or 2.4,
+        'log_prob_threshold': local_model_options.get('log_prob_threshold') or -1.0,
+        'no_speech_threshold': local_model_options.get('no_speech_threshold') or 0.6,
+    }
+
+def decoder_options(model_options):
+    """
+    Return the decoding thresholds and the options that stop repetition loops while decoding.
+
+    `no_repeat_ngram_size` and `repetition_penalty` act on every decoding step, so a loop is cut
+    short inside its window rather than filtered out once the window is decoded.
+    `hallucination_silence_threshold` needs word timestamps, so it turns them on.
+    """
+    local_model_options = model_options['local']
+    silence_threshold = local_model_options.get('hallucination_silence_threshold')
+    return {
+        **decoder_thresholds(model_options),
+        'no_repeat_ngram_size': local_model_options.get('no_repeat_ngram_size') or 0,
+        'repetition_penalty': local_model_options.get('repetition_penalty') or 1.0,
+        'hallucination_silence_threshold': silence_threshold or None,
+        'word_timestamps': bool(silence_threshold),
+    }
+
+class SegmentFilter:
+    """
+    Drop segments that the decoder statistics mark as hallucinated, and cut off repetition loops.
+
+    A segment is dropped if it is likely silence (high `no_speech_prob` with a low
+    `avg_logprob`), highly repetitive (high `compression_ratio`) or a known hallucinated phrase
+    in its entirety. When the text of one decoding window ends in an n-gram repeated
+    `max_repetitions` times in a row, spanning at least `MIN_LOOP_WORDS` words, the segment that
+    completes the loop is cut where the loop started and the rest of that window is dropped.
+    Repetitions in earlier segments have already been returned, and may already have been typed,
+    so they are kept. Decoding carries on with the next window, so no audio is skipped.
+
+    This filter only sees text once it is decoded. Loops are bounded during decoding by the
+    options from decoder_options.
+    """
+
+    MAX_NGRAM = 8
+    # Short repeats such as "no, no, no, no" are usually genuine speech
+    MIN_LOOP_WORDS = 8
+
+    def __init__(self, model_options):
+        thresholds = decoder_thresholds(model_options)
+        self.compression_ratio_threshold = thresholds['compression_ratio_threshold']
+        self.log_prob_threshold = thresholds['log_prob_threshold']
+        self.no_speech_threshold = thresholds['no_speech_threshold']
+        max_repetitions = model_options['local'].get('max_repetitions')
+        self.max_repetitions = 4 if max_repetitions is None else max_repetitions
+        self.hallucinations = get_hallucination_matcher()
+        self.window = None
+        self.looping_window = None
+        self.words = []
+
+    def filter(self, segment):
+        """
+        Return the text of the segment that should be kept.
+        """
+        window = getattr(segment, 'seek', None)
+        if window != self.window:
+            # Repetitions are only counted within one decoding window
+            self.window = window
+            self.words = []
+        if self.looping_window is not None and window == self.looping_window:
+            return ''
+
+        if segment.no_speech_prob > self.no_speech_threshold and segment.avg_logprob < self.log_prob_threshold:
+            ConfigManager.console_print(f'Dropped likely silent segment: {segment.text}')
+            return ''
+        if segment.compression_ratio > self.compression_ratio_threshold:
+            ConfigManager.console_print(f'Dropped repetitive segment: {segment.text}')
+            return ''
+        if self.hallucinations.matches(segment.text):
+            ConfigManager.console_print(f'Dropped known hallucination: {segment.text}')
+            return ''
+        if not self.max_repetitions:
+            return segment.text
+
+        tokens = re.findall(r'\s*\S+', segment.text)
+        previous_length = len(self.words)
+        self.words.extend(_normalize_word(token) for token in tokens)
+        loop_start = self._find_loop()
+        if loop_start is None:
+            return segment.text
+
+        ConfigManager.console_print('Repetition loop detected, truncating the rest of the window.')
+        self.looping_window = window
+        self.words = self.words[:loop_start]
+        return ''.join(tokens[:max(0, loop_start - previous_length)])
+
+    def _find_loop(self):
+        """
+        Return the index just after the first occurrence of a trailing repeated n-gram, if any.
+        """
+        words = self.words
+        for n in range(1, self.MAX_NGRAM + 1):
+            ngram = words[-n:]
+            start = len(words) - n
+            repetitions = 1
+            while start >= n and words[start - n:start] == ngram:
+                start -= n
+                repetitions += 1
+            if repetitions >= self.max_repetitions and repetitions * n >= self.MIN_LOOP_WORDS:
+                return start + n
+        return None
+
+def _transcribe_chunk(local_model, audio_data, model_options, language, prompt, cancel_event=None):
+    """
+    Transcribe one chunk of a long recording.
+
+    :return: The text, the decode time, the average log probability of each segment, the
+             TranscriptionInfo and the time spent in the eager part of `transcribe()`
+    """
+    start_time = time.time()
+    segments, info = local_model.transcribe(audio=audio_data,
+                                            language=language,
+                                            initial_prompt=prompt,
+                                            condition_on_previous_text=model_options['local']['condition_on_previous_text'],
+                                            temperature=model_options['common']['temperature'],
+                                            vad_filter=model_options['local']['vad_filter'],
+                                            **decoder_options(model_options))
+    setup_time = time.time() - start_time
+    segment_filter = SegmentFilter(model_options)
+    texts = []
+    logprobs = []
+    for segment in segments:
+        logprobs.append(segment.avg_logprob)
+        texts.append(segment_filter.filter(segment))
+        if cancel_event is not None and cancel_event.is_set():
+            break
+    return ''.join(texts), time.time() - start_time, logprobs, info, setup_time
+
+def transcribe_long_form(audio_data, local_model, model_options, language, prompt, cancel_event=None, stats=None,
+                         sample_rate=16000):
+    """
+    Split a long recording at pauses and decode the chunks in parallel, yielding their text in order.
+
+    Once every chunk is decoded, the language cache is updated from the first chunk, and the
+    average log probability of all segments is stored in `stats`, as for a single decode.
+    """
+    num_workers = model_options['local'].get('num_workers') or 1
+    chunks = split_at_pauses(audio_data, model_options['local'].get('long_form_chunk_length') or 30, sample_rate)
+    ConfigManager.console_print(f'Decoding {len(chunks)} chunks on {num_workers} workers...')
+
+    start_time = time.time()
+    decode_time = 0.0
+    logprobs = []
+    first_info = first_setup_time = None
+    executor = ThreadPoolExecutor(max_workers=num_workers)
+    futures = [executor.submit(_transcribe_chunk, local_model, audio_data[start:end], model_options, language,
+                               prompt, cancel_event)
+               for start, end in chunks]
+    try:
+        for future in futures:
+            text, chunk_time, chunk_logprobs, info, setup_time = call_cancellable(future.result, cancel_event)
+            decode_time += chunk_time
+            logprobs.extend(chunk_logprobs)
+            if first_info is None:
+                first_info, first_setup_time = info, setup_time
+            yield text
+    finally:
+        # On cancellation, chunks being decoded stop at their next segment without being waited for
+        for pending in futures:
+            pending.cancel()
+        executor.shutdown(wait=False)
+
+    wall_time = time.time() - start_time
+    ConfigManager.console_print(f'Long-form decode: {wall_time:.2f} s wall clock, {decode_time:.2f} s of chunk decoding, '
+                                f'{decode_time / wall_time:.2f}x speedup on {num_workers} workers '
+                                f'({os.cpu_count()} cores).')
+
+    avg_logprob = sum(logprobs) / len(logprobs) if logprobs else None
+    if stats is not None:
+        stats['avg_logprob'] = avg_logprob
+    if not model_options['common']['language']:
+        language_cache.update(language, first_info, first_setup_time, avg_logprob)
+
+def transcribe_local_segments(audio_data, local_model=None, stats=None, cancel_event=None):
+    """
+    Transcribe audio data using a local model, yielding the text of each segment as it is decoded.
+
+    If a `stats` dict is given, the average log probability of the segments is stored in it
+    under 'avg_logprob' once decoding is complete. If `cancel_event` is set, TranscriptionCancelled
+    is raised at once, and the abandoned decode stops at the next segment boundary.
     """
     if not local_model:
         local_model = create_local_model()
     model_options = ConfigManager.get_config_section('model_options')
 
-    # Convert int16 to float32
-    audio_data_float = audio_data.astype(np.float32) / 32768.0
+    # Convert int16 to float32 without allocating temporaries
+    audio_data_float = int16_to_float32(audio_data)
+
+    language = model_options['common']['language'] or language_cache.language()
+    prompt = rolling_context.prompt(model_options['common']['initial_prompt'], local_model)
 
-    response = local_model.transcribe(audio=audio_data_float,
-                                      language=model_options['common']['language'],
-                                      initial_prompt=model_options['common']['initial_prompt'],
-                                      condition_on_previous_text=model_options['local']['condition_on_previous_text'],
-                                      temperature=model_options['common']['temperature'],
-                                      vad_filter=model_options['local']['vad_filter'],)
-    return ''.join([segment.text for segment in list(response[0])])
+    long_form_threshold = model_options['local'].get('long_form_threshold')
+    sample_rate = ConfigManager.get_config_section('recording_options').get('sample_rate') or 16000
+    if (long_form_threshold and (model_options['local'].get('num_workers') or 1) > 1
+            and len(audio_data_float) / sample_rate > long_form_threshold):
+        yield from transcribe_long_form(audio_data_float, local_model, model_options, language, prompt, cancel_event,
+                                        stats, sample_rate)
+        return
 
-def transcribe_api(audio_data):
+    _check_cancelled(cancel_event)
+
+    # Feature extraction and language detection happen eagerly here; the segments generator
+    # is lazy, so decoding only advances as it is consumed
+    start_time = time.time()
+    segments, info = call_cancellable(lambda: local_model.transcribe(
+        audio=audio_data_float,
+        language=language,
+        initial_prompt=prompt,
+        condition_on_previous_text=model_options['local']['condition_on_previous_text'],
+        temperature=model_options['common']['temperature'],
+        vad_filter=model_options['local']['vad_filter'],
+        **decoder_options(model_options),
+    ), cancel_event)
+    setup_time = time.time() - start_time
+
+    segment_filter = SegmentFilter(model_options)
+    logprobs = []
+    for segment in _iterate_cancellable(segments, cancel_event):
+        logprobs.append(segment.avg_logprob)
+        text = segment_filter.filter(segment)
+        if text:
+            yield text
+
+    avg_logprob = sum(logprobs) / len(logprobs) if logprobs else None
+    if stats is not None:
+        stats['avg_logprob'] = avg_logprob
+    if not model_options['common']['language']:
+        language_cache.update(language, info, setup_time, avg_logprob)
+
+def transcribe_local(audio_data, local_model=None, cancel_event=None):
     """
-    Transcribe an audio file using the OpenAI API.
+    Transcribe an audio file using a local model.
     """
-    model_options = ConfigManager.get_config_section('model_options')
-    client = OpenAI(
-        api_key=os.getenv('OPENAI_API_KEY') or None,
-        base_url=model_options['api']['base_url'] or 'https://api.openai.com/v1'
-    )
+    return ''.join(transcribe_local_segments(audio_data, local_model, cancel_event=cancel_event))
+
+def get_api_client():
+    """
+    Return the shared OpenAI client for the configured base URL and API key.
+
+    The client keeps a pool of HTTP keep-alive connections, so after the first request each
+    utterance skips the TCP connection and TLS handshake.
+    """
+    return _get_api_clients()[0]
 
-    # Convert numpy array to WAV file
+def _get_api_clients():
+    """
+    Return the shared OpenAI client and the httpx.Client it sends its requests through.
+    """
+    api_options = ConfigManager.get_config_section('model_options', 'api')
+    base_url = api_options.get('base_url') or 'https://api.openai.com/v1'
+    api_key = os.getenv('OPENAI_API_KEY') or None
+    key = (base_url, api_key)
+
+    with _api_clients_lock:
+        client = _api_clients.get(key)
+        if client is None:
+            max_connections = api_options.get('max_connections') or 4
+            http_client = httpx.Client(limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_connections,
+                keepalive_expiry=api_options.get('keepalive_expiry') or 60,
+            ))
+            # Retries are handled by call_with_retries, which also feeds the circuit breaker
+            client = OpenAI(api_key=api_key, base_url=base_url, http_client=http_client, max_retries=0)
+            _api_clients[key] = client
+            _api_http_clients[key] = http_client
+        return client, _api_http_clients[key]
+
+def clear_api_clients():
+    """
+    Close and forget all cached API clients, e.g. after the settings change.
+    """
+    with _api_clients_lock:
+        clients = list(_api_clients.values())
+        _api_clients.clear()
+        _api_http_clients.clear()
+    for client in clients:
+        client.close()
+
+def prewarm_api_connection():
+    """
+    Open a keep-alive connection to the API in the background, ahead of the first request.
+    """
+    client, http_client = _get_api_clients()
+
+    def prewarm():
+        try:
+            # Any response will do: the point is to complete the TCP and TLS handshakes
+            http_client.head(str(client.base_url))
+        except Exception as e:
+            ConfigManager.console_print(f'Failed to pre-warm API connection: {e}')
+
+    threading.Thread(target=prewarm, daemon=True).start()
+
+# Samples passed to the encoder at a time when encoding an upload
+UPLOAD_BLOCK_SIZE = 16000
+
+# The only sample rates libopus can encode
+OPUS_SAMPLE_RATES = (8000, 12000, 16000, 24000, 48000)
+
+def _encode_opus(audio_data, sample_rate, bitrate, byte_io):
+    """
+    Encode the recording as Opus in an Ogg container, one block at a time.
+    """
+    sample_format = 'flt' if audio_data.dtype == np.float32 else 's16'
+    container = av.open(byte_io, mode='w', format='ogg')
+    try:
+        stream = container.add_stream('libopus', rate=sample_rate)
+        stream.bit_rate = bitrate
+        stream.layout = 'mono'
+        for start in range(0, len(audio_data), UPLOAD_BLOCK_SIZE):
+            block = audio_data[start:start + UPLOAD_BLOCK_SIZE]
+            if sample_format == 's16':
+                block = block.astype(np.int16, copy=False)
+            frame = av.AudioFrame.from_ndarray(block.reshape(1, -1), format=sample_format, layout='mono')
+            frame.sample_rate = sample_rate
+            frame.pts = start
+            for packet in stream.encode(frame):
+                container.mux(packet)
+        # Flush the frames buffered in the encoder
+        for packet in stream.encode(None):
+            container.mux(packet)
+    finally:
+        container.close()
+
+def encode_upload(audio_data, sample_rate, upload_format='wav', opus_bitrate=32000):
+    """
+    Encode the recording for upload to the API as WAV, FLAC or Opus.
+
+    The encoder is fed one block at a time from views of `audio_data`, so no converted copy of
+    the whole recording is made. Only the encoded file is held in memory.
+
+    Opus only supports some sample rates, so recordings at other rates are uploaded as FLAC.
+
+    :return: (filename, file object, MIME type), as accepted by the OpenAI client.
+    """
     byte_io = io.BytesIO()
-    sample_rate = ConfigManager.get_config_section('recording_options').get('sample_rate') or 16000
-    sf.write(byte_io, audio_data, sample_rate, format='wav')
+    if upload_format == 'opus' and sample_rate not in OPUS_SAMPLE_RATES:
+        ConfigManager.console_print(f'Opus cannot encode {sample_rate} Hz audio, uploading as FLAC instead.')
+        upload_format = 'flac'
+    if upload_format == 'opus':
+        _encode_opus(audio_data, sample_rate, opus_bitrate, byte_io)
+        filename, mime_type = 'audio.ogg', 'audio/ogg'
+    else:
+        file_format = 'FLAC' if upload_format == 'flac' else 'WAV'
+        with sf.SoundFile(byte_io, 'w', sample_rate, 1, subtype='PCM_16', format=file_format) as sound_file:
+            for start in range(0, len(audio_data), UPLOAD_BLOCK_SIZE):
+                sound_file.write(audio_data[start:start + UPLOAD_BLOCK_SIZE])
+        filename, mime_type = ('audio.flac', 'audio/flac') if file_format == 'FLAC' else ('audio.wav', 'audio/wav')
     byte_io.seek(0)
+    return filename, byte_io, mime_type
 
-    response = client.audio.transcriptions.create(
-        model=model_options['api']['model'],
-        file=('audio.wav', byte_io, 'audio/wav'),
-        language=model_options['common']['language'],
-        prompt=model_options['common']['initial_prompt'],
-        temperature=model_options['common']['temperature'],
-    )
+def api_request_options(model_options, prompt):
+    """
+    Return the keyword arguments of a transcription request, shared by the sync and async clients.
+    """
+    return {
+        'model': model_options['api']['model'],
+        'language': model_options['common']['language'],
+        'prompt': prompt,
+        'temperature': model_options['common']['temperature'],
+        'timeout': model_options['api'].get('request_timeout') or 30,
+    }
+
+def encode_api_upload(audio_data, sample_rate, model_options):
+    """
+    Encode the recording in the configured upload format.
+    """
+    api_options = model_options['api']
+    return encode_upload(audio_data, sample_rate, api_options.get('upload_format') or 'wav',
+                         api_options.get('opus_bitrate') or 32000)
+
+def _request_transcription(client, audio_data, sample_rate, model_options, prompt, cancel_event=None, retry=True):
+    """
+    Encode audio and send a transcription request, returning the text.
+
+    Each attempt is limited to `request_timeout` seconds, and transient failures are retried
+    unless `retry` is False.
+    """
+    upload = encode_api_upload(audio_data, sample_rate, model_options)
+
+    def attempt():
+        upload[1].seek(0)
+        return call_cancellable(lambda: client.audio.transcriptions.create(
+            file=upload, **api_request_options(model_options, prompt)), cancel_event)
+
+    def wait(delay):
+        if cancel_event is None:
+            time.sleep(delay)
+        elif cancel_event.wait(delay):
+            raise TranscriptionCancelled()
+
+    response = call_with_retries(attempt, wait, api_breaker.record_retry) if retry else attempt()
     return response.text
 
+# Characters from the end of the previous chunk used to prompt the next one (about 50 tokens)
+CHUNK_PROMPT_CHARS = 200
+
+def chunk_prompt(initial_prompt, previous_text):
+    """
+    Return the initial prompt followed by the end of the previous chunk's text, cut at a word.
+    """
+    tail = previous_text.strip()
+    if len(tail) > CHUNK_PROMPT_CHARS:
+        tail = tail[-CHUNK_PROMPT_CHARS:]
+        tail = tail[tail.find(' ') + 1:]
+    return f'{initial_prompt} {tail}' if initial_prompt else tail
+
+def is_long_form_upload(audio_data, model_options, sample_rate):
+    """Return whether a recording is longer than `long_form_threshold`, so it is uploaded in chunks."""
+    long_form_threshold = model_options['api'].get('long_form_threshold')
+    return bool(long_form_threshold) and len(audio_data) / sample_rate > long_form_threshold
+
+def api_chunks(audio_data, model_options, sample_rate):
+    """
+    Return the (start, end) sample indices of the chunks to upload a recording in, or None if it
+    should be sent in one request.
+    """
+    if not is_long_form_upload(audio_data, model_options, sample_rate):
+        return None
+    chunks = split_at_pauses(int16_to_float32(audio_data), model_options['api'].get('long_form_chunk_length') or 30,
+                             sample_rate)
+    return chunks if len(chunks) > 1 else None
+
+def chunk_request_prompt(texts, index, prompt, model_options):
+    """
+    Return the prompt for chunk `index`: the end of the previous chunk's text if it has arrived
+    by the time the chunk is sent, and `prompt` otherwise.
+    """
+    if index and texts[index - 1]:
+        return chunk_prompt(model_options['common']['initial_prompt'], texts[index - 1])
+    return prompt
+
+def report_chunked_upload(wall_time, request_times, parallel_requests):
+    """Print how much parallel chunk uploads saved over sending the chunks one by one."""
+    request_time = sum(request_times)
+    ConfigManager.console_print(f'Chunked upload: {wall_time:.2f} s wall clock, {request_time:.2f} s of requests, '
+                                f'{request_time / wall_time:.2f}x speedup with {parallel_requests} parallel requests.')
+
+def join_chunk_texts(texts):
+    """Join the texts of consecutive chunks with single spaces."""
+    return ' '.join(text.strip() for text in texts if text.strip())
+
+def transcribe_api_chunked(audio_data, chunks, client, model_options, sample_rate, prompt, cancel_event=None):
+    """
+    Upload the chunks of a long recording concurrently, returning the text in order.
+
+    Up to `max_parallel_requests` chunks are in flight at once, sent in order, and each is
+    prompted with chunk_request_prompt.
+    """
+    parallel_requests = model_options['api'].get('max_parallel_requests') or 4
+    ConfigManager.console_print(f'Uploading {len(chunks)} chunks, {parallel_requests} at a time...')
+
+    texts = [None] * len(chunks)
+    request_times = [0.0] * len(chunks)
+
+    def request_chunk(index):
+        _check_cancelled(cancel_event)
+        start, end = chunks[index]
+        request_start = time.time()
+        texts[index] = _request_transcription(client, audio_data[start:end], sample_rate, model_options,
+                                              chunk_request_prompt(texts, index, prompt, model_options), cancel_event)
+        request_times[index] = time.time() - request_start
+
+    start_time = time.time()
+    with ThreadPoolExecutor(max_workers=parallel_requests) as executor:
+        futures = [executor.submit(request_chunk, index) for index in range(len(chunks))]
+        try:
+            for future in futures:
+                future.result()
+        except BaseException:
+            for pending in futures:
+                pending.cancel()
+            raise
+
+    report_chunked_upload(time.time() - start_time, request_times, parallel_requests)
+    return join_chunk_texts(texts)
+
+def transcribe_api(audio_data, cancel_event=None):
+    """
+    Transcribe an audio file using the OpenAI API.
+
+    Recordings longer than `long_form_threshold` are split at pauses and uploaded as chunks in
+    parallel. If `cancel_event` is set while waiting for the response, the request is abandoned
+    and TranscriptionCancelled is raised.
+    """
+    model_options = ConfigManager.get_config_section('model_options')
+    client = get_api_client()
+    sample_rate = ConfigManager.get_config_section('recording_options').get('sample_rate') or 16000
+    prompt = rolling_context.prompt(model_options['common']['initial_prompt'])
+
+    chunks = api_chunks(audio_data, model_options, sample_rate)
+    if chunks:
+        return transcribe_api_chunked(audio_data, chunks, client, model_options, sample_rate, prompt, cancel_event)
+    return _request_transcription(client, audio_data, sample_rate, model_options, prompt, cancel_event)
+
+def _probe_api():
+    """
+    Send a short silent recording to the API without retries, raising an exception on failure.
+    """
+    model_options = ConfigManager.get_config_section('model_options')
+    sample_rate = ConfigManager.get_config_section('recording_options').get('sample_rate') or 16000
+    _request_transcription(get_api_client(), np.zeros(sample_rate // 2, dtype=np.int16), sample_rate,
+                           model_options, None, retry=False)
+
+api_breaker = CircuitBreaker(_probe_api)
+
+# Local model loaded on first use when the API is unavailable
+_fallback_model = None
+_fallback_model_lock = threading.Lock()
+
+def get_fallback_model(local_model=None):
+    global _fallback_model
+    if local_model:
+        return local_model
+    with _fallback_model_lock:
+        if _fallback_model is None:
+            ConfigManager.console_print('Loading local model for API fallback...')
+            _fallback_model = create_local_model()
+    return _fallback_model
+
+def record_api_failure(error):
+    """
+    Count a failed API transcription towards the circuit breaker before falling back to the local model.
+    """
+    ConfigManager.console_print(f'API transcription failed ({type(error).__name__}: {error}), '
+                                'transcribing with the local model instead.')
+    api_breaker.record_failure()
+
+def transcribe_api_with_fallback(audio_data, local_model=None, cancel_event=None):
+    """
+    Transcribe with the API, falling back to the local model if the API fails or is unavailable.
+
+    Failures count towards the circuit breaker. While it is open, the API is skipped entirely.
+    Without `fallback_to_local`, API errors are raised as before.
+    """
+    if not ConfigManager.get_config_value('model_options', 'api', 'fallback_to_local'):
+        return transcribe_api(audio_data, cancel_event)
+
+    if api_breaker.allow_request():
+        try:
+            transcription = transcribe_api(audio_data, cancel_event)
+            api_breaker.record_success()
+            return transcription
+        except TranscriptionCancelled:
+            raise
+        except Exception as e:
+            record_api_failure(e)
+
+    api_breaker.record_fallback()
+    return transcribe_local(audio_data, get_fallback_model(local_model), cancel_event)
+
+def _read_stream(response, cancel_event=None):
+    """
+    Yield the text deltas of a streamed transcription response.
+
+    A plain JSON response, from a server that ignored the stream parameter, is yielded in one piece.
+    """
+    if 'text/event-stream' not in response.headers.get('content-type', ''):
+        yield json.loads(response.read())['text']
+        return
+
+    streamed = False
+    for line in response.iter_lines():
+        _check_cancelled(cancel_event)
+        if not line.startswith('data:'):
+            continue
+        data = line[len('data:'):].strip()
+        if data == '[DONE]':
+            break
+        event = json.loads(data)
+        if event.get('type') == 'transcript.text.delta':
+            streamed = True
+            yield event['delta']
+        elif event.get('type') == 'transcript.text.done':
+            if not streamed:
+                yield event['text']
+            break
+
+def _rejects_streaming(error):
+    """
+    Return whether a rejected request was rejected for its stream parameter, rather than for
+    something like the language, the model or the audio.
+    """
+    body = error.body if isinstance(error.body, dict) else {}
+    body = body.get('error', body) if isinstance(body.get('error'), dict) else body
+    return body.get('param') == 'stream' or 'stream' in str(error).lower()
+
+def transcribe_api_stream(audio_data, local_model=None, cancel_event=None):
+    """
+    Transcribe with the API, yielding the text deltas streamed by the server as they arrive.
+
+    Servers that reply with the whole transcription are handled transparently, and servers that
+    reject the stream parameter are remembered and sent plain requests from then on. Long
+    recordings that are uploaded in chunks are not streamed. Failures fall back like
+    transcribe_api_with_fallback. If the stream fails after some text has arrived, the local
+    transcription is yielded from the word after the last one streamed.
+    """
+    model_options = ConfigManager.get_config_section('model_options')
+    sample_rate = ConfigManager.get_config_section('recording_options').get('sample_rate') or 16000
+    client = get_api_client()
+    if str(client.base_url) in _non_streaming_servers or is_long_form_upload(audio_data, model_options, sample_rate):
+        yield transcribe_api_with_fallback(audio_data, local_model, cancel_event)
+        return
+
+    fallback_to_local = model_options['api'].get('fallback_to_local')
+    if fallback_to_local and not api_breaker.allow_request():
+        api_breaker.record_fallback()
+        yield from transcribe_local_segments(audio_data, get_fallback_model(local_model), cancel_event=cancel_event)
+        return
+
+    upload = encode_api_upload(audio_data, sample_rate, model_options)
+    prompt = rolling_context.prompt(model_options['common']['initial_prompt'])
+
+    def attempt():
+        upload[1].seek(0)
+        return call_cancellable(lambda: client.audio.transcriptions.with_streaming_response.create(
+            file=upload, extra_body={'stream': True}, **api_request_options(model_options, prompt),
+        ).__enter__(), cancel_event, lambda response: response.close())
+
+    def wait(delay):
+        if cancel_event is None:
+            time.sleep(delay)
+        elif cancel_event.wait(delay):
+            raise TranscriptionCancelled()
+
+    try:
+        response = call_with_retries(attempt, wait, api_breaker.record_retry)
+    except TranscriptionCancelled:
+        raise
+    except Exception as e:
+        if isinstance(e, BadRequestError) and _rejects_streaming(e):
+            ConfigManager.console_print(f'The API rejected a streaming request ({e}), sending plain requests instead.')
+            _non_streaming_servers.add(str(client.base_url))
+            yield transcribe_api_with_fallback(audio_data, local_model, cancel_event)
+            return
+        if not fallback_to_local:
+            raise
+        record_api_failure(e)
+        api_breaker.record_fallback()
+        yield from transcribe_local_segments(audio_data, get_fallback_model(local_model), cancel_event=cancel_event)
+        return
+
+    # Reading the stream blocks, so close the response from a watcher if cancelled meanwhile
+    finished = threading.Event()
+
+    def watch_cancel():
+        while not finished.wait(0.05):
+            if cancel_event.is_set():
+                response.close()
+                return
+
+    if cancel_event is not None:
+        threading.Thread(target=watch_cancel, daemon=True).start()
+    streamed = []
+    try:
+        for delta in _read_stream(response, cancel_event):
+            streamed.append(delta)
+            yield delta
+        api_breaker.record_success()
+        return
+    except Exception as e:
+        _check_cancelled(cancel_event)
+        if not fallback_to_local:
+            raise
+        error = e
+    finally:
+        finished.set()
+        response.close()
+
+    record_api_failure(error)
+    api_breaker.record_fallback()
+    transcription = transcribe_local(audio_data, get_fallback_model(local_model), cancel_event)
+    words = re.findall(r'\s*\S+', transcription)
+    yield ''.join(words[len(''.join(streamed).split()):])
+
+class HedgeStats:
+    """
+    Count which path won each hedged transcription and keep the winning latencies.
+    """
+
+    def __init__(self):
+        self.wins = {'api': 0, 'local': 0}
+        self.latencies = {'api': [], 'local': []}
+
+    def record(self, winner, latency):
+        self.wins[winner] += 1
+        latencies = self.latencies[winner]
+        latencies.append(latency)
+        if len(latencies) > 1000:
+            del latencies[:500]
+
+    def report(self):
+        """Print the win counts and the median and 95th percentile latency of each path."""
+        for name, label in (('api', 'API'), ('local', 'Local model')):
+            latencies = sorted(self.latencies[name])
+            if not latencies:
+                continue
+            median = latencies[len(latencies) // 2] * 1000
+            p95 = latencies[int(len(latencies) * 0.95)] * 1000
+            ConfigManager.console_print(f'{label} won {self.wins[name]} of {sum(self.wins.values())} hedged '
+                                        f'transcriptions: median {median:.0f} ms, 95th percentile {p95:.0f} ms.')
+
+hedge_stats = HedgeStats()
+
+def hedge_enabled():
+    """
+    Return whether API transcriptions are hedged with the local model.
+    """
+    model_options = ConfigManager.get_config_section('model_options')
+    return bool(model_options.get('use_api') and model_options['api'].get('hedge_with_local'))
+
+def transcribe_hedged(audio_data, local_model=None, cancel_event=None):
+    """
+    Race the API against the local model, returning the first transcription to complete.
+
+    The API request starts at once and the local decode after `hedge_delay` seconds, or as soon
+    as the API request fails. The slower path is cancelled. If both fail, the last error is raised.
+    """
+    hedge_delay = ConfigManager.get_config_value('model_options', 'api', 'hedge_delay') or 0
+    results = queue.Queue()
+    cancel_events = {'api': threading.Event(), 'local': threading.Event()}
+    paths = {
+        'api': lambda: transcribe_api(audio_data, cancel_events['api']),
+        'local': lambda: transcribe_local(audio_data, local_model, cancel_events['local']),
+    }
+
+    def run(name):
+        try:
+            results.put((name, paths[name](), None))
+        except Exception as e:
+            results.put((name, None, e))
+
+    start_time = time.time()
+    started = []
+
+    def start(name):
+        started.append(name)
+        threading.Thread(target=run, args=(name,), daemon=True).start()
+
+    start('api')
+    if hedge_delay <= 0:
+        start('local')
+
+    finished = 0
+    while True:
+        if cancel_event is not None and cancel_event.is_set():
+            for event in cancel_events.values():
+                event.set()
+            raise TranscriptionCancelled()
+        try:
+            name, text, error = results.get(timeout=0.05)
+        except queue.Empty:
+            if 'local' not in started and time.time() - start_time >= hedge_delay:
+                start('local')
+            continue
+
+        finished += 1
+        if error is None:
+            break
+        ConfigManager.console_print(f'Hedged {name} transcription failed: {error}')
+        if 'local' not in started:
+            start('local')
+        elif finished == len(started):
+            raise error
+
+    latency = time.time() - start_time
+    for other in started:
+        if other != name:
+            cancel_events[other].set()
+    hedge_stats.record(name, latency)
+    ConfigManager.console_print(f"Hedged transcription won by {'the API' if name == 'api' else 'the local model'} "
+                                f'in {latency * 1000:.0f} ms.')
+    return text
+
+class SegmentPostProcessor:
+    """
+    Apply post-processing incrementally to transcription segments as they arrive.
+
+    Per-segment rules (hallucination filtering, inverse text normalization and the compiled rule
+    pipeline) are applied immediately. Trailing whitespace and periods are held back until the
+    next segment arrives, so that the trailing-period and trailing-space rules are only applied at
+    the end of the transcription. Text deltas streamed by the API can split a number or phrase
+    across pieces, so they are buffered and processed a sentence at a time. A delta or sentence
+    is only part of the utterance, so known hallucinations are only matched against a streamed
+    transcription as a whole, if nothing has been output before it finishes.
+    """
+
+    SENTENCE_END_PATTERN = re.compile(r'[.!?](?=\s)')
+
+    def __init__(self, deltas=False):
+        """
+        :param deltas: Whether the pieces are streamed text deltas rather than whole segments
+        """
+        post_processing = ConfigManager.get_config_section('post_processing')
+        self.remove_trailing_period = post_processing['remove_trailing_period']
+        self.add_trailing_space = post_processing['add_trailing_space']
+        language = ConfigManager.get_config_value('model_options', 'common', 'language') or language_cache.pinned
+        self.normalizer = get_normalizer(language)
+        self.rules = get_rule_pipeline()
+        self.deltas = deltas
+        self.buffer = ''
+        self.pending = ''
+        self.emitted = False
+        self.sentence_end = True
+
+    def feed(self, text):
+        """
+        Process one segment and return the text that can be output right away.
+        """
+        if not self.deltas:
+            return self._process(text)
+        self.buffer += text
+        boundary = None
+        for boundary in self.SENTENCE_END_PATTERN.finditer(self.buffer):
+            pass
+        if boundary is None:
+            return ''
+        text, self.buffer = self.buffer[:boundary.end()], self.buffer[boundary.end():]
+        return self._process(text)
+
+    def _process(self, text):
+        if not self.deltas and is_hallucination(text):
+            return ''
+        if self.normalizer:
+            text = self.normalizer.normalize(text)
+        text = self.rules.apply(text, sentence_start=self.sentence_end)
+
+        text = self.pending + text
+        if not self.emitted:
+            text = text.lstrip()
+        if text.strip():
+            self.sentence_end = text.rstrip().endswith(('.', '!', '?'))
+
+        head = text.rstrip(string.whitespace + '.')
+        self.pending = text[len(head):]
+        if head:
+            self.emitted = True
+        return head
+
+    def finish(self):
+        """
+        Return the remaining text with the end-of-transcription rules applied.
+        """
+        if self.deltas and not self.emitted and is_hallucination(self.pending + self.buffer):
+            self.buffer = self.pending = ''
+        head = self._process(self.buffer) if self.buffer else ''
+        self.buffer = ''
+        tail = self.pending.rstrip()
+        self.pending = ''
+        if not self.emitted and not tail:
+            return ''
+        if self.remove_trailing_period and tail.endswith('.'):
+            tail = tail[:-1]
+        if self.add_trailing_space:
+            tail += ' '
+        return head + tail
+
 def post_process_transcription(transcription):
     """
     Apply post-processing to the transcription.
     """
-    transcription = transcription.strip()
-    post_processing = ConfigManager.get_config_section('post_processing')
-    if post_processing['remove_trailing_period'] and transcription.endswith('.'):
-        transcription = transcription[:-1]
-    if post_processing['add_trailing_space']:
-        transcription += ' '
-    if post_processing['remove_capitalization']:
-        transcription = transcription.lower()
-        
-    if is_hallucination(transcription):
-        transcription = ""
+    processor = SegmentPostProcessor()
+    return processor.feed(transcription) + processor.finish()
 
-    return transcription
-
-def transcribe(audio_data, local_model=None):
+def transcribe(audio_data, local_model=None, cancel_event=None):
     """
     Transcribe audio date using the OpenAI API or a local model, depending on config.
     """
     if audio_data is None:
         return ''
 
-    if ConfigManager.get_config_value('model_options', 'use_api'):
-        transcription = transcribe_api(audio_data)
-    else:
-        transcription = transcribe_local(audio_data, local_model)
+    cache_key = result_cache.key(audio_data) if result_cache.enabled() else None
+    transcription = result_cache.get(cache_key) if cache_key else None
+    if transcription is None:
+        start_time = time.time()
+        if hedge_enabled():
+            transcription = transcribe_hedged(audio_data, local_model, cancel_event)
+        elif ConfigManager.get_config_value('model_options', 'use_api'):
+            transcription = transcribe_api_with_fallback(audio_data, local_model, cancel_event)
+        else:
+            transcription = transcribe_local(audio_data, local_model, cancel_event)
+        if cache_key:
+            result_cache.put(cache_key, transcription, time.time() - start_time)
 
+    rolling_context.add(transcription, local_model)
     return post_process_transcription(transcription)
 
+def transcribe_draft(audio_data, draft_model, cancel_event=None):
+    """
+    Transcribe audio data with the fast draft model.
+
+    :return: The post-processed draft, and whether it should be refined with the main model
+    """
+    stats = {}
+    transcription = ''.join(transcribe_local_segments(audio_data, draft_model, stats, cancel_event))
+    avg_logprob = stats.get('avg_logprob')
+
+    local_model_options = ConfigManager.get_config_section('model_options', 'local')
+    if local_model_options.get('refine_mode') == 'always':
+        refine = True
+    else:
+        refine = avg_logprob is None or avg_logprob < local_model_options.get('refine_logprob_threshold', -0.5)
+
+    # A refined transcription is added to the context once the refinement completes
+    if not refine:
+        rolling_context.add(transcription, draft_model)
+    return post_process_transcription(transcription), refine
+
+def transcribe_stream(audio_data, local_model=None, cancel_event=None):
+    """
+    Transcribe audio data, yielding post-processed text as each segment is decoded.
+
+    The API streams text deltas if `stream_response` is enabled. Otherwise the API and hedged
+    modes return the whole transcription at once, so it is yielded in one piece.
+    """
+    if audio_data is None:
+        return
+
+    cache_key = result_cache.key(audio_data) if result_cache.enabled() else None
+    cached = result_cache.get(cache_key) if cache_key else None
+    start_time = time.time()
+    deltas = False
+    if cached is not None:
+        segments = [cached]
+    elif hedge_enabled():
+        segments = [transcribe_hedged(audio_data, local_model, cancel_event)]
+    elif ConfigManager.get_config_value('model_options', 'use_api'):
+        if ConfigManager.get_config_value('model_options', 'api', 'stream_response'):
+            segments = transcribe_api_stream(audio_data, local_model, cancel_event)
+            deltas = True
+        else:
+            segments = [transcribe_api_with_fallback(audio_data, local_model, cancel_event)]
+    else:
+        segments = transcribe_local_segments(audio_data, local_model, cancel_event=cancel_event)
+
+    processor = SegmentPostProcessor(deltas)
+    transcription = []
+    for segment in segments:
+        transcription.append(segment)
+        text = processor.feed(segment)
+        if text:
+            yield text
+
+    transcription = ''.join(transcription)
+    if cache_key and cached is None:
+        result_cache.put(cache_key, transcription, time.time() - start_time)
+    rolling_context.add(transcription, local_model)
+    tail = processor.finish()
+    if tail:
+        yield tail
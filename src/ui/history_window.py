@@ -0,0 +1,92 @@
+import os
+import sys
+import time
+from PyQt5.QtCore import Qt, QTimer, pyqtSignal
+from PyQt5.QtWidgets import QApplication, QLineEdit, QListWidget, QListWidgetItem
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from history import transcription_history
+from ui.base_window import BaseWindow
+from ui.theme import font
+
+
+class HistoryWindow(BaseWindow):
+    """
+    Search past transcriptions and type one of them again.
+
+    The list shows the newest transcriptions matching the search box, updated as you type.
+    Pressing Enter or double-clicking a transcription hides the window and emits it.
+    """
+
+    pasteRequested = pyqtSignal(str)
+
+    def __init__(self):
+        super().__init__('Transcription History', 560, 420)
+        self.initHistoryUI()
+
+    def initHistoryUI(self):
+        self.search_box = QLineEdit()
+        self.search_box.setFont(font(10))
+        self.search_box.setPlaceholderText('Search transcriptions')
+        self.search_box.textChanged.connect(lambda _: self.search_timer.start())
+        self.search_box.returnPressed.connect(self.pasteSelected)
+
+        self.results = QListWidget()
+        self.results.setFont(font(10))
+        self.results.setWordWrap(True)
+        self.results.itemActivated.connect(self.pasteItem)
+
+        # Search once typing pauses, rather than on every key press
+        self.search_timer = QTimer(self)
+        self.search_timer.setSingleShot(True)
+        self.search_timer.setInterval(150)
+        self.search_timer.timeout.connect(self.refresh)
+
+        self.main_layout.addWidget(self.search_box)
+        self.main_layout.addWidget(self.results)
+
+    def show(self):
+        self.search_box.clear()
+        self.refresh()
+        super().show()
+        self.activateWindow()
+        self.search_box.setFocus()
+
+    def refresh(self):
+        self.results.clear()
+        for entry in transcription_history.search(self.search_box.text()):
+            created = time.strftime('%Y-%m-%d %H:%M', time.localtime(entry['created']))
+            item = QListWidgetItem(f"{created}   {entry['text'].strip()}")
+            item.setData(Qt.UserRole, entry['text'])
+            if entry['model']:
+                item.setToolTip(f"{entry['model']}, {entry['duration'] or 0:.1f} s of audio")
+            self.results.addItem(item)
+        if self.results.count():
+            self.results.setCurrentRow(0)
+
+    def pasteSelected(self):
+        item = self.results.currentItem()
+        if item:
+            self.pasteItem(item)
+
+    def pasteItem(self, item):
+        self.hide()
+        self.pasteRequested.emit(item.data(Qt.UserRole))
+
+    def keyPressEvent(self, event):
+        if event.key() == Qt.Key_Escape:
+            self.hide()
+        elif event.key() in (Qt.Key_Up, Qt.Key_Down):
+            # Move through the results while the search box keeps focus
+            QApplication.sendEvent(self.results, event)
+        else:
+            super().keyPressEvent(event)
+
+
+if __name__ == '__main__':
+    from utils import ConfigManager
+    ConfigManager.initialize()
+    app = QApplication(sys.argv)
+    window = HistoryWindow()
+    window.show()
+    sys.exit(app.exec_())
@@ -135,7 +135,7 @@ class SettingsWindow(BaseWindow):
         elif meta_type == 'str':
             return self.create_line_edit(current_value, key)
         elif meta_type in ['int', 'float']:
-            return self.create_line_edit(str(current_value))
+            return self.create_line_edit('' if current_value is None else str(current_value))
         return None
 
     def create_checkbox(self, value, key):
@@ -107,6 +107,17 @@ QComboBox QAbstractItemView {
     outline: none;
 }
 
+/* ---- lists ---- */
+QListWidget {
+    background: #16172a;
+    border: 1px solid #3a3b4d;
+    border-radius: 4px;
+    color: #e0e0e0;
+    outline: none;
+}
+QListWidget::item { padding: 4px 8px; }
+QListWidget::item:selected { background: #3a3b4d; color: #e0e0e0; }
+
 /* ---- check boxes ---- */
 QCheckBox { color: #e0e0e0; spacing: 8px; }
 QCheckBox::indicator {
@@ -0,0 +1,31 @@
+import os
+import sys
+import pytest
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'benchmarks')))
+from mock_server import MockTranscriptionServer
+from utils import ConfigManager
+
+
+@pytest.fixture
+def config(tmp_path, monkeypatch):
+    """Load the default configuration, ignoring any src/config.yaml in the working directory."""
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv('OPENAI_API_KEY', 'sk-test')
+    monkeypatch.setattr(ConfigManager, '_instance', None)
+    ConfigManager.initialize()
+    ConfigManager.set_config_value(False, 'misc', 'print_to_terminal')
+    return ConfigManager
+
+
+@pytest.fixture
+def server(config):
+    """Start the stand-in transcription server and point the API options at it."""
+    from transcription import clear_api_clients
+
+    server = MockTranscriptionServer().start()
+    config.set_config_value(server.base_url, 'model_options', 'api', 'base_url')
+    yield server
+    clear_api_clients()
+    server.stop()
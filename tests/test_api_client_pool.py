@@ -0,0 +1,41 @@
+import time
+import numpy as np
+
+from transcription import clear_api_clients, get_api_client, prewarm_api_connection, transcribe_api
+
+AUDIO = np.zeros(16000, dtype=np.int16)
+
+
+def test_client_is_cached(server):
+    assert get_api_client() is get_api_client()
+
+
+def test_requests_reuse_one_connection(server):
+    for _ in range(5):
+        assert transcribe_api(AUDIO) == server.text
+    assert server.requests == 5
+    assert server.connections == 1
+
+
+def test_prewarmed_connection_is_reused(server):
+    prewarm_api_connection()
+    deadline = time.monotonic() + 5
+    while server.connections == 0 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert server.connections == 1
+
+    transcribe_api(AUDIO)
+    assert server.connections == 1
+
+
+def test_changing_base_url_creates_new_client(server, config):
+    client = get_api_client()
+    config.set_config_value(server.base_url + '/', 'model_options', 'api', 'base_url')
+    assert get_api_client() is not client
+
+
+def test_clearing_closes_clients(server):
+    client = get_api_client()
+    clear_api_clients()
+    assert client.is_closed()
+    assert get_api_client() is not client
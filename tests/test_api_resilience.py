@@ -0,0 +1,76 @@
+import time
+import numpy as np
+import openai
+import pytest
+
+import transcription
+from resilience import CircuitBreaker
+from transcription import transcribe_api_with_fallback
+
+AUDIO = np.zeros(16000, dtype=np.int16)
+LOCAL_TEXT = 'Transcribed locally.'
+THRESHOLD = 2
+
+
+@pytest.fixture
+def breaker(server, config, monkeypatch):
+    """Use a fresh circuit breaker and a stand-in local model, with fast retries and probes."""
+    config.set_config_value(True, 'model_options', 'api', 'fallback_to_local')
+    config.set_config_value(1, 'model_options', 'api', 'request_timeout')
+    config.set_config_value(2, 'model_options', 'api', 'max_retries')
+    config.set_config_value(0.01, 'model_options', 'api', 'retry_backoff')
+    config.set_config_value(THRESHOLD, 'model_options', 'api', 'breaker_failure_threshold')
+    config.set_config_value(0.1, 'model_options', 'api', 'breaker_probe_interval')
+
+    breaker = CircuitBreaker(transcription._probe_api)
+    monkeypatch.setattr(transcription, 'api_breaker', breaker)
+    monkeypatch.setattr(transcription, 'get_fallback_model', lambda local_model=None: local_model)
+    monkeypatch.setattr(transcription, 'transcribe_local', lambda *args, **kwargs: LOCAL_TEXT)
+    yield breaker
+    breaker.stop()
+
+
+@pytest.mark.parametrize('fault', ['error', 'rate_limit', 'reset', 'timeout'])
+def test_transient_faults_are_retried(server, breaker, fault):
+    server.fault_delay = 2.0
+    server.inject_faults(2, fault)
+    assert transcribe_api_with_fallback(AUDIO) == server.text
+    assert server.requests == 3
+    assert breaker.status()['retries'] == 2
+    assert breaker.status()['state'] == CircuitBreaker.CLOSED
+
+
+def test_outage_falls_back_and_opens_breaker(server, breaker, config):
+    config.set_config_value(30, 'model_options', 'api', 'breaker_probe_interval')
+    server.fault_rate = 1.0
+    for _ in range(THRESHOLD):
+        assert transcribe_api_with_fallback(AUDIO) == LOCAL_TEXT
+    assert breaker.status()['state'] == CircuitBreaker.OPEN
+
+    server.reset_counters()
+    assert transcribe_api_with_fallback(AUDIO) == LOCAL_TEXT
+    assert server.requests == 0
+    assert breaker.status()['fallbacks'] == THRESHOLD + 1
+
+
+def test_successful_probe_closes_breaker(server, breaker):
+    server.fault_rate = 1.0
+    for _ in range(THRESHOLD):
+        transcribe_api_with_fallback(AUDIO)
+    assert breaker.status()['state'] == CircuitBreaker.OPEN
+
+    server.fault_rate = 0.0
+    deadline = time.monotonic() + 5
+    while breaker.status()['state'] == CircuitBreaker.OPEN and time.monotonic() < deadline:
+        time.sleep(0.05)
+    assert breaker.status()['state'] == CircuitBreaker.CLOSED
+    assert transcribe_api_with_fallback(AUDIO) == server.text
+
+
+def test_errors_are_raised_without_fallback(server, breaker, config):
+    config.set_config_value(False, 'model_options', 'api', 'fallback_to_local')
+    server.fault_rate = 1.0
+    with pytest.raises(openai.InternalServerError):
+        transcribe_api_with_fallback(AUDIO)
+    assert server.requests == 3
+    assert breaker.status()['fallbacks'] == 0